@@ -0,0 +1,144 @@
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+
+from myapp import page_cache, views, weather_data
+from myapp.fanout import fan_out
+from myapp.suggestions import SUGGESTION_FIELDS
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder gives the same JSON, only slower
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------------------------------------
+# /api/<page>/: the city pages' data as typed JSON
+# -------------------------------------------------------
+# The data comes from the same views.*_data() as the HTML. The API sends
+# numbers and ISO dates where the pages show "23 km/h" or "65%".
+#   ?cities=ahmedabad,surat           default: every city
+#   ?fields=current.temp,prediction   dotted paths into each city's data; lists
+#                                     are transparent (hours.temp picks temp
+#                                     from every hour)
+# Cities are gathered concurrently under one PAGE_DEADLINE. A city that
+# misses it comes back as null. The ETag is a hash of the body, and
+# Cache-Control follows the page's PAGE_MAX_AGE.
+
+# page → {top-level key: fields inside it, or () for a plain value}
+SCHEMAS = {
+    "today": {
+        "current": weather_data.CURRENT_FIELDS,
+        "prediction": weather_data.PREDICTION_FIELDS,
+        "season": (),
+        "suggestions": SUGGESTION_FIELDS,
+    },
+    "hourly": {"hours": weather_data.HOUR_FIELDS},
+    "10day": {"days": weather_data.DAY_FIELDS},
+    "monthly": {"days": weather_data.MONTH_DAY_FIELDS},
+}
+
+
+# each city's *_data() fans out its own upstream calls on the shared pool, so
+# the cities get a pool of their own and never wait behind those calls
+_city_executor = ThreadPoolExecutor(max_workers=2 * len(views.CITY_COORDS), thread_name_prefix="api-city")
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def parse_cities(value):
+    if not value:
+        return list(views.CITY_COORDS)
+    cities = list(dict.fromkeys(city.strip().lower() for city in value.split(",") if city.strip()))
+    unknown = [city for city in cities if city not in views.CITY_COORDS]
+    if unknown:
+        raise BadRequest(f"Unknown city: {', '.join(unknown)} (known: {', '.join(views.CITY_COORDS)})")
+    return cities
+
+
+def parse_fields(page, value):
+    """{top-level key: [inner fields] or None for all of it}, or None when ?fields= is absent."""
+    if not value:
+        return None
+    schema = SCHEMAS[page]
+    selected = {}
+    for field in filter(None, (field.strip() for field in value.split(","))):
+        top, _, inner = field.partition(".")
+        if top not in schema or (inner and inner not in schema[top]):
+            raise BadRequest(f"Unknown field '{field}' for {page}")
+        if not inner:
+            selected[top] = None
+        elif top not in selected or selected[top] is not None:
+            selected.setdefault(top, []).append(inner)
+    return selected
+
+
+def _pick(value, inner):
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return [_pick(item, inner) for item in value]
+    return {key: value.get(key) for key in inner}
+
+
+def select(data, fields):
+    if fields is None:
+        return data
+    return {top: data[top] if inner is None else _pick(data[top], inner) for top, inner in fields.items()}
+
+
+def json_error(message, status=400):
+    return HttpResponse(dumps({"error": message}), status=status, content_type="application/json")
+
+
+def city_data(request, page):
+    try:
+        cities = parse_cities(request.GET.get("cities"))
+        fields = parse_fields(page, request.GET.get("fields"))
+    except BadRequest as e:
+        return json_error(str(e))
+
+    page_data = views.PAGE_DATA[page]
+    results = fan_out({city_key: (lambda city_key=city_key: page_data(city_key)) for city_key in cities},
+                      deadline=settings.PAGE_DEADLINE, executor=_city_executor)
+
+    payload, complete = {}, True
+    for city_key, result in results.items():
+        if result.ok:
+            data, city_complete = result.value
+            payload[city_key] = select(data, fields)
+            complete = complete and city_complete
+        else:
+            logger.warning("City data unavailable", extra={"city": city_key, "page": page, "error": str(result.error)})
+            payload[city_key] = None
+            complete = False
+
+    body = dumps({"page": page, "cities": payload})
+    etag = f'"{hashlib.sha256(body).hexdigest()[:20]}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    return page_cache.cache_for(response, views.PAGE_MAX_AGE[page] if complete else 0)
@@ -0,0 +1,11 @@
+from django.urls import path
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    path('today/', api.city_data, {'page': 'today'}, name='today'),
+    path('hourly/', api.city_data, {'page': 'hourly'}, name='hourly'),
+    path('10day/', api.city_data, {'page': '10day'}, name='10day'),
+    path('monthly/', api.city_data, {'page': 'monthly'}, name='monthly'),
+]
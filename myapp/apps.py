@@ -1,6 +1,26 @@
+import logging
+
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
 
 
 class MyappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'myapp'
+
+    def ready(self):
+        # time every SQL query as the "db" span (see myapp/timing.py)
+        if getattr(settings, "REQUEST_TIMING", False):
+            from myapp.timing import install_db_timing
+
+            connection_created.connect(install_db_timing, dispatch_uid="myapp.timing.db")
+
+        # Load the ML models once at startup instead of on the first request
+        if getattr(settings, "WARM_MODELS_ON_STARTUP", False):
+            from myapp.real_model_testing_3.model_registry import registry
+
+            for name, error in registry.warm().items():
+                logger.warning("Model warmup skipped", extra={"model": name, "error": str(error)})
@@ -0,0 +1,161 @@
+#------------------------------------------------------------------------------------------------
+# async versions of the weather pages, used when ASYNC_VIEWS is on (serve with an ASGI server,
+# e.g. `uvicorn myproject.asgi:application`). Records and formatting are shared with views.py.
+#------------------------------------------------------------------------------------------------
+
+import logging
+import time
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import redirect
+
+from . import suggestions, upstream, views, weather_data
+from .backfill import abackfill_history, due_dates
+from .fanout import afan_out, off_loop
+from .models import MonthlyWeather
+from .weather_cache import openweather_cache, ashared_fetch, OPENWEATHER_TTLS
+
+logger = logging.getLogger(__name__)
+
+
+async def session_city(request):
+    if "city" in request.GET:
+        await request.session.aset("selected_city", request.GET["city"])
+    city_key = await request.session.aget("selected_city", "ahmedabad")
+    return city_key if city_key in views.CITY_COORDS else "ahmedabad"
+
+
+async def city_redirect(request, page):
+    """Async views.city_redirect (async session access)."""
+    return redirect(views.city_url(page, await session_city(request)))
+
+
+async def afetch_openweather(endpoint, lat, lon, **params):
+    """Async fetch_openweather: same caches, async HTTP client."""
+    query = "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+    url = f"{views.OPENWEATHER_BASE_URL}/{endpoint}"
+
+    async def fetch_upstream():
+        return await upstream.aget_json(url, params={
+            "lat": lat, "lon": lon, "appid": views.OPENWEATHER_API_KEY, "units": "metric", **params,
+        })
+
+    key = (endpoint, lat, lon, query)
+    ttl = OPENWEATHER_TTLS.get(endpoint, openweather_cache.default_ttl)
+
+    async def fetch():
+        return await ashared_fetch(("openweather",) + key, fetch_upstream, ttl)
+
+    return await openweather_cache.aget_or_fetch(key, fetch, ttl=ttl)
+
+
+async def city_page(request, page, city_key, data, complete):
+    """views.city_page off the event loop: template rendering and the page cache's file I/O block."""
+    return await sync_to_async(views.city_page)(request, page, city_key, data, complete)
+
+
+async def today_data(city_key):
+    """Async views.today_data."""
+    lat, lon = views.city_coords(city_key)
+
+    started = time.monotonic()
+    results = await afan_out({
+        "current": afetch_openweather("weather", lat, lon),
+        # Open-Meteo, XGBoost and the DailyPrediction table stay sync; run them off the event loop
+        "prediction": off_loop(views.get_prediction)(lat, lon),
+    }, timeout=settings.UPSTREAM_CALL_TIMEOUT, deadline=settings.PAGE_DEADLINE)
+
+    try:
+        if not results["current"].ok:
+            raise results["current"].error
+        current = weather_data.current_record(results["current"].value)
+    except Exception as e:
+        logger.warning("Current weather unavailable", extra={"city": city_key, "error": str(e)})
+        current = None
+
+    if results["prediction"].ok:
+        temp, weather_type = results["prediction"].value
+    else:
+        logger.warning("Prediction unavailable", extra={"city": city_key, "error": str(results["prediction"].error)})
+        temp, weather_type = None, None
+
+    season = views.get_season(datetime.now().month)
+
+    smart_suggestions = None
+    remaining = settings.PAGE_DEADLINE - (time.monotonic() - started)
+    if current and remaining > 0:
+        suggestion = (await afan_out({
+            "suggestions": sync_to_async(views.get_weather_suggestions)(
+                views.format_today(current), season, temp, weather_type),
+        }, timeout=remaining))["suggestions"]
+        if suggestion.ok:
+            smart_suggestions = suggestion.value
+        else:
+            logger.warning("Suggestions unavailable", extra={"city": city_key, "error": str(suggestion.error)})
+
+    return {
+        "current": current,
+        "prediction": weather_data.prediction_record(temp, weather_type),
+        "season": season,
+        "suggestions": smart_suggestions,
+    }, current is not None and temp is not None and suggestions.is_final(smart_suggestions)
+
+
+async def today_view(request, city):
+    return await city_page(request, "today", city, *await today_data(city))
+
+
+async def hourly_view(request, city):
+    city_key = city
+    lat, lon = views.city_coords(city_key)
+    try:
+        hours = weather_data.hour_records(await afetch_openweather("forecast/hourly", lat, lon))
+    except Exception as e:
+        logger.warning("Hourly forecast unavailable", extra={"city": city_key, "error": str(e)})
+        hours = []
+
+    return await city_page(request, "hourly", city_key, {"hours": hours}, bool(hours))
+
+
+async def tenday_view(request, city):
+    city_key = city
+    lat, lon = views.city_coords(city_key)
+    results = await afan_out({
+        "forecast": afetch_openweather("forecast/daily", lat, lon, cnt=10),
+        "prediction": off_loop(views.get_forecast_prediction)(lat, lon),
+    }, timeout=settings.UPSTREAM_CALL_TIMEOUT, deadline=settings.PAGE_DEADLINE)
+
+    return await city_page(request, "10day", city_key, *views.tenday_records(city_key, results))
+
+
+async def ensure_month_history(lat, lon):
+    start_date, window = views.month_window()
+
+    existing_dates = {
+        d async for d in MonthlyWeather.objects.filter(
+            lat=lat, lon=lon, date__gte=start_date
+        ).values_list("date", flat=True)
+    }
+
+    missing_dates = due_dates(lat, lon, [d for d in window if d not in existing_dates])
+    if missing_dates:
+        views.report_backfill(lat, lon, await abackfill_history(lat, lon, missing_dates, views.OPENWEATHER_API_KEY))
+
+    return start_date
+
+
+async def monthly_view(request, city):
+    city_key = city
+    lat, lon = views.city_coords(city_key)
+
+    start_date = await ensure_month_history(lat, lon)
+
+    entries = [
+        entry async for entry in MonthlyWeather.objects.filter(
+            lat=lat, lon=lon, date__gte=start_date
+        ).order_by("date")
+    ]
+
+    return await city_page(request, "monthly", city_key, {"days": weather_data.month_records(entries)}, True)
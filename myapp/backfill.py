@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import transaction
+
+from . import upstream
+from .models import MonthlyWeather
+
+
+# -------------------------------------------------------
+# OpenWeather history backfill for MonthlyWeather
+# -------------------------------------------------------
+HISTORY_URL = f"{settings.OPENWEATHER_HISTORY_URL}/history/city"
+
+# the history API returns at most one week of hourly data per call
+MAX_RANGE_DAYS = 7
+MAX_CONCURRENCY = 4
+
+# don't refetch a failed date on every page view
+RETRY_AFTER_SECONDS = 60 * 60
+
+
+class BackfillResult:
+
+    def __init__(self):
+        self.created = []
+        self.failed = {}  # date -> reason
+
+    def __repr__(self):
+        return f"<BackfillResult created={len(self.created)} failed={len(self.failed)}>"
+
+
+_failures = {}  # (lat, lon, date) -> monotonic time the failure was recorded
+_failures_lock = threading.Lock()
+
+
+def due_dates(lat, lon, dates, now=None):
+    """Drop dates that failed recently and are still cooling down."""
+    now = time.monotonic() if now is None else now
+    with _failures_lock:
+        return [
+            d for d in dates
+            if now - _failures.get((lat, lon, d), -RETRY_AFTER_SECONDS) >= RETRY_AFTER_SECONDS
+        ]
+
+
+def group_ranges(dates, max_days=MAX_RANGE_DAYS):
+    """Group dates into contiguous (first, last) runs of at most `max_days`."""
+    ranges = []
+    for d in sorted(set(dates)):
+        if ranges:
+            first, last = ranges[-1]
+            if d == last + timedelta(days=1) and (d - first).days < max_days:
+                ranges[-1] = (first, d)
+                continue
+        ranges.append((d, d))
+    return ranges
+
+
+def history_params(lat, lon, first, last, api_key):
+    start = datetime.combine(first, datetime.min.time(), tzinfo=timezone.utc)
+    end = datetime.combine(last + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+
+    return {
+        "lat": lat,
+        "lon": lon,
+        "type": "hour",
+        "start": int(start.timestamp()),
+        "end": int(end.timestamp()) - 1,
+        "cnt": 24 * ((last - first).days + 1),
+        "units": "metric",
+        "appid": api_key,
+    }
+
+
+def parse_history(data):
+    temps = defaultdict(list)
+    for entry in data.get("list", []):
+        day = datetime.fromtimestamp(entry["dt"], tz=timezone.utc).date()
+        temps[day].append(entry["main"]["temp"])
+    return temps
+
+
+def fetch_history_range(lat, lon, first, last, api_key):
+    """Return {date: [hourly temps]} for the UTC days first..last inclusive."""
+    return parse_history(upstream.get_json(HISTORY_URL, params=history_params(lat, lon, first, last, api_key)))
+
+
+def collect_rows(lat, lon, outcomes):
+    """
+    Turn [(first, last, temps or exception)] into MonthlyWeather rows.
+
+    Returns (rows, result) and records failed dates for `due_dates`.
+    """
+    result = BackfillResult()
+    rows = []
+    for first, last, temps in outcomes:
+        days = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+        if isinstance(temps, Exception):
+            for day in days:
+                result.failed[day] = str(temps)
+            continue
+
+        for day in days:
+            if temps.get(day):
+                values = temps[day]
+                rows.append(MonthlyWeather(
+                    lat=lat,
+                    lon=lon,
+                    date=day,
+                    avg_temp=round(sum(values) / len(values), 1)
+                ))
+                result.created.append(day)
+            else:
+                result.failed[day] = "no data returned"
+
+    now = time.monotonic()
+    with _failures_lock:
+        for day in result.created:
+            _failures.pop((lat, lon, day), None)
+        for day in result.failed:
+            _failures[(lat, lon, day)] = now
+
+    return rows, result
+
+
+def backfill_history(lat, lon, dates, api_key, max_workers=MAX_CONCURRENCY):
+    """
+    Fetch and store daily average temperatures for `dates`.
+
+    Contiguous dates share one request, requests run concurrently and all rows
+    are written in one bulk insert. Dates that could not be filled are returned
+    in `result.failed` and skipped by `due_dates` until RETRY_AFTER_SECONDS pass.
+    """
+    ranges = group_ranges(dates)
+    if not ranges:
+        return BackfillResult()
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(ranges))) as pool:
+        futures = [
+            (first, last, pool.submit(fetch_history_range, lat, lon, first, last, api_key))
+            for first, last in ranges
+        ]
+
+    outcomes = []
+    for first, last, future in futures:
+        try:
+            outcomes.append((first, last, future.result()))
+        except Exception as e:
+            outcomes.append((first, last, e))
+
+    rows, result = collect_rows(lat, lon, outcomes)
+    if rows:
+        with transaction.atomic():
+            MonthlyWeather.objects.bulk_create(rows, ignore_conflicts=True)
+    return result
+
+
+async def abackfill_history(lat, lon, dates, api_key, max_workers=MAX_CONCURRENCY):
+    """backfill_history for the async views, using the async upstream client."""
+    ranges = group_ranges(dates)
+    if not ranges:
+        return BackfillResult()
+
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def fetch(first, last):
+        async with semaphore:
+            data = await upstream.aget_json(HISTORY_URL, params=history_params(lat, lon, first, last, api_key))
+        return parse_history(data)
+
+    fetched = await asyncio.gather(*(fetch(first, last) for first, last in ranges), return_exceptions=True)
+
+    rows, result = collect_rows(lat, lon, [(first, last, temps) for (first, last), temps in zip(ranges, fetched)])
+    if rows:
+        await MonthlyWeather.objects.abulk_create(rows, ignore_conflicts=True)
+    return result
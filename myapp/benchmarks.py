@@ -0,0 +1,239 @@
+import fnmatch
+import json
+import platform
+import statistics
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from django.template.loader import render_to_string
+
+from myapp import views
+from myapp.gemini_parser import parse_batch_suggestions, parse_image_analysis, parse_suggestions
+from myapp.models import MonthlyWeather
+from myapp.real_model_testing_3 import predict_live
+from myapp.real_model_testing_3.model_registry import ModelArtifactMissing, ModelRegistry, load_artifact
+
+
+# -------------------------------------------------------
+# Offline benchmarks for the compute hot paths
+# -------------------------------------------------------
+# Everything runs on recorded upstream replies, so results do not depend on
+# the network. Stage names are "<kind>:<what>", e.g. "render:today".
+FIXTURES_DIR = Path(__file__).resolve().parent / "test_data"
+
+# how much slower (relative) a stage may get before compare() reports it
+DEFAULT_THRESHOLD = 0.25
+
+
+def load_json(name):
+    return json.loads((FIXTURES_DIR / name).read_text())
+
+
+def load_text(name):
+    return (FIXTURES_DIR / name).read_text()
+
+
+class Stage:
+    __slots__ = ("name", "fn", "number", "skipped")
+
+    def __init__(self, name, fn=None, number=None, skipped=None):
+        self.name = name
+        self.fn = fn
+        # calls per timing run; None picks a count that runs for ~0.2s
+        self.number = number
+        self.skipped = skipped
+
+
+def _rows():
+    """(lat, lon, daily) rows for every city, from the recorded Open-Meteo reply."""
+    return [(item["latitude"], item["longitude"], item["daily"])
+            for item in load_json("open_meteo/forecast_daily.json")]
+
+
+def artifacts(registry, name):
+    """
+    {label: path} of every artifact of a model on disk, e.g. "pkl", "ubj" or
+    "pruned200.ubj" for temp_model_xgb_regressor.pruned200.ubj.
+    """
+    configured = registry.base_dir / registry.files[name]
+    found = {}
+    for path in sorted(configured.parent.glob(configured.stem + ".*")):
+        label = path.name[len(configured.stem) + 1:]
+        if path.suffix in registry.formats:
+            found[label] = path
+    return found
+
+
+def _model_stages(registry):
+    today = datetime(2025, 10, 18)
+    rows = _rows()
+    features = predict_live.build_forecast_features(rows)
+    loaded = {}
+
+    def model(path):
+        if path not in loaded:
+            loaded[path] = load_artifact(path)
+        return loaded[path]
+
+    yield Stage("features:build", lambda: predict_live.build_features(rows, today=today))
+    yield Stage("features:forecast", lambda: predict_live.build_forecast_features(rows))
+
+    for name in registry.files:
+        found = artifacts(registry, name)
+        if not found:
+            reason = f"{registry.path(name).name} not found"
+            yield Stage(f"model_load:{name}", skipped=reason)
+            yield Stage(f"predict:{name}", skipped=reason)
+            continue
+        for label, path in found.items():
+            # load_artifact() directly, so every run reads the file again
+            yield Stage(f"model_load:{name}:{label}", lambda path=path: load_artifact(path), number=1)
+            yield Stage(f"predict:{name}:{label}", lambda path=path: model(path).predict(features))
+
+
+def compare_artifacts(registry, name, repeat=5):
+    """
+    Load time, predict time (ms, best of `repeat`) and output difference of
+    every artifact of a model against its pickle, on the recorded forecast.
+
+    Rows are (label, load_ms, predict_ms, metric, difference): metric
+    "max_abs" (largest absolute difference) for a regressor, "mismatch"
+    (share of differing classes) for a classifier, None without a pickle.
+    """
+    features = predict_live.build_forecast_features(_rows())
+    found = artifacts(registry, name)
+    reference = found.get("pkl")
+    expected = load_artifact(reference).predict(features) if reference else None
+
+    rows = []
+    for label, path in found.items():
+        load = time_stage(Stage(label, lambda path=path: load_artifact(path)), repeat=repeat, number=1)
+        model = load_artifact(path)
+        predict = time_stage(Stage(label, lambda: model.predict(features)), repeat=repeat)
+        got = model.predict(features)
+        if expected is None:
+            metric, difference = None, None
+        elif np.issubdtype(np.asarray(expected).dtype, np.integer):
+            metric, difference = "mismatch", float(np.mean(np.asarray(got) != np.asarray(expected)))
+        else:
+            metric, difference = "max_abs", float(np.max(np.abs(np.asarray(got, dtype=np.float64) - expected)))
+        rows.append((label, load["min_ms"], predict["min_ms"], metric, difference))
+    return rows
+
+
+def _parse_stages():
+    for path in sorted((FIXTURES_DIR / "gemini").glob("*.txt")):
+        text = path.read_text()
+        if path.stem.startswith("image"):
+            parse = parse_image_analysis
+        elif path.stem.startswith("suggestions_batch"):
+            parse = lambda text: list(parse_batch_suggestions(text))
+        else:
+            parse = parse_suggestions
+        yield Stage(f"parse:{path.stem}", lambda parse=parse, text=text: parse(text))
+
+
+def _page_contexts():
+    current = load_json("openweather/weather.json")
+    hourly = load_json("openweather/forecast_hourly.json")
+    daily = load_json("openweather/forecast_daily.json")
+    start = date(2025, 9, 18)
+    entries = [MonthlyWeather(lat=21.1702, lon=72.8311, date=start + timedelta(days=i), avg_temp=28.0 + i % 5)
+               for i in range(30)]
+
+    return {
+        "today": ("myapp/today.html", {
+            "today_data": views.build_today_data(current),
+            "city_key": "surat",
+            "pred_temp": 31.2,
+            "pred_weather_type": "Rain",
+            "season": views.get_season(10),
+            "suggestions": parse_suggestions(load_text("gemini/suggestions.txt")),
+        }),
+        "hourly": ("myapp/hourly.html", {"hourly_data": views.build_hourly_data(hourly), "city_key": "surat"}),
+        "10day": ("myapp/10day.html", {"forecast_data": views.build_forecast_data(daily), "city_key": "surat"}),
+        "monthly": ("myapp/monthly.html", {"result": views.build_month_result(entries), "city_key": "surat"}),
+        "image": ("myapp/image.html", {
+            "csrf_token": "benchmark",  # the upload form renders without a request
+            "caption": "Evening sky",
+            "thumbnail_url": "/image/thumb/" + "0" * 64 + ".jpg",
+            "weather_info": parse_image_analysis(load_text("gemini/image_sky.txt")),
+        }),
+    }, (current, hourly, daily)
+
+
+def _page_stages():
+    pages, (current, hourly, daily) = _page_contexts()
+
+    yield Stage("shape:today", lambda: views.build_today_data(current))
+    yield Stage("shape:hourly", lambda: views.build_hourly_data(hourly))
+    yield Stage("shape:10day", lambda: views.build_forecast_data(daily))
+
+    for page, (template, context) in pages.items():
+        yield Stage(f"render:{page}", lambda template=template, context=context: render_to_string(template, context))
+
+
+def stages(registry=None):
+    registry = registry or ModelRegistry()
+    yield from _model_stages(registry)
+    yield from _parse_stages()
+    yield from _page_stages()
+
+
+def time_stage(stage, repeat=5, number=None):
+    """Per-call timings of a stage in milliseconds (best, median and worst of `repeat` runs)."""
+    timer = timeit.Timer(stage.fn)
+    number = number or stage.number or timer.autorange()[0]
+    runs = [seconds / number * 1000 for seconds in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "min_ms": min(runs),
+        "median_ms": statistics.median(runs),
+        "max_ms": max(runs),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def run(patterns=None, repeat=5, number=None, registry=None):
+    """
+    Time every stage whose name matches one of `patterns` (fnmatch, e.g. "render:*").
+
+    Returns a JSON-serialisable dict; a stage that cannot run here (missing
+    model artifact) is listed with a "skipped" reason.
+    """
+    results = {}
+    for stage in stages(registry):
+        if patterns and not any(fnmatch.fnmatch(stage.name, p) for p in patterns):
+            continue
+        try:
+            results[stage.name] = {"skipped": stage.skipped} if stage.skipped else time_stage(stage, repeat, number)
+        except ModelArtifactMissing as e:
+            results[stage.name] = {"skipped": str(e)}
+
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+        },
+        "stages": results,
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Stages present in both results, as (name, baseline_ms, current_ms, ratio, regressed).
+
+    Compares the best run of each stage, which is the least noisy figure.
+    """
+    rows = []
+    for name, result in current["stages"].items():
+        before = baseline["stages"].get(name)
+        if not before or "min_ms" not in before or "min_ms" not in result:
+            continue
+        ratio = result["min_ms"] / before["min_ms"] if before["min_ms"] else float("inf")
+        rows.append((name, before["min_ms"], result["min_ms"], ratio, ratio > 1 + threshold))
+    return rows
@@ -0,0 +1,218 @@
+import copy
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from myapp.benchmarks import load_json, load_text
+from myapp.views import CITY_COORDS
+
+
+# -------------------------------------------------------
+# Stand-in for OpenWeather, Open-Meteo and Gemini (load tests)
+# -------------------------------------------------------
+# Serves the recorded replies in myapp/test_data for every endpoint the views
+# call. Point the app at it with FAKE_UPSTREAM_URL=http://host:port.
+
+_CITY_IN_PROMPT = re.compile(r"^CITY:\s*(.+)$", re.MULTILINE)
+
+
+def nearest_city(lat, lon):
+    return min(CITY_COORDS, key=lambda c: (CITY_COORDS[c][0] - lat) ** 2 + (CITY_COORDS[c][1] - lon) ** 2)
+
+
+def _cycle(items, count):
+    return [copy.deepcopy(items[i % len(items)]) for i in range(count)]
+
+
+class FakeUpstreamServer(ThreadingHTTPServer):
+    """
+    `latency` and `jitter` are in seconds; each reply waits a uniform random
+    time in latency ± jitter. `error_rate` is the share of requests answered
+    503. `payload_scale` multiplies the length of the hourly forecast, the
+    history list and the Open-Meteo daily arrays.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, error_rate=0.0, payload_scale=1, seed=None,
+                 verbose=False):
+        super().__init__(address, FakeUpstreamHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.payload_scale = max(1, int(payload_scale))
+        self.verbose = verbose
+        self.rng = random.Random(seed)
+        self.counts = Counter()
+        self.counts_lock = threading.Lock()
+
+        self.weather = load_json("openweather/weather.json")
+        self.hourly = load_json("openweather/forecast_hourly.json")
+        self.daily = load_json("openweather/forecast_daily.json")
+        self.open_meteo = load_json("open_meteo/forecast_daily.json")[0]
+        self.image_reply = load_text("gemini/image_sky.txt")
+        self.suggestions_reply = load_text("gemini/suggestions.txt")
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, route, status):
+        with self.counts_lock:
+            self.counts[(route, status)] += 1
+
+    def delay(self):
+        return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+    def fails(self):
+        return self.rng.random() < self.error_rate
+
+    # ---- payloads ----
+    def current_weather(self, lat, lon):
+        data = copy.deepcopy(self.weather)
+        data["coord"] = {"lat": lat, "lon": lon}
+        data["name"] = nearest_city(lat, lon).title()
+        data["dt"] = int(time.time())
+        return data
+
+    def hourly_forecast(self, lat, lon):
+        data = copy.deepcopy(self.hourly)
+        start = int(time.time()) // 3600 * 3600
+        data["list"] = _cycle(self.hourly["list"], len(self.hourly["list"]) * self.payload_scale)
+        for i, item in enumerate(data["list"]):
+            item["dt"] = start + i * 3600
+        data["cnt"] = len(data["list"])
+        data["city"]["name"] = nearest_city(lat, lon).title()
+        return data
+
+    def daily_forecast(self, lat, lon, cnt):
+        data = copy.deepcopy(self.daily)
+        start = int(time.time()) // 86400 * 86400
+        data["list"] = _cycle(self.daily["list"], cnt)
+        for i, item in enumerate(data["list"]):
+            item["dt"] = start + i * 86400 + 23400
+        data["cnt"] = cnt
+        data["city"]["name"] = nearest_city(lat, lon).title()
+        return data
+
+    def history(self, start, end):
+        step = max(1, 3600 // self.payload_scale)
+        return {
+            "message": "Count: 0", "cod": "200", "city_id": 0, "calctime": 0.01,
+            "list": [
+                {"dt": dt, "main": {"temp": round(27 + 4 * ((dt // 3600) % 24 - 12) / 12, 2)}}
+                for dt in range(start, end + 1, step)
+            ],
+        }
+
+    def open_meteo_location(self, lat, lon, days=None):
+        data = copy.deepcopy(self.open_meteo)
+        days = (days or len(data["daily"]["time"])) * self.payload_scale
+        today = datetime.now().date()
+        data["daily"] = {name: _cycle(values, days) for name, values in data["daily"].items()}
+        data["daily"]["time"] = [(today + timedelta(days=i)).isoformat() for i in range(days)]
+        data["latitude"], data["longitude"] = lat, lon
+        return data
+
+    def gemini_reply(self, body):
+        parts = [part for content in body.get("contents", []) for part in content.get("parts", [])]
+        if any("inline_data" in part or "inlineData" in part for part in parts):
+            text = self.image_reply
+        else:
+            prompt = "\n".join(part.get("text", "") for part in parts)
+            cities = _CITY_IN_PROMPT.findall(prompt)
+            if cities:
+                text = "\n\n".join(f"CITY: {city.strip()}\n{self.suggestions_reply}" for city in cities)
+            else:
+                text = self.suggestions_reply
+        return {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"},
+                            "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": 0, "totalTokenCount": 0},
+        }
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, route, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count(route, status)
+
+    def route(self):
+        path = urlsplit(self.path).path
+        if path.startswith("/data/2.5/history/"):
+            return "openweather:history"
+        if path.startswith("/data/2.5/"):
+            return "openweather:" + path[len("/data/2.5/"):]
+        if path == "/v1/forecast":
+            return "open-meteo:forecast"
+        if path.endswith(":generateContent"):
+            return "gemini:generateContent"
+        return None
+
+    def respond(self, body=None):
+        route = self.route()
+        if route is None:
+            return self.send_json("unknown", 404, {"cod": 404, "message": f"no fake for {self.path}"})
+
+        time.sleep(self.server.delay())
+        if self.server.fails():
+            return self.send_json(route, 503, {"cod": 503, "message": "fake upstream error"})
+
+        query = {k: v[-1] for k, v in parse_qs(urlsplit(self.path).query).items()}
+        server = self.server
+        try:
+            if route == "openweather:weather":
+                payload = server.current_weather(float(query["lat"]), float(query["lon"]))
+            elif route == "openweather:forecast/hourly":
+                payload = server.hourly_forecast(float(query["lat"]), float(query["lon"]))
+            elif route == "openweather:forecast/daily":
+                payload = server.daily_forecast(float(query["lat"]), float(query["lon"]), int(query.get("cnt", 7)))
+            elif route == "openweather:history":
+                payload = server.history(int(query["start"]), int(query["end"]))
+            elif route == "open-meteo:forecast":
+                lats = [float(v) for v in query["latitude"].split(",")]
+                lons = [float(v) for v in query["longitude"].split(",")]
+                days = int(query["forecast_days"]) if "forecast_days" in query else None
+                locations = [server.open_meteo_location(lat, lon, days) for lat, lon in zip(lats, lons)]
+                payload = locations[0] if len(locations) == 1 else locations
+            elif route == "gemini:generateContent":
+                payload = server.gemini_reply(body or {})
+            else:
+                return self.send_json(route, 404, {"cod": 404, "message": f"no fake for {self.path}"})
+        except (KeyError, ValueError) as e:
+            return self.send_json(route, 400, {"cod": 400, "message": f"bad request: {e}"})
+        self.send_json(route, 200, payload)
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            body = {}
+        self.respond(body)
+
+
+def make_server(host="127.0.0.1", port=8001, **options):
+    return FakeUpstreamServer((host, port), **options)
@@ -0,0 +1,124 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+
+# -------------------------------------------------------
+# Run independent upstream calls concurrently
+# -------------------------------------------------------
+
+# shared by all requests in this worker process
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="fanout")
+
+
+class CallTimeout(Exception):
+    """The call did not finish inside its timeout or the page deadline."""
+
+
+class CallResult:
+    __slots__ = ("value", "error", "seconds")
+
+    def __init__(self, value=None, error=None, seconds=None):
+        self.value = value
+        self.error = error
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _run(fn):
+    started = time.perf_counter()
+    try:
+        return fn(), time.perf_counter() - started
+    finally:
+        # pool threads must not keep DB connections open between requests
+        connections.close_all()
+
+
+def off_loop(fn):
+    """
+    sync_to_async(fn) on a thread of its own (thread_sensitive=False), so
+    slow sync work runs in parallel. Like fan_out, it closes that thread's
+    DB connections when the call returns.
+    """
+    def run(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            connections.close_all()
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def fan_out(calls, timeout=None, deadline=None, executor=None):
+    """
+    Run each callable in `calls` ({name: fn}) concurrently.
+
+    `timeout` bounds each call, `deadline` bounds the whole batch (seconds).
+    `executor` replaces the shared pool, for calls that fan out themselves.
+    Returns {name: CallResult}; a call that did not finish in time gets a
+    CallTimeout error and keeps running in the background, its result discarded.
+    """
+    started = time.perf_counter()
+    limits = [t for t in (timeout, deadline) if t is not None]
+    budget = min(limits) if limits else None
+
+    # each call gets a copy of the caller's context, so timing spans reach the request
+    futures = {
+        name: (executor or _executor).submit(contextvars.copy_context().run, _run, fn)
+        for name, fn in calls.items()
+    }
+    wait(futures.values(), timeout=budget)
+
+    results = {}
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()
+            results[name] = CallResult(
+                error=CallTimeout(f"'{name}' did not finish within {budget}s"),
+                seconds=time.perf_counter() - started,
+            )
+            continue
+        try:
+            value, seconds = future.result()
+            results[name] = CallResult(value=value, seconds=seconds)
+        except Exception as e:
+            results[name] = CallResult(error=e, seconds=time.perf_counter() - started)
+    return results
+
+
+async def afan_out(calls, timeout=None, deadline=None):
+    """fan_out for coroutines ({name: awaitable}) in the async views."""
+    started = time.perf_counter()
+
+    async def run(name, awaitable):
+        begun = time.perf_counter()
+        try:
+            value = await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            return CallResult(error=CallTimeout(f"'{name}' did not finish within {timeout}s"),
+                              seconds=time.perf_counter() - begun)
+        except Exception as e:
+            return CallResult(error=e, seconds=time.perf_counter() - begun)
+        return CallResult(value=value, seconds=time.perf_counter() - begun)
+
+    tasks = {name: asyncio.ensure_future(run(name, awaitable)) for name, awaitable in calls.items()}
+    if tasks:
+        await asyncio.wait(tasks.values(), timeout=deadline)
+
+    results = {}
+    for name, task in tasks.items():
+        if task.done():
+            results[name] = task.result()
+        else:
+            task.cancel()
+            results[name] = CallResult(
+                error=CallTimeout(f"'{name}' did not finish within the {deadline}s deadline"),
+                seconds=time.perf_counter() - started,
+            )
+    return results
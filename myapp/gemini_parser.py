@@ -0,0 +1,145 @@
+import re
+
+
+# -------------------------------------------------------
+# Parser for Gemini's "KEY: value" replies
+# -------------------------------------------------------
+
+class ResponseParser:
+    """
+    Single-pass parser for replies made of `KEY: value` lines.
+
+    `fields` maps each key Gemini is asked for to the result name. All keys
+    are compiled into one regex, so a reply is scanned once whatever the
+    number of keys. Keys are matched case-insensitively and may carry markdown
+    decoration (`**KEY:**`, `- KEY:`) or a list number (`1. KEY:`). A value
+    runs until the next known key, so wrapped lines are joined into one value;
+    lines with other colons in them stay part of the value.
+    """
+
+    def __init__(self, fields):
+        self.fields = {key.upper(): name for key, name in fields.items()}
+        keys = sorted(self.fields, key=len, reverse=True)
+        self.pattern = re.compile(
+            r"^[ \t>*#-]*(?:\d+[.)][ \t*]*)?(" + "|".join(map(re.escape, keys)) + r")[ \t*]*:[ \t*]*",
+            re.IGNORECASE | re.MULTILINE,
+        )
+
+    def iter_fields(self, text):
+        """Yield (name, value) for each key in reply order, duplicates included."""
+        text = text.replace("\r\n", "\n")
+        matches = list(self.pattern.finditer(text))
+        for match, following in zip(matches, matches[1:] + [None]):
+            end = following.start() if following else len(text)
+            value = " ".join(line.strip() for line in text[match.end():end].split("\n") if line.strip())
+            yield self.fields[match.group(1).upper()], value.rstrip("*").strip()
+
+    def parse(self, text):
+        """{name: value} for every field; a key missing from the reply maps to None."""
+        result = dict.fromkeys(self.fields.values())
+        for name, value in self.iter_fields(text):
+            result[name] = value
+        return result
+
+
+_PERCENT = re.compile(r"(\d+(?:\.\d+)?)(?:\s*(?:-|–|to)\s*(\d+(?:\.\d+)?))?")
+
+
+def percentage(value):
+    """
+    "40%" -> 40, "30-50%" -> 40 (midpoint of a range).
+
+    None when the value has no number or it falls outside 0-100.
+    """
+    if not value:
+        return None
+    match = _PERCENT.search(value)
+    if match is None:
+        return None
+    low = float(match.group(1))
+    high = float(match.group(2)) if match.group(2) else low
+    number = round((low + high) / 2)
+    return number if 0 <= number <= 100 and low <= high else None
+
+
+# -------------------------------------------------------
+# Image weather analysis
+# -------------------------------------------------------
+IMAGE_ANALYSIS = ResponseParser({
+    "SKY_DETECTED": "sky_detected",
+    "WEATHER_CONDITION": "weather_condition",
+    "CLOUD_COVERAGE": "cloud_coverage",
+    "CLOUD_TYPE": "cloud_type",
+    "CLOUD_DARKNESS": "cloud_darkness",
+    "CLOUD_INTENSITY": "cloud_intensity",
+    "RAIN_PROBABILITY": "rain_probability",
+    "APPROXIMATE_TEMP": "approximate_temp",
+    "VISIBILITY": "visibility",
+    "ATMOSPHERIC_CONDITIONS": "atmospheric_conditions",
+    "WIND_INDICATION": "wind_indication",
+    "TIME_OF_DAY": "time_of_day",
+    "WEATHER_FORECAST": "weather_forecast",
+    "DETAILS": "details",
+    "REASON": "reason",
+})
+
+# text field -> validated number stored next to it
+PERCENT_FIELDS = {
+    "cloud_coverage": "cloud_coverage_pct",
+    "rain_probability": "rain_probability_pct",
+}
+
+
+def parse_image_analysis(text):
+    """
+    Result dict for analyze_weather_from_image.
+
+    Sky fields are only kept when SKY_DETECTED is YES and `reason` only when it
+    is not. Percent fields keep Gemini's text for display and get a checked
+    integer (or None) under PERCENT_FIELDS.
+    """
+    fields = IMAGE_ANALYSIS.parse(text)
+    # the prompt shows the format as "SKY_DETECTED: [YES/NO]", so "[YES]" comes back too
+    is_sky = (fields.pop("sky_detected") or "").strip("[]* ").upper().startswith("YES")
+
+    result = {"is_sky": is_sky}
+    for name, value in fields.items():
+        if name == "reason":
+            result[name] = None if is_sky else value
+        else:
+            result[name] = value if is_sky else None
+    for name, number_name in PERCENT_FIELDS.items():
+        result[number_name] = percentage(result[name])
+    result["raw_response"] = text
+    return result
+
+
+# -------------------------------------------------------
+# Smart suggestions (single city and batch replies)
+# -------------------------------------------------------
+SUGGESTION_KEYS = {
+    "CLOTHING": "clothing",
+    "ACTIVITIES": "activities",
+    "HEALTH": "health",
+    "TRAVEL": "travel",
+}
+SUGGESTIONS = ResponseParser(SUGGESTION_KEYS)
+BATCH_SUGGESTIONS = ResponseParser({"CITY": "city", **SUGGESTION_KEYS})
+
+
+def parse_suggestions(text):
+    return {name: value or "" for name, value in SUGGESTIONS.parse(text).items()}
+
+
+def parse_batch_suggestions(text):
+    """Yield (city, suggestions) for each CITY: block of a batch reply."""
+    city, result = None, None
+    for name, value in BATCH_SUGGESTIONS.iter_fields(text):
+        if name == "city":
+            if city is not None:
+                yield city, result
+            city, result = value, dict.fromkeys(SUGGESTION_KEYS.values(), "")
+        elif city is not None:
+            result[name] = value
+    if city is not None:
+        yield city, result
@@ -0,0 +1,105 @@
+import hashlib
+import threading
+from datetime import timedelta
+
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ImageAnalysis
+from .weather_cache import TTLCache
+
+
+# -------------------------------------------------------
+# Image analysis cache: SHA-256 of the bytes -> parsed analysis
+# -------------------------------------------------------
+MAX_AGE = timedelta(days=30)
+MAX_ROWS = 5000
+MEMORY_SIZE = 256
+
+# in-memory LRU in front of the ImageAnalysis table
+memory = TTLCache(maxsize=MEMORY_SIZE, default_ttl=MAX_AGE.total_seconds(), stale_ttl=0)
+
+_counters = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+_counters_lock = threading.Lock()
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def image_digest(image_data):
+    return hashlib.sha256(image_data).hexdigest()
+
+
+def file_digest(uploaded_file):
+    hasher = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        hasher.update(chunk)
+    uploaded_file.seek(0)
+    return hasher.hexdigest()
+
+
+def lookup(digest):
+    """Return the cached analysis for `digest`, or None."""
+    value = memory.get(digest)
+    if value is not None:
+        _count("memory_hits")
+        return value
+
+    cutoff = timezone.now() - MAX_AGE
+    record = ImageAnalysis.objects.filter(sha256=digest, created_at__gte=cutoff).first()
+    if record is None:
+        _count("misses")
+        return None
+
+    ImageAnalysis.objects.filter(pk=record.pk).update(hits=F("hits") + 1, last_used_at=timezone.now())
+    memory.set(digest, record.result)
+    _count("db_hits")
+    return record.result
+
+
+def store(digest, result):
+    memory.set(digest, result)
+    try:
+        ImageAnalysis.objects.update_or_create(sha256=digest, defaults={"result": result})
+    except IntegrityError:
+        # a concurrent upload of the same image stored it first
+        pass
+    prune()
+
+
+def prune(now=None):
+    """Apply the age limit, then drop the least recently used rows over MAX_ROWS."""
+    now = now or timezone.now()
+    ImageAnalysis.objects.filter(created_at__lt=now - MAX_AGE).delete()
+
+    overflow = ImageAnalysis.objects.count() - MAX_ROWS
+    if overflow > 0:
+        oldest = ImageAnalysis.objects.order_by("last_used_at").values_list("pk", flat=True)[:overflow]
+        ImageAnalysis.objects.filter(pk__in=list(oldest)).delete()
+
+
+def analyze_cached(digest, analyze):
+    """
+    Return the analysis for the image with this digest, calling `analyze()` only
+    when no cached copy exists. Error results are not cached.
+    """
+    cached = lookup(digest)
+    if cached is not None:
+        return cached
+
+    result = analyze()
+    if "error" not in result:
+        store(digest, result)
+    return result
+
+
+def stats():
+    with _counters_lock:
+        counters = dict(_counters)
+    lookups = sum(counters.values())
+    counters["hit_rate"] = (counters["memory_hits"] + counters["db_hits"]) / lookups if lookups else 0.0
+    counters["rows"] = ImageAnalysis.objects.count()
+    return counters
@@ -0,0 +1,84 @@
+from io import BytesIO
+
+from django.core.cache import caches
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .weather_cache import SHARED_CACHE_ALIAS
+
+
+# -------------------------------------------------------
+# Upload preprocessing: decode once, re-encode small copies
+# -------------------------------------------------------
+
+# longest edge sent to Gemini; sky analysis does not need phone-camera resolution
+ANALYSIS_MAX_EDGE = 1024
+ANALYSIS_QUALITY = 85
+
+# preview shown on the page, served from its own URL
+THUMBNAIL_MAX_EDGE = 480
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_TTL = 7 * 24 * 60 * 60
+
+JPEG = "image/jpeg"
+
+
+class ImageDecodeError(Exception):
+    """The upload could not be decoded as an image."""
+
+
+class PreparedImage:
+    __slots__ = ("analysis_bytes", "thumbnail_bytes", "content_type", "size")
+
+    def __init__(self, analysis_bytes, thumbnail_bytes, size):
+        self.analysis_bytes = analysis_bytes
+        self.thumbnail_bytes = thumbnail_bytes
+        self.content_type = JPEG
+        self.size = size
+
+
+def _encode(image, max_edge, quality):
+    copy = image.copy()
+    copy.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    out = BytesIO()
+    copy.save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+
+def prepare_image(upload):
+    """
+    Decode the upload once and return the Gemini copy and the page thumbnail.
+
+    `upload` is raw bytes or a file object (an UploadedFile streams from disk).
+    """
+    source = BytesIO(upload) if isinstance(upload, bytes) else upload
+    if hasattr(source, "seek"):
+        source.seek(0)
+    try:
+        with Image.open(source) as image:
+            # let the JPEG decoder skip detail we are about to throw away
+            image.draft("RGB", (ANALYSIS_MAX_EDGE, ANALYSIS_MAX_EDGE))
+            size = image.size
+            image = ImageOps.exif_transpose(image).convert("RGB")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ImageDecodeError(f"Could not read the uploaded image: {e}") from e
+
+    return PreparedImage(
+        analysis_bytes=_encode(image, ANALYSIS_MAX_EDGE, ANALYSIS_QUALITY),
+        thumbnail_bytes=_encode(image, THUMBNAIL_MAX_EDGE, THUMBNAIL_QUALITY),
+        size=size,
+    )
+
+
+# -------------------------------------------------------
+# Thumbnails keyed by the SHA-256 of the original upload
+# -------------------------------------------------------
+def _thumbnail_key(digest):
+    return f"thumbnail:{digest}"
+
+
+def save_thumbnail(digest, data):
+    caches[SHARED_CACHE_ALIAS].set(_thumbnail_key(digest), data, THUMBNAIL_TTL)
+
+
+def get_thumbnail(digest):
+    return caches[SHARED_CACHE_ALIAS].get(_thumbnail_key(digest))
@@ -0,0 +1,97 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+
+
+# -------------------------------------------------------
+# Cold-start import profile (python -X importtime)
+# -------------------------------------------------------
+# A fresh interpreter runs django.setup() and imports one module (the URLconf
+# by default), which is what a cold serverless instance does before it can
+# answer. -X importtime writes one line per module to stderr.
+
+# packages that only the code paths using them should import
+HEAVY_MODULES = ("google.generativeai", "xgboost", "sklearn", "joblib", "scipy", "pandas", "numpy")
+
+# ms to import the URLconf after django.setup(); about 0.15s now, 2.5s with Gemini and XGBoost eager.
+# Checked by `manage.py import_profile --budget`, not the unit tests: timings depend on the machine.
+URLCONF_BUDGET_MS = 1000
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$")
+
+# __import__, not importlib.import_module(): only the C import path is timed
+_SCRIPT = """
+import json, sys, django
+django.setup()
+__import__(sys.argv[1])
+print(json.dumps(sorted(m for m in sys.argv[2:] if m in sys.modules)))
+"""
+
+
+class ImportProfile:
+    """
+    `modules` is [(name, self_us, cumulative_us, depth)] in the order
+    -X importtime reports them; `heavy` lists the HEAVY_MODULES that were loaded.
+    """
+
+    def __init__(self, target, modules, heavy):
+        self.target = target
+        self.modules = modules
+        self.heavy = heavy
+
+    @property
+    def total_us(self):
+        return sum(self_us for _, self_us, _, _ in self.modules)
+
+    def cumulative_us(self, name):
+        """Time to import `name` including everything it pulled in (0 if it was not imported)."""
+        return next((cumulative for module, _, cumulative, _ in self.modules if module == name), 0)
+
+    def by_package(self):
+        """[(top-level package, self time in us, module count)], slowest first."""
+        totals = defaultdict(lambda: [0, 0])
+        for name, self_us, _, _ in self.modules:
+            total = totals[name.split(".")[0]]
+            total[0] += self_us
+            total[1] += 1
+        return sorted(((package, us, count) for package, (us, count) in totals.items()),
+                      key=lambda row: row[1], reverse=True)
+
+    def as_dict(self, top=None):
+        return {
+            "target": self.target,
+            "total_ms": self.total_us / 1000,
+            "target_ms": self.cumulative_us(self.target) / 1000,
+            "heavy": self.heavy,
+            "packages": [{"package": package, "self_ms": us / 1000, "modules": count}
+                         for package, us, count in self.by_package()[:top]],
+        }
+
+
+def parse_importtime(text):
+    modules = []
+    for line in text.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return modules
+
+
+def profile(target=None, heavy=HEAVY_MODULES):
+    """Import `target` (default ROOT_URLCONF) in a fresh interpreter and profile it."""
+    target = target or settings.ROOT_URLCONF
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "myproject.settings")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _SCRIPT, target, *heavy],
+        capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+    )
+    if result.returncode:
+        raise RuntimeError(f"Importing {target} failed:\n{result.stderr[-2000:]}")
+    return ImportProfile(target, parse_importtime(result.stderr), json.loads(result.stdout.strip().splitlines()[-1]))
@@ -0,0 +1,175 @@
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from io import BytesIO
+
+import requests
+from django.urls import reverse
+from PIL import Image
+
+
+# -------------------------------------------------------
+# Load driver: replay a page and city mix against a running server
+# -------------------------------------------------------
+
+# share of page views per route name in myapp.urls; "upload" posts a sky photo to the image page
+DEFAULT_PAGE_MIX = {"today": 40, "hourly": 20, "10day": 15, "monthly": 15, "image": 5, "upload": 5}
+# roughly by population
+DEFAULT_CITY_MIX = {"ahmedabad": 35, "surat": 30, "vadodara": 15, "rajkot": 12, "gandhinagar": 8}
+
+CITY_PAGES = {"today", "hourly", "10day", "monthly"}
+REQUEST_TIMEOUT = 60
+
+
+def parse_mix(text, known=None):
+    """"today=50,hourly=20" -> {"today": 50.0, "hourly": 20.0}."""
+    mix = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if known is not None and name not in known:
+            raise ValueError(f"Unknown name '{name}' (expected one of {', '.join(known)})")
+        try:
+            mix[name] = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f"Bad weight in '{item}'")
+        if mix[name] < 0:
+            raise ValueError(f"Negative weight in '{item}'")
+    if not any(mix.values()):
+        raise ValueError("The mix needs at least one positive weight")
+    return mix
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Sample:
+    __slots__ = ("route", "status", "seconds", "error")
+
+    def __init__(self, route, status, seconds, error=None):
+        self.route = route
+        self.status = status
+        self.seconds = seconds
+        self.error = error
+
+    @property
+    def failed(self):
+        return self.error is not None or self.status >= 400
+
+
+def sky_jpeg(rng):
+    """A small JPEG in a random colour, so uploads are not all cache hits."""
+    out = BytesIO()
+    colour = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+    Image.new("RGB", (320, 240), colour).save(out, format="JPEG")
+    return out.getvalue()
+
+
+class LoadDriver:
+    """
+    `concurrency` virtual users, each with its own session (cookies), pick a
+    page and a city from the weighted mixes until `duration` seconds pass or
+    `max_requests` requests have been sent.
+    """
+
+    def __init__(self, base_url, page_mix=None, city_mix=None, concurrency=8, duration=30.0,
+                 max_requests=None, seed=None):
+        self.base_url = base_url.rstrip("/")
+        self.page_mix = page_mix or DEFAULT_PAGE_MIX
+        self.city_mix = city_mix or DEFAULT_CITY_MIX
+        self.concurrency = concurrency
+        self.duration = duration
+        self.max_requests = max_requests
+        self.seed = seed
+        # city pages are requested at their canonical /<page>/<city>/ URL
+        self.paths = {page: reverse("image" if page == "upload" else page)
+                      for page in self.page_mix if page not in CITY_PAGES}
+
+        self.samples = []
+        self.lock = threading.Lock()
+        self.sent = 0
+
+    def claim_request(self):
+        with self.lock:
+            if self.max_requests is not None and self.sent >= self.max_requests:
+                return False
+            self.sent += 1
+            return True
+
+    def request(self, session, rng, page):
+        if page in CITY_PAGES:
+            city = rng.choices(list(self.city_mix), weights=list(self.city_mix.values()))[0]
+            return session.get(self.base_url + reverse(f"{page}_city", args=[city]), timeout=REQUEST_TIMEOUT)
+        url = self.base_url + self.paths[page]
+        if page == "upload":
+            if "csrftoken" not in session.cookies:
+                session.get(url, timeout=REQUEST_TIMEOUT)
+            return session.post(
+                url,
+                data={"csrfmiddlewaretoken": session.cookies.get("csrftoken", "")},
+                files={"image": ("sky.jpg", sky_jpeg(rng), "image/jpeg")},
+                headers={"Referer": url},
+                timeout=REQUEST_TIMEOUT,
+            )
+        return session.get(url, timeout=REQUEST_TIMEOUT)
+
+    def user(self, number, deadline):
+        rng = random.Random(None if self.seed is None else self.seed + number)
+        pages, weights = list(self.page_mix), list(self.page_mix.values())
+        with requests.Session() as session:
+            while time.monotonic() < deadline and self.claim_request():
+                page = rng.choices(pages, weights=weights)[0]
+                started = time.perf_counter()
+                try:
+                    response = self.request(session, rng, page)
+                    sample = Sample(page, response.status_code, time.perf_counter() - started)
+                except requests.RequestException as e:
+                    sample = Sample(page, 0, time.perf_counter() - started, error=str(e))
+                with self.lock:
+                    self.samples.append(sample)
+
+    def run(self):
+        started = time.monotonic()
+        deadline = started + self.duration
+        users = [threading.Thread(target=self.user, args=(i, deadline), daemon=True)
+                 for i in range(self.concurrency)]
+        for thread in users:
+            thread.start()
+        for thread in users:
+            thread.join()
+        return summarize(self.samples, time.monotonic() - started)
+
+
+def summarize(samples, elapsed):
+    """Per-route and overall throughput, latency percentiles (ms) and error rate."""
+    by_route = defaultdict(list)
+    for sample in samples:
+        by_route[sample.route].append(sample)
+    by_route["all"] = list(samples)
+
+    report = {}
+    for route, route_samples in by_route.items():
+        latencies = sorted(s.seconds * 1000 for s in route_samples)
+        errors = sum(1 for s in route_samples if s.failed)
+        statuses = defaultdict(int)
+        for s in route_samples:
+            statuses[str(s.status or "error")] += 1
+        report[route] = {
+            "requests": len(route_samples),
+            "errors": errors,
+            "error_rate": errors / len(route_samples) if route_samples else 0.0,
+            "rps": len(route_samples) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50),
+            "p90_ms": percentile(latencies, 90),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": latencies[-1] if latencies else None,
+            "statuses": dict(statuses),
+        }
+    return {"elapsed_s": elapsed, "routes": report}
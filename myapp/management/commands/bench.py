@@ -0,0 +1,77 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Time model loading, feature building, inference, Gemini reply parsing, "
+        "data shaping and template rendering on recorded fixtures (no network). "
+        "Optionally compare against a saved baseline and fail on regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stage", action="append", dest="patterns",
+                            help='Only run stages matching this pattern, e.g. "render:*" (repeatable).')
+        parser.add_argument("--repeat", type=int, default=5,
+                            help="Timing runs per stage (default 5).")
+        parser.add_argument("--number", type=int,
+                            help="Calls per timing run. Default: calibrated per stage to ~0.2s.")
+        parser.add_argument("--output",
+                            help="Write the results as JSON to this file ('-' for stdout).")
+        parser.add_argument("--baseline",
+                            help="Compare against results saved earlier with --output.")
+        parser.add_argument("--threshold", type=float, default=benchmarks.DEFAULT_THRESHOLD,
+                            help="Relative slowdown that counts as a regression (default 0.25).")
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1")
+
+        baseline = None
+        if options["baseline"]:
+            try:
+                baseline = json.loads(Path(options["baseline"]).read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline: {e}")
+
+        results = benchmarks.run(options["patterns"], repeat=options["repeat"], number=options["number"])
+        if not results["stages"]:
+            raise CommandError("No stage matches --stage")
+
+        if options["output"] == "-":
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.write_table(results)
+            if options["output"]:
+                Path(options["output"]).write_text(json.dumps(results, indent=2))
+                self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            self.check_baseline(results, baseline, options["threshold"])
+
+    def write_table(self, results):
+        for name, result in results["stages"].items():
+            if "skipped" in result:
+                self.stdout.write(f"{name:<32} skipped: {result['skipped']}")
+            else:
+                self.stdout.write(
+                    f"{name:<32} {result['min_ms']:10.3f} ms  "
+                    f"(median {result['median_ms']:.3f}, {result['repeat']}x{result['number']})"
+                )
+
+    def check_baseline(self, results, baseline, threshold):
+        rows = benchmarks.compare(results, baseline, threshold)
+        regressed = [row for row in rows if row[4]]
+        for name, before, after, ratio, is_regression in rows:
+            marker = "REGRESSED" if is_regression else ""
+            self.stdout.write(f"{name:<32} {before:10.3f} -> {after:10.3f} ms  x{ratio:.2f} {marker}")
+        if regressed:
+            raise CommandError(
+                f"{len(regressed)} stage(s) slower than the baseline by more than {threshold:.0%}: "
+                + ", ".join(row[0] for row in regressed)
+            )
+        self.stdout.write(f"No regressions against the baseline ({len(rows)} stages compared)")
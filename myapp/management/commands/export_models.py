@@ -0,0 +1,65 @@
+import joblib
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import benchmarks
+from myapp.real_model_testing_3.model_registry import registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert the pickled XGBoost estimators to native booster files (UBJ or JSON) "
+        "next to them, optionally with tree-pruned variants, then compare load time, "
+        "predict time and output of every artifact against the pickle."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("models", nargs="*",
+                            help=f"Models to export (default: all of {', '.join(registry.files)}).")
+        parser.add_argument("--format", choices=["ubj", "json"], default="ubj",
+                            help="Native format to write (default ubj, the smaller and faster to load).")
+        parser.add_argument("--prune", type=int, action="append", default=[], metavar="ROUNDS",
+                            help="Also write a variant keeping only the first ROUNDS boosting rounds, "
+                                 "loaded with MODEL_VARIANT=prunedROUNDS (repeatable).")
+        parser.add_argument("--no-compare", action="store_true",
+                            help="Only write the files.")
+
+    def handle(self, *args, **options):
+        names = options["models"] or list(registry.files)
+        unknown = [name for name in names if name not in registry.files]
+        if unknown:
+            raise CommandError(f"Unknown model(s): {', '.join(unknown)}")
+        if any(rounds < 1 for rounds in options["prune"]):
+            raise CommandError("--prune needs a positive number of rounds")
+
+        for name in names:
+            source = registry.base_dir / registry.files[name]
+            if not source.exists():
+                self.stderr.write(f"{name}: {source.name} not found, skipped")
+                continue
+
+            booster = joblib.load(source).get_booster()
+            target = source.with_suffix("." + options["format"])
+            booster.save_model(target)
+            self.stdout.write(f"{name}: wrote {target.name} ({booster.num_boosted_rounds()} rounds)")
+
+            for rounds in options["prune"]:
+                if rounds >= booster.num_boosted_rounds():
+                    self.stderr.write(f"{name}: --prune {rounds} keeps every round, skipped")
+                    continue
+                pruned = source.with_name(f"{source.stem}.pruned{rounds}.{options['format']}")
+                booster[:rounds].save_model(pruned)
+                self.stdout.write(f"{name}: wrote {pruned.name}")
+
+            if not options["no_compare"]:
+                self.write_comparison(name)
+
+    def write_comparison(self, name):
+        self.stdout.write(f"{'artifact':<20} {'load ms':>9} {'predict ms':>11} {'vs pkl':>16}")
+        for label, load_ms, predict_ms, metric, difference in benchmarks.compare_artifacts(registry, name):
+            if metric == "mismatch":
+                shown = f"{difference:.1%} differ"
+            elif metric == "max_abs":
+                shown = f"max |diff| {difference:.4f}"
+            else:
+                shown = "-"
+            self.stdout.write(f"{label:<20} {load_ms:>9.2f} {predict_ms:>11.3f} {shown:>16}")
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.fake_upstream import make_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve recorded OpenWeather, Open-Meteo and Gemini replies locally so the app "
+        "can be load-tested without the real APIs. Start the app with "
+        "FAKE_UPSTREAM_URL=http://HOST:PORT to use it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument("--latency", type=float, default=50,
+                            help="Mean reply latency in milliseconds (default 50).")
+        parser.add_argument("--jitter", type=float, default=20,
+                            help="Latency varies uniformly by up to this many milliseconds (default 20).")
+        parser.add_argument("--error-rate", type=float, default=0.0,
+                            help="Share of requests answered with 503, 0-1 (default 0).")
+        parser.add_argument("--payload-scale", type=int, default=1,
+                            help="Multiply the length of hourly, history and Open-Meteo lists (default 1).")
+        parser.add_argument("--seed", type=int, help="Seed for latency and error draws.")
+        parser.add_argument("--verbose", action="store_true", help="Log every request.")
+
+    def handle(self, *args, **options):
+        if not 0 <= options["error_rate"] <= 1:
+            raise CommandError("--error-rate must be between 0 and 1")
+        if options["latency"] < 0 or options["jitter"] < 0:
+            raise CommandError("--latency and --jitter cannot be negative")
+
+        server = make_server(
+            options["host"], options["port"],
+            latency=options["latency"] / 1000,
+            jitter=options["jitter"] / 1000,
+            error_rate=options["error_rate"],
+            payload_scale=options["payload_scale"],
+            seed=options["seed"],
+            verbose=options["verbose"],
+        )
+        self.stdout.write(f"Fake upstream listening on {server.url}")
+        self.stdout.write(
+            f"Run the app with: FAKE_UPSTREAM_URL={server.url} "
+            "OPENWEATHER_API_KEY=fake GEMINI_API_KEY=fake"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            for (route, status), count in sorted(server.counts.items()):
+                self.stdout.write(f"{route:<32} {status}  {count}")
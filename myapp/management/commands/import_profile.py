@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import import_profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Import the URLconf (or --module) in a fresh interpreter with -X importtime and "
+        "summarise the time per top-level package, as a cold start would pay it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--module", help="Module to import (default: ROOT_URLCONF).")
+        parser.add_argument("--top", type=int, default=20, help="Packages to list (default 20).")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+        parser.add_argument("--budget", type=float, nargs="?", const=import_profile.URLCONF_BUDGET_MS, metavar="MS",
+                            help="Fail when importing the module takes longer than this "
+                                 f"(without MS: {import_profile.URLCONF_BUDGET_MS} ms, the URLconf budget).")
+
+    def handle(self, *args, **options):
+        try:
+            profile = import_profile.profile(options["module"])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        report = profile.as_dict(top=options["top"])
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(f"{'package':<28} {'self ms':>9} {'modules':>8}")
+            for row in report["packages"]:
+                self.stdout.write(f"{row['package']:<28} {row['self_ms']:>9.1f} {row['modules']:>8}")
+            self.stdout.write(f"\n{report['target']}: {report['target_ms']:.1f} ms "
+                              f"(all imports incl. django.setup(): {report['total_ms']:.1f} ms)")
+            if report["heavy"]:
+                self.stdout.write(f"Heavy modules loaded: {', '.join(report['heavy'])}")
+
+        if options["budget"] is not None and report["target_ms"] > options["budget"]:
+            raise CommandError(f"{report['target']} took {report['target_ms']:.1f} ms, budget {options['budget']:.0f} ms")
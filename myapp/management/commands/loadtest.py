@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.loadtest import DEFAULT_CITY_MIX, DEFAULT_PAGE_MIX, LoadDriver, parse_mix
+
+
+def _mix_text(mix):
+    return ",".join(f"{name}={weight:g}" for name, weight in mix.items())
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a weighted page and city mix against a running server and report "
+        "throughput, latency percentiles and error rate per route. Pair with "
+        "`manage.py fake_upstream` to keep the real APIs out of the test."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the app under test.")
+        parser.add_argument("--duration", type=float, default=30, help="Seconds to run (default 30).")
+        parser.add_argument("--requests", type=int, help="Stop after this many requests.")
+        parser.add_argument("--concurrency", type=int, default=8, help="Virtual users (default 8).")
+        parser.add_argument("--pages", default=_mix_text(DEFAULT_PAGE_MIX),
+                            help=f"Page weights (default {_mix_text(DEFAULT_PAGE_MIX)}).")
+        parser.add_argument("--cities", default=_mix_text(DEFAULT_CITY_MIX),
+                            help=f"City weights (default {_mix_text(DEFAULT_CITY_MIX)}).")
+        parser.add_argument("--seed", type=int)
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1")
+        try:
+            page_mix = parse_mix(options["pages"], known=DEFAULT_PAGE_MIX)
+            city_mix = parse_mix(options["cities"], known=DEFAULT_CITY_MIX)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        driver = LoadDriver(
+            options["url"], page_mix=page_mix, city_mix=city_mix,
+            concurrency=options["concurrency"], duration=options["duration"],
+            max_requests=options["requests"], seed=options["seed"],
+        )
+        report = driver.run()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{'route':<10} {'reqs':>6} {'rps':>7} {'err%':>6} "
+                          f"{'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}  (ms)")
+        for route, row in report["routes"].items():
+            if not row["requests"]:
+                continue
+            self.stdout.write(
+                f"{route:<10} {row['requests']:>6} {row['rps']:>7.1f} {row['error_rate'] * 100:>6.1f} "
+                f"{row['p50_ms']:>8.1f} {row['p90_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}"
+            )
+        self.stdout.write(f"{report['elapsed_s']:.1f}s elapsed")
@@ -0,0 +1,109 @@
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from myapp import views
+from myapp.real_model_testing_3.predict_live import predict_days_many
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute current, hourly, 10-day and history data, ML predictions and "
+        "Gemini suggestions for every city so page views read warm data. "
+        "Runs once (for cron) or forever with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--city", action="append", dest="cities",
+                            help="Only prefetch this city (repeatable). Default: all of CITY_COORDS.")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running, one pass every --interval seconds.")
+        parser.add_argument("--interval", type=float, default=15 * 60,
+                            help="Seconds between passes with --loop (default 900).")
+        parser.add_argument("--jitter", type=float, default=60,
+                            help="Random delay up to this many seconds before each pass, "
+                                 "the first one included (default 60).")
+        parser.add_argument("--concurrency", type=int, default=4,
+                            help="Maximum upstream requests in flight (default 4).")
+
+    def handle(self, *args, **options):
+        cities = options["cities"] or list(views.CITY_COORDS)
+        unknown = [c for c in cities if c not in views.CITY_COORDS]
+        if unknown:
+            raise CommandError(f"Unknown city: {', '.join(unknown)}")
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1")
+
+        while True:
+            # spread out instances started together (cron, several --loop workers)
+            time.sleep(random.uniform(0, options["jitter"]))
+            try:
+                self.run_once(cities, options["concurrency"])
+            except Exception as e:
+                if not options["loop"]:
+                    raise
+                # one bad pass (database locked, malformed reply...) must not stop the scheduler
+                logger.exception("Prefetch pass failed", extra={"error": str(e)})
+                self.stderr.write(f"Pass failed: {e}")
+            if not options["loop"]:
+                break
+            self.stdout.write(f"Next pass in {options['interval']:.0f}s (+ up to {options['jitter']:.0f}s jitter)")
+            time.sleep(options["interval"])
+
+    def run_once(self, cities, concurrency):
+        started = time.monotonic()
+        coords = {city: views.CITY_COORDS[city] for city in cities}
+
+        # 1) Upstream HTTP calls only, run concurrently
+        tasks = {}
+        for city, (lat, lon) in coords.items():
+            tasks[(city, "current")] = lambda lat=lat, lon=lon: views.fetch_openweather("weather", lat, lon, refresh=True)
+            tasks[(city, "hourly")] = lambda lat=lat, lon=lon: views.fetch_openweather("forecast/hourly", lat, lon, refresh=True)
+            tasks[(city, "10day")] = lambda lat=lat, lon=lon: views.fetch_openweather("forecast/daily", lat, lon, refresh=True, cnt=10)
+        # all cities and all forecast days share one Open-Meteo request and one inference call
+        tasks[("*", "prediction")] = lambda: predict_days_many(coords)
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {key: pool.submit(fn) for key, fn in tasks.items()}
+            for key, future in futures.items():
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    self.stderr.write(f"{key[0]} {key[1]}: {e}")
+
+        # 2) Database work in this thread (SQLite allows one writer)
+        close_old_connections()
+        predictions = results.get(("*", "prediction"), {})
+        # every city and forecast day in one upsert
+        views.store_predictions({coords[city]: value for city, value in predictions.items()})
+        season = views.get_season(datetime.now().month)
+        entries = []
+        for city, (lat, lon) in coords.items():
+            try:
+                views.ensure_month_history(lat, lon)
+            except Exception as e:
+                self.stderr.write(f"{city} history: {e}")
+
+            current = results.get((city, "current"))
+            if current is None:
+                continue
+            _, pred_temp, pred_weather = predictions[city][0] if predictions.get(city) else (None, None, None)
+            entries.append((views.build_today_data(current), season, pred_temp, pred_weather))
+
+        # one Gemini call for all cities, per-city calls only for gaps in the reply
+        if entries:
+            views.get_suggestions_batch(entries)
+
+        failed = len(tasks) - len(results)
+        self.stdout.write(
+            f"Prefetched {len(coords)} cities in {time.monotonic() - started:.1f}s "
+            f"({len(results)}/{len(tasks)} upstream tasks ok, {failed} failed)"
+        )
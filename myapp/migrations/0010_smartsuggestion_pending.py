@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0009_imageanalysis'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smartsuggestion',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='smartsuggestion',
+            name='pending',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0010_smartsuggestion_pending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPrediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lat', models.FloatField()),
+                ('lon', models.FloatField()),
+                ('date', models.DateField()),
+                ('model_version', models.CharField(max_length=32)),
+                ('temp', models.FloatField()),
+                ('weather', models.CharField(max_length=50)),
+                ('issued', models.DateField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['lat', 'lon', 'model_version', 'issued'], name='myapp_daily_lat_98ff1f_idx')],
+                'unique_together': {('lat', 'lon', 'date', 'model_version')},
+            },
+        ),
+    ]
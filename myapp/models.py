@@ -25,8 +25,44 @@ class SmartSuggestion(models.Model):
     health = models.TextField()
     travel = models.TextField()
 
+    # placeholder row while one worker is asking Gemini (see myapp/suggestions.py)
+    pending = models.BooleanField(default=False)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         unique_together = ('city', 'date')
 
     def __str__(self):
         return f"{self.city} - {self.date}"
+
+
+class DailyPrediction(models.Model):
+    # one model run per city per forecast day; see myapp/predictions.py
+    lat = models.FloatField()
+    lon = models.FloatField()
+    date = models.DateField()
+    model_version = models.CharField(max_length=32)
+
+    temp = models.FloatField()
+    weather = models.CharField(max_length=50)
+    # day the forecast was made: later runs replace earlier ones for the same date
+    issued = models.DateField()
+
+    class Meta:
+        unique_together = ('lat', 'lon', 'date', 'model_version')
+        indexes = [models.Index(fields=['lat', 'lon', 'model_version', 'issued'])]
+
+    def __str__(self):
+        return f"{self.date} - ({self.lat}, {self.lon}): {self.temp}°C {self.weather} [{self.model_version}]"
+
+
+class ImageAnalysis(models.Model):
+    # parsed Gemini analysis for an uploaded image, keyed by the SHA-256 of its bytes
+    sha256 = models.CharField(max_length=64, unique=True)
+    result = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+    hits = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.hits} hits)"
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import time
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.template.loader import get_template
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from myapp import timing
+from myapp.weather_cache import SHARED_CACHE_ALIAS
+
+
+# -------------------------------------------------------
+# Rendered-page cache for the city pages, with ETag / Last-Modified
+# -------------------------------------------------------
+# A page's data version is a hash of its template context (plus the
+# template source). When the data behind a page refreshes, the version
+# changes, and so do the cache key and the ETag. No explicit invalidation
+# is needed. Pages are rendered without the request, so the HTML depends
+# only on (page, city, data) and proxies may cache it.
+
+# old versions are never read again; this only bounds how long they linger
+PAGE_CACHE_TTL = 60 * 60
+
+_template_digests = {}
+
+
+def template_digest(template_name):
+    digest = _template_digests.get(template_name)
+    if digest is None:
+        source = get_template(template_name).template.source
+        digest = _template_digests[template_name] = hashlib.sha256(source.encode()).hexdigest()
+    return digest
+
+
+def data_version(template_name, context):
+    payload = json.dumps(context, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(f"{template_digest(template_name)}\n{payload}".encode()).hexdigest()[:20]
+
+
+def render_page(request, page, city_key, template_name, context, max_age=0):
+    """
+    Cached HTML for (page, city, data version), or 304 when the client's
+    ETag / Last-Modified still matches. `max_age` 0 (e.g. a page rendered
+    without some of its data) makes caches revalidate on every use.
+    """
+    version = data_version(template_name, context)
+    etag = f'"{version}"'
+    cache = caches[SHARED_CACHE_ALIAS]
+    key = f"page:{page}:{city_key}:{version}"
+
+    cached = cache.get(key)
+    last_modified = cached[1] if cached else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if cached is None:
+            with timing.span("render"):
+                body = get_template(template_name).render(context)
+            cached = (body.encode(), int(time.time()))
+            cache.set(key, cached, PAGE_CACHE_TTL)
+        response = HttpResponse(cached[0])
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(cached[1] if cached else int(time.time()))
+    return cache_for(response, max_age)
+
+
+def cache_for(response, max_age):
+    """Public for `max_age` seconds (served stale while revalidating), or revalidate every use if 0."""
+    if max_age:
+        patch_cache_control(response, public=True, max_age=max_age, stale_while_revalidate=max_age)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
@@ -0,0 +1,58 @@
+from datetime import date
+
+from .models import DailyPrediction
+from .real_model_testing_3.model_registry import registry
+from .real_model_testing_3.predict_live import predict_days
+
+
+# -------------------------------------------------------
+# ML predictions: one model run per city per day, kept in the database
+# -------------------------------------------------------
+# The models read daily aggregates, so a run made today stays valid until
+# tomorrow. Rows are tagged with the registry's model_version, so shipping a
+# new artifact makes the next page view predict again.
+
+def as_days(rows):
+    return [(row.date, row.temp, row.weather) for row in rows]
+
+
+def stored(lat, lon, today=None, version=None):
+    """Today's run for a location, [(date, temp, label), ...] from today on ([] if none)."""
+    today = today or date.today()
+    rows = DailyPrediction.objects.filter(
+        lat=lat, lon=lon, model_version=version or registry.version(), issued=today, date__gte=today,
+    ).order_by("date")
+    return as_days(rows)
+
+
+def store_many(predictions, today=None, version=None):
+    """
+    Upsert {(lat, lon): [(date, temp, label), ...]} in one statement; a
+    later run replaces the values an earlier one stored for the same day.
+    """
+    today = today or date.today()
+    version = version or registry.version()
+    rows = [
+        DailyPrediction(lat=lat, lon=lon, date=day, model_version=version, temp=temp, weather=label, issued=today)
+        for (lat, lon), days in predictions.items()
+        for day, temp, label in days
+    ]
+    if rows:
+        DailyPrediction.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["lat", "lon", "date", "model_version"],
+            update_fields=["temp", "weather", "issued"],
+        )
+
+
+def get_forecast_prediction(lat, lon):
+    """Read-through: today's stored run, else predict every forecast day and store it."""
+    today = date.today()
+    days = stored(lat, lon, today)
+    if days:
+        return days
+
+    days = predict_days(lat, lon)
+    store_many({(lat, lon): days}, today)
+    return [day for day in days if day[0] >= today] or days
@@ -0,0 +1,103 @@
+# -------------------------------------------------------
+# Compiled feature layout for the XGBoost models
+# -------------------------------------------------------
+
+class FeatureSchemaError(Exception):
+    """The schema does not match the training columns or a model's feature_names_in_."""
+
+
+# columns computed from the row instead of read from the Open-Meteo "daily" dict
+DERIVED_COLUMNS = (
+    "latitude", "longitude", "day", "month", "day_of_year", "week", "season_num", "weather_code_simplified",
+)
+
+
+def _missing(value):
+    return float("nan") if value is None else value
+
+
+class FeatureSchema:
+    """
+    Maps every training column to a fixed position in a float32 matrix.
+
+    `columns` is the training order. `daily_columns` maps a column to the
+    Open-Meteo daily variable it is read from; the remaining columns must be
+    DERIVED_COLUMNS. Everything is resolved once, here, so a column the schema
+    cannot fill is an import-time error rather than a NaN at predict time.
+    """
+
+    def __init__(self, columns, daily_columns, season, simplify_code, daily_variables=None):
+        self.columns = tuple(columns)
+        self.width = len(self.columns)
+        if len(set(self.columns)) != self.width:
+            raise FeatureSchemaError("Duplicate column in the feature list")
+
+        unknown = [c for c in self.columns if c not in daily_columns and c not in DERIVED_COLUMNS]
+        if unknown:
+            raise FeatureSchemaError(f"No source for feature column(s): {', '.join(unknown)}")
+        if daily_variables is not None:
+            not_fetched = sorted({daily_columns[c] for c in self.columns if c in daily_columns} - set(daily_variables))
+            if not_fetched:
+                raise FeatureSchemaError(f"Daily variable(s) not requested from Open-Meteo: {', '.join(not_fetched)}")
+
+        position = {column: i for i, column in enumerate(self.columns)}
+        # (position, daily variable); a variable used twice is read twice into two columns
+        self.daily = [(position[c], daily_columns[c]) for c in self.columns if c in daily_columns]
+        self.derived = {name: position[name] for name in DERIVED_COLUMNS if name in position}
+        self.season = season
+        self.simplify_code = simplify_code
+
+    def empty(self, rows):
+        # numpy is imported with the first matrix, not with the URLconf
+        import numpy as np
+
+        return np.empty((rows, self.width), dtype=np.float32)
+
+    def build(self, samples, out=None):
+        """
+        Fill a (len(samples), width) float32 matrix.
+
+        Each sample is (lat, lon, daily, index, date): the values at position
+        `index` of every daily array, with the date features of `date`.
+        Missing values (None) become NaN, which XGBoost treats as missing.
+        """
+        samples = list(samples)
+        out = self.empty(len(samples)) if out is None else out
+
+        for column, variable in self.daily:
+            out[:, column] = [_missing(daily[variable][index]) for _, _, daily, index, _ in samples]
+
+        dates = [day for *_, day in samples]
+        derived = {
+            "latitude": lambda: [lat for lat, *_ in samples],
+            "longitude": lambda: [lon for _, lon, *_ in samples],
+            "day": lambda: [d.day for d in dates],
+            "month": lambda: [d.month for d in dates],
+            "day_of_year": lambda: [d.timetuple().tm_yday for d in dates],
+            "week": lambda: [d.isocalendar()[1] for d in dates],
+            "season_num": lambda: [self.season(d.month) for d in dates],
+            "weather_code_simplified": lambda: [
+                self.simplify_code(daily["weather_code"][index]) for _, _, daily, index, _ in samples
+            ],
+        }
+        for name, column in self.derived.items():
+            out[:, column] = derived[name]()
+        return out
+
+    def model_columns(self, model):
+        names = getattr(model, "feature_names_in_", None)
+        if names is None and hasattr(model, "get_booster"):
+            names = model.get_booster().feature_names
+        return None if names is None else tuple(str(n) for n in names)
+
+    def check_model(self, name, model):
+        """Registry check: refuse a model trained on other columns or another order."""
+        expected = self.model_columns(model)
+        if expected is None:
+            return
+        if expected != self.columns:
+            missing = [c for c in expected if c not in self.columns]
+            extra = [c for c in self.columns if c not in expected]
+            detail = (f"missing {missing}, unexpected {extra}" if missing or extra
+                      else "same columns in a different order")
+            raise FeatureSchemaError(f"Model '{name}' was trained on different features: {detail}")
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from myapp import timing
+
+
+# -------------------------------------------------------
+# Model artifacts shipped with the app
+# -------------------------------------------------------
+MODEL_DIR = Path(__file__).resolve().parent
+
+MODEL_FILES = {
+    "temp": "temp_model_xgb_regressor.pkl",
+    "code": "weather_code_model_xgb_classifier.pkl",
+}
+
+
+# tried in this order next to each MODEL_FILES entry; the native booster
+# formats (written by `manage.py export_models`) load without unpickling
+MODEL_FORMATS = (".ubj", ".json", ".pkl")
+NATIVE_FORMATS = (".ubj", ".json")
+
+
+class ModelArtifactMissing(Exception):
+    """Raised when a registered model file is not on disk."""
+
+
+class NativeModel:
+    """
+    A bare xgboost.Booster with the predict() the pipeline calls.
+
+    inplace_predict() reads the float32 feature matrix directly: no DMatrix,
+    no sklearn wrapper validation. Classifiers return class indices like
+    XGBClassifier.predict().
+    """
+
+    def __init__(self, booster):
+        self.booster = booster
+        self.feature_names_in_ = booster.feature_names
+        self.objective = json.loads(booster.save_config())["learner"]["objective"]["name"]
+        best = booster.attr("best_iteration")
+        # same trees the sklearn wrapper uses after early stopping
+        self.iteration_range = (0, int(best) + 1) if best is not None else (0, 0)
+
+    @classmethod
+    def load(cls, path):
+        import xgboost as xgb
+
+        booster = xgb.Booster()
+        booster.load_model(path)
+        return cls(booster)
+
+    def get_booster(self):
+        return self.booster
+
+    def predict(self, X):
+        out = self.booster.inplace_predict(X, iteration_range=self.iteration_range)
+        if self.objective in ("multi:softprob", "multi:softmax"):
+            return out.argmax(axis=1) if out.ndim == 2 else out.astype("int64")
+        if self.objective.startswith("binary:"):
+            return (out > 0.5).astype("int64")
+        return out
+
+
+def load_artifact(path):
+    # xgboost (and, for pickles, joblib and sklearn) are imported here, on
+    # the first model load, rather than with the URLconf
+    path = Path(path)
+    if path.suffix in NATIVE_FORMATS:
+        return NativeModel.load(path)
+    import joblib
+
+    return joblib.load(path)
+
+
+def _current_rss():
+    # Resident memory in bytes (Linux only, None elsewhere)
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class ModelRegistry:
+    """
+    Loads each model artifact once per process and keeps it in memory.
+
+    For a file "temp_model.pkl" the first of temp_model.ubj, temp_model.json
+    and temp_model.pkl on disk is used (see `formats`). With a `variant` such
+    as "pruned200", temp_model.pruned200.ubj/.json are tried before those.
+    """
+
+    def __init__(self, files=None, base_dir=MODEL_DIR, loader=load_artifact, formats=MODEL_FORMATS, variant=None):
+        self.base_dir = Path(base_dir)
+        self.files = dict(MODEL_FILES if files is None else files)
+        self.loader = loader
+        self.formats = tuple(formats)
+        self.variant = variant
+        # callables (name, model) run on every load; they raise to reject the model
+        self.checks = []
+        self._models = {}
+        self._stats = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def candidates(self, name):
+        if name not in self.files:
+            raise KeyError(f"Unknown model '{name}'")
+        configured = self.base_dir / self.files[name]
+        stem = configured.stem
+        paths = []
+        if self.variant:
+            paths += [configured.with_name(f"{stem}.{self.variant}{suffix}")
+                      for suffix in self.formats if suffix in NATIVE_FORMATS]
+        paths += [configured.with_name(stem + suffix) for suffix in self.formats]
+        return paths
+
+    def path(self, name):
+        """The artifact get() loads: the first candidate on disk, else the configured file."""
+        for path in self.candidates(name):
+            if path.exists():
+                return path
+        return self.base_dir / self.files[name]
+
+    def add_check(self, check):
+        self.checks.append(check)
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            # another thread may have loaded it while we waited
+            if name in self._models:
+                return self._models[name]
+
+            path = self.path(name)
+            if not path.exists():
+                raise ModelArtifactMissing(
+                    f"Model artifact '{path.name}' for '{name}' not found in {path.parent}"
+                )
+
+            rss_before = _current_rss()
+            started = time.perf_counter()
+            model = self.loader(path)
+            load_seconds = time.perf_counter() - started
+            timing.record("model_load", load_seconds)
+            rss_after = _current_rss()
+
+            for check in self.checks:
+                check(name, model)
+
+            self._models[name] = model
+            self._stats[name] = {
+                "path": str(path),
+                "file_bytes": path.stat().st_size,
+                "load_seconds": round(load_seconds, 4),
+                "rss_delta_bytes": (
+                    rss_after - rss_before
+                    if rss_before is not None and rss_after is not None
+                    else None
+                ),
+            }
+            return model
+
+    def version(self):
+        """
+        Short hash of every artifact get() would load, for tagging stored
+        predictions; it changes whenever a model file (or its format) does.
+        """
+        if self._version is None:
+            digest = hashlib.sha256()
+            for name in sorted(self.files):
+                path = self.path(name)
+                digest.update(f"{name}:{path.name}:".encode())
+                if path.exists():
+                    with open(path, "rb") as f:
+                        digest.update(hashlib.file_digest(f, "sha256").digest())
+            self._version = digest.hexdigest()[:12]
+        return self._version
+
+    def warm(self, names=None):
+        """Load the given (or all) models, returning {name: error} for failures."""
+        errors = {}
+        for name in names or self.files:
+            try:
+                self.get(name)
+            except ModelArtifactMissing as e:
+                errors[name] = str(e)
+        return errors
+
+    def stats(self):
+        result = {}
+        for name in self.files:
+            entry = {"loaded": name in self._models}
+            entry.update(self._stats.get(name, {"path": str(self.path(name))}))
+            result[name] = entry
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._stats.clear()
+            self._version = None
+
+
+# process-wide registry used by the prediction pipeline
+registry = ModelRegistry(variant=getattr(settings, "MODEL_VARIANT", "") or None)
@@ -1,178 +1,306 @@
-import requests
-import pandas as pd
-import joblib
-from datetime import datetime
+from datetime import date, datetime
+from collections.abc import Mapping
+from django.conf import settings
+from myapp import timing, upstream
+from myapp.real_model_testing_3.feature_schema import FeatureSchema
+from myapp.real_model_testing_3.model_registry import registry
 # from myapp.views import get_city_coords
 
-def predict(city_lat, city_lon):
-        
-
-
-    # -------------------------------------------------------
-    # Load trained models
-    # -------------------------------------------------------
-
-    TEMP_MODEL = joblib.load("myapp/real_model_testing_3/temp_model_xgb_regressor.pkl")
-    CODE_MODEL = joblib.load("myapp/real_model_testing_3/weather_code_model_xgb_classifier.pkl")
-
-    # -------------------------------------------------------
-    # API URL
-    # -------------------------------------------------------
-    API_URL = "https://api.open-meteo.com/v1/forecast"
-
-    # -------------------------------------------------------
-    # Utility: Simplify WMO Weather Code
-    # -------------------------------------------------------
-    def simplify_weather_code(code):
-        if code == 0:
-            return 0
-        elif code == 1:
-            return 1
-        elif code == 2:
-            return 2
-        elif code == 3:
-            return 3
-        elif code == 45:
-            return 4
-        elif code in [51, 53, 55]:
-            return 5
-        elif code in [61, 63, 65]:
-            return 6
-        elif code in [80, 81]:
-            return 7
-        elif code in [95, 96]:
-            return 8
-        else:
-            return 9
-
-    # -------------------------------------------------------
-    # Compute Season
-    # -------------------------------------------------------
-    def get_season(month):
-        if month in [12,1,2]:
-            return 0
-        elif month in [3,4,5]:
-            return 1
-        elif month in [6,7,8]:
-            return 2
-        else:
-            return 3
-
-
-    # -------------------------------------------------------
-    # Fetch Live Weather and Predict
-    # -------------------------------------------------------
-    def predict_weather(lat=city_lat, lon=city_lon):
 
+# -------------------------------------------------------
+# API URL
+# -------------------------------------------------------
+API_URL = f"{settings.OPEN_METEO_URL}/forecast"
+
+DAILY_VARIABLES = [
+    "uv_index_max",
+    "uv_index_clear_sky_max",
+    "precipitation_sum",
+    "wind_speed_10m_max",
+    "wind_gusts_10m_max",
+    "wind_direction_10m_dominant",
+    "shortwave_radiation_sum",
+    "temperature_2m_mean",
+    "cloud_cover_mean",
+    "dew_point_2m_mean",
+    "relative_humidity_2m_mean",
+    "pressure_msl_mean",
+    "surface_pressure_mean",
+    "wind_gusts_10m_mean",
+    "wind_speed_10m_mean",
+    "apparent_temperature_mean",
+    "et0_fao_evapotranspiration",
+    "et0_fao_evapotranspiration_sum",
+    "weather_code"
+]
+
+# -------------------------------------------------------
+# Training column name -> Open-Meteo daily variable
+# -------------------------------------------------------
+DAILY_COLUMNS = {
+    "uv_index_max ()": "uv_index_max",
+    "uv_index_clear_sky_max ()": "uv_index_clear_sky_max",
+    "precipitation_sum (mm)": "precipitation_sum",
+    "wind_speed_10m_max (km/h)": "wind_speed_10m_max",
+    "wind_gusts_10m_max (km/h)": "wind_gusts_10m_max",
+    "wind_direction_10m_dominant (°)": "wind_direction_10m_dominant",
+    "shortwave_radiation_sum (MJ/m²)": "shortwave_radiation_sum",
+    "temperature_2m_mean (°C)": "temperature_2m_mean",
+    "cloud_cover_mean (%)": "cloud_cover_mean",
+    "dew_point_2m_mean (°C)": "dew_point_2m_mean",
+    "relative_humidity_2m_mean (%)": "relative_humidity_2m_mean",
+    "pressure_msl_mean (hPa)": "pressure_msl_mean",
+    "surface_pressure_mean (hPa)": "surface_pressure_mean",
+    # the training data carries the wind direction twice under two names
+    "winddirection_10m_dominant (°)": "wind_direction_10m_dominant",
+    "wind_gusts_10m_mean (km/h)": "wind_gusts_10m_mean",
+    "wind_speed_10m_mean (km/h)": "wind_speed_10m_mean",
+    "apparent_temperature_mean (°C)": "apparent_temperature_mean",
+    "et0_fao_evapotranspiration_sum (mm)": "et0_fao_evapotranspiration_sum",
+    "et0_fao_evapotranspiration (mm)": "et0_fao_evapotranspiration",
+}
+
+# ---- Use exact same feature order as training ----
+FEATURES = [
+    'uv_index_max ()', 'uv_index_clear_sky_max ()',
+    'precipitation_sum (mm)', 'wind_speed_10m_max (km/h)',
+    'wind_gusts_10m_max (km/h)', 'wind_direction_10m_dominant (°)',
+    'shortwave_radiation_sum (MJ/m²)', 'temperature_2m_mean (°C)',
+    'cloud_cover_mean (%)', 'dew_point_2m_mean (°C)',
+    'relative_humidity_2m_mean (%)', 'pressure_msl_mean (hPa)',
+    'surface_pressure_mean (hPa)', 'winddirection_10m_dominant (°)',
+    'wind_gusts_10m_mean (km/h)', 'wind_speed_10m_mean (km/h)',
+    'apparent_temperature_mean (°C)', 'et0_fao_evapotranspiration_sum (mm)',
+    'et0_fao_evapotranspiration (mm)', 'latitude', 'longitude', 'day',
+    'month', 'day_of_year', 'week', 'season_num','weather_code_simplified'
+]
+
+WEATHER_LABELS = {
+    0: "Clear",
+    1: "Mainly clear",
+    2: "Partly cloudy",
+    3: "Overcast",
+    4: "Fog",
+    5: "Drizzle",
+    6: "Rain",
+    7: "Rain showers",
+    8: "Thunderstorm",
+    9: "Unknown"
+}
+
+
+# -------------------------------------------------------
+# Utility: Simplify WMO Weather Code
+# -------------------------------------------------------
+def simplify_weather_code(code):
+    if code == 0:
+        return 0
+    elif code == 1:
+        return 1
+    elif code == 2:
+        return 2
+    elif code == 3:
+        return 3
+    elif code == 45:
+        return 4
+    elif code in [51, 53, 55]:
+        return 5
+    elif code in [61, 63, 65]:
+        return 6
+    elif code in [80, 81]:
+        return 7
+    elif code in [95, 96]:
+        return 8
+    else:
+        return 9
+
+
+# -------------------------------------------------------
+# Compute Season
+# -------------------------------------------------------
+def get_season(month):
+    if month in [12,1,2]:
+        return 0
+    elif month in [3,4,5]:
+        return 1
+    elif month in [6,7,8]:
+        return 2
+    else:
+        return 3
+
+
+# -------------------------------------------------------
+# Fetch Live Weather (one request for many locations)
+# -------------------------------------------------------
+
+# Open-Meteo accepts comma separated coordinate lists; keep URLs a sane length
+BULK_CHUNK_SIZE = 100
+# days of daily data per location, enough to cover the 10-day page
+FORECAST_DAYS = 10
+
+
+def fetch_daily_many(locations):
+    """Return the Open-Meteo "daily" dict for each (lat, lon), in input order."""
+    locations = list(locations)
+    results = []
+
+    for start in range(0, len(locations), BULK_CHUNK_SIZE):
+        chunk = locations[start:start + BULK_CHUNK_SIZE]
         params = {
-            "latitude": lat,
-            "longitude": lon,
-            "daily": [
-                "uv_index_max",
-                "uv_index_clear_sky_max",
-                "precipitation_sum",
-                "wind_speed_10m_max",
-                "wind_gusts_10m_max",
-                "wind_direction_10m_dominant",
-                "shortwave_radiation_sum",
-                "temperature_2m_mean",
-                "cloud_cover_mean",
-                "dew_point_2m_mean",
-                "relative_humidity_2m_mean",
-                "pressure_msl_mean",
-                "surface_pressure_mean",
-                "wind_gusts_10m_mean",
-                "wind_speed_10m_mean",
-                "apparent_temperature_mean",
-                "et0_fao_evapotranspiration",
-                "et0_fao_evapotranspiration_sum",
-                "weather_code"
-            ],
+            "latitude": ",".join(str(lat) for lat, _ in chunk),
+            "longitude": ",".join(str(lon) for _, lon in chunk),
+            "daily": DAILY_VARIABLES,
+            "forecast_days": FORECAST_DAYS,
             "timezone": "auto"
         }
 
-        response = requests.get(API_URL, params=params).json()
-        d = response["daily"]
-
-        # Use first entry of each list (today)
-        df = pd.DataFrame({
-            "uv_index_max ()": [d["uv_index_max"][0]],
-            "uv_index_clear_sky_max ()": [d["uv_index_clear_sky_max"][0]],
-            "precipitation_sum (mm)": [d["precipitation_sum"][0]],
-            "wind_speed_10m_max (km/h)": [d["wind_speed_10m_max"][0]],
-            "wind_gusts_10m_max (km/h)": [d["wind_gusts_10m_max"][0]],
-            "wind_direction_10m_dominant (°)": [d["wind_direction_10m_dominant"][0]],
-            "shortwave_radiation_sum (MJ/m²)": [d["shortwave_radiation_sum"][0]],
-            "temperature_2m_mean (°C)": [d["temperature_2m_mean"][0]],
-            "cloud_cover_mean (%)": [d["cloud_cover_mean"][0]],
-            "dew_point_2m_mean (°C)": [d["dew_point_2m_mean"][0]],
-            "relative_humidity_2m_mean (%)": [d["relative_humidity_2m_mean"][0]],
-            "pressure_msl_mean (hPa)": [d["pressure_msl_mean"][0]],
-            "surface_pressure_mean (hPa)": [d["surface_pressure_mean"][0]],
-            "wind_gusts_10m_mean (km/h)": [d["wind_gusts_10m_mean"][0]],
-            "wind_speed_10m_mean (km/h)": [d["wind_speed_10m_mean"][0]],
-            "apparent_temperature_mean (°C)": [d["apparent_temperature_mean"][0]],
-            "et0_fao_evapotranspiration_sum (mm)": [d["et0_fao_evapotranspiration_sum"][0]],
-            "et0_fao_evapotranspiration (mm)": [d["et0_fao_evapotranspiration"][0]],
-            "latitude": [lat],
-            "longitude": [lon]
-        })
-
-        # ---- Date Features ----
-        today = datetime.now()
-        df["day"] = today.day
-        df["month"] = today.month
-        df["day_of_year"] = today.timetuple().tm_yday
-        df["week"] = today.isocalendar().week
-
-        # ---- Season ----
-        df["season_num"] = get_season(today.month)
-
-        # ---- weather code simplified ----
-        code_raw = d["weather_code"][0]
-        df["weather_code_simplified"] = simplify_weather_code(code_raw)
-
-        # ---- Use exact same feature order as training ----
-        FEATURES = [
-            'uv_index_max ()', 'uv_index_clear_sky_max ()',
-            'precipitation_sum (mm)', 'wind_speed_10m_max (km/h)',
-            'wind_gusts_10m_max (km/h)', 'wind_direction_10m_dominant (°)',
-            'shortwave_radiation_sum (MJ/m²)', 'temperature_2m_mean (°C)',
-            'cloud_cover_mean (%)', 'dew_point_2m_mean (°C)',
-            'relative_humidity_2m_mean (%)', 'pressure_msl_mean (hPa)',
-            'surface_pressure_mean (hPa)', 'winddirection_10m_dominant (°)',
-            'wind_gusts_10m_mean (km/h)', 'wind_speed_10m_mean (km/h)',
-            'apparent_temperature_mean (°C)', 'et0_fao_evapotranspiration_sum (mm)',
-            'et0_fao_evapotranspiration (mm)', 'latitude', 'longitude', 'day',
-            'month', 'day_of_year', 'week', 'season_num','weather_code_simplified'
-        ]
-
-        # Fix missing column (winddirection_10m_dominant)
-        df["winddirection_10m_dominant (°)"] = df["wind_direction_10m_dominant (°)"]
-
-        df = df[FEATURES]
-
-        # ---- Predict ----
-        pred_temp = TEMP_MODEL.predict(df)[0]
-        pred_code = CODE_MODEL.predict(df)[0]
-
-        return pred_temp, pred_code
-
-    WEATHER_LABELS = {
-        0: "Clear",
-        1: "Mainly clear",
-        2: "Partly cloudy",
-        3: "Overcast",
-        4: "Fog",
-        5: "Drizzle",
-        6: "Rain",
-        7: "Rain showers",
-        8: "Thunderstorm",
-        9: "Unknown"
-    }
-
-    temp, code = predict_weather()
-    weather_type = WEATHER_LABELS.get(int(code), "Unknown")
-
-
-    return temp,weather_type
+        response = upstream.get_json(API_URL, params=params)
+
+        # a single location comes back as an object, several as a list
+        if isinstance(response, dict):
+            response = [response]
+        if len(response) != len(chunk):
+            raise ValueError(
+                f"Open-Meteo returned {len(response)} locations for {len(chunk)} requested"
+            )
+
+        results.extend(item["daily"] for item in response)
+
+    return results
+
+
+def fetch_daily(lat, lon):
+    return fetch_daily_many([(lat, lon)])[0]
+
+
+# -------------------------------------------------------
+# Column positions, checked against every model as it is loaded
+# -------------------------------------------------------
+SCHEMA = FeatureSchema(FEATURES, DAILY_COLUMNS, get_season, simplify_weather_code, DAILY_VARIABLES)
+registry.add_check(SCHEMA.check_model)
+
+
+# -------------------------------------------------------
+# Feature matrix for many locations (one row each)
+# -------------------------------------------------------
+def build_features(rows, today=None):
+    """
+    float32 feature matrix, one row per (lat, lon, daily) in `rows`, read
+    from the first day of each daily dict (today).
+    """
+    today = today or datetime.now()
+    return SCHEMA.build((lat, lon, daily, 0, today) for lat, lon, daily in rows)
+
+
+def forecast_dates(daily):
+    """Local date of every day in an Open-Meteo daily dict."""
+    return [date.fromisoformat(day) for day in daily["time"]]
+
+
+def build_forecast_features(rows):
+    """
+    float32 feature matrix with one row per forecast day of every
+    (lat, lon, daily) in `rows`, location by location. The date features of
+    each row come from that day's date, not from today.
+    """
+    return SCHEMA.build(
+        (lat, lon, daily, index, day)
+        for lat, lon, daily in rows
+        for index, day in enumerate(forecast_dates(daily))
+    )
+
+
+# -------------------------------------------------------
+# Predict from already fetched daily data
+# -------------------------------------------------------
+def predict_from_daily(rows):
+    if not rows:
+        return []
+
+    TEMP_MODEL = registry.get("temp")
+    CODE_MODEL = registry.get("code")
+
+    with timing.span("features"):
+        df = build_features(rows)
+
+    # ---- Predict (one call per model for every row) ----
+    with timing.span("inference"):
+        temps = TEMP_MODEL.predict(df)
+        codes = CODE_MODEL.predict(df)
+
+    return [
+        (temp, WEATHER_LABELS.get(int(code), "Unknown"))
+        for temp, code in zip(temps, codes)
+    ]
+
+
+def predict_days_from_daily(rows):
+    """
+    Every forecast day of every row in one predict call per model.
+
+    Returns one list per row of (date, temperature, weather label).
+    """
+    if not rows:
+        return []
+
+    TEMP_MODEL = registry.get("temp")
+    CODE_MODEL = registry.get("code")
+
+    with timing.span("features"):
+        X = build_forecast_features(rows)
+
+    with timing.span("inference"):
+        temps = TEMP_MODEL.predict(X)
+        codes = CODE_MODEL.predict(X)
+
+    results, start = [], 0
+    for _, _, daily in rows:
+        days = forecast_dates(daily)
+        results.append([
+            (day, float(temp), WEATHER_LABELS.get(int(code), "Unknown"))
+            for day, temp, code in zip(days, temps[start:start + len(days)], codes[start:start + len(days)])
+        ])
+        start += len(days)
+    return results
+
+
+def _for_locations(locations, predict_rows):
+    # fail before any network call if an artifact is missing
+    registry.get("temp")
+    registry.get("code")
+
+    if isinstance(locations, Mapping):
+        keys = list(locations)
+        results = _for_locations([locations[key] for key in keys], predict_rows)
+        return dict(zip(keys, results))
+
+    locations = list(locations)
+    dailies = fetch_daily_many(locations)
+    rows = [(lat, lon, daily) for (lat, lon), daily in zip(locations, dailies)]
+    return predict_rows(rows)
+
+
+def predict_many(locations):
+    """
+    Predict (temperature, weather label) for many locations at once.
+
+    `locations` is either a list of (lat, lon) pairs, returning a list in the
+    same order, or a mapping like CITY_COORDS, returning a dict with the same keys.
+    """
+    return _for_locations(locations, predict_from_daily)
+
+
+def predict_days_many(locations):
+    """
+    Like predict_many(), but for every day Open-Meteo returned: one list of
+    (date, temperature, weather label) per location.
+    """
+    return _for_locations(locations, predict_days_from_daily)
+
+
+def predict_days(city_lat, city_lon):
+    return predict_days_many([(city_lat, city_lon)])[0]
+
+
+def predict(city_lat, city_lon):
+    return predict_many([(city_lat, city_lon)])[0]
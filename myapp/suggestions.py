@@ -0,0 +1,283 @@
+import logging
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import timing, upstream
+from .gemini_parser import parse_batch_suggestions, parse_suggestions
+from .models import SmartSuggestion
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------------------------------------
+# Smart suggestions: one Gemini call per city per day
+# -------------------------------------------------------
+SUGGESTION_FIELDS = ("clothing", "activities", "health", "travel")
+
+# a claim older than this is treated as abandoned (worker died mid-call)
+PENDING_LEASE = timedelta(seconds=60)
+# how long a caller waits for someone else's generation before giving up
+WAIT_SECONDS = 5
+POLL_INTERVAL = 0.25
+
+NO_API_KEY_MESSAGE = "Configure Gemini API key to get suggestions"
+PENDING_MESSAGE = "Suggestions are being prepared, refresh in a moment"
+FAILED_MESSAGE = "Unable to generate suggestions"
+
+# one lock per (city, date) inside this process
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _message(text):
+    return {"clothing": text, "activities": "", "health": "", "travel": ""}
+
+
+def is_final(result):
+    """False for no suggestions or a stand-in message; pages showing those must not be cached."""
+    return result is not None and result["clothing"] not in (NO_API_KEY_MESSAGE, PENDING_MESSAGE, FAILED_MESSAGE)
+
+
+def _key_lock(city, day):
+    with _locks_guard:
+        lock = _locks.get((city, day))
+        if lock is None:
+            # locks for earlier days are never needed again
+            for key in [k for k in _locks if k[1] != day]:
+                del _locks[key]
+            lock = _locks[(city, day)] = threading.Lock()
+        return lock
+
+
+def as_dict(record):
+    return {field: getattr(record, field) for field in SUGGESTION_FIELDS}
+
+
+def ready_record(city, day):
+    return SmartSuggestion.objects.filter(city=city, date=day, pending=False).first()
+
+
+def claim(city, day, now=None):
+    """
+    Try to become the one worker generating suggestions for (city, day).
+
+    The claim is a pending placeholder row, so the unique (city, date)
+    constraint decides between worker processes. A claim whose lease has run
+    out is taken over.
+    """
+    now = now or timezone.now()
+    try:
+        with transaction.atomic():
+            SmartSuggestion.objects.create(
+                city=city, date=day, pending=True, claimed_at=now,
+                **{field: "" for field in SUGGESTION_FIELDS},
+            )
+        return True
+    except IntegrityError:
+        return SmartSuggestion.objects.filter(
+            city=city, date=day, pending=True, claimed_at__lt=now - PENDING_LEASE
+        ).update(claimed_at=now) == 1
+
+
+def release(city, day):
+    """Drop an unfinished claim so the next request can try again."""
+    SmartSuggestion.objects.filter(city=city, date=day, pending=True).delete()
+
+
+def store(city, day, result):
+    SmartSuggestion.objects.update_or_create(
+        city=city, date=day,
+        defaults={**{field: result.get(field, "") for field in SUGGESTION_FIELDS},
+                  "pending": False, "claimed_at": None},
+    )
+
+
+def wait_for_record(city, day, timeout=None):
+    """Poll for the row another worker is generating; None if it is not ready in time."""
+    deadline = time.monotonic() + (WAIT_SECONDS if timeout is None else timeout)
+    while True:
+        record = ready_record(city, day)
+        if record is not None or time.monotonic() >= deadline:
+            return record
+        time.sleep(POLL_INTERVAL)
+
+
+def suggestion_prompt(weather_data, season, pred_temp, pred_weather):
+    return f"""Based on the following weather conditions, provide brief, practical suggestions (max 2 lines each) suitable for Gujarat, India:
+
+Current Weather:
+- City: {weather_data['city']}
+- Temperature: {weather_data['temp']}°C (Feels like: {weather_data['feels_like']}°C)
+- Humidity: {weather_data['humidity']}
+- Wind: {weather_data['wind_kmh']} km/h
+- Range: {weather_data['min_temp']}°C to {weather_data['max_temp']}°C
+- Season: {season}
+- Predicted Temperature: {pred_temp}°C
+- Predicted Weather: {pred_weather}
+
+Provide EXACTLY 4 suggestions in this format:
+CLOTHING: text
+ACTIVITIES: text
+HEALTH: text
+TRAVEL: text
+"""
+
+
+def generate_suggestions(weather_data, season, pred_temp, pred_weather):
+    """Call Gemini once and parse its reply."""
+    model = upstream.gemini_model("gemini-2.5-flash")
+    with timing.span("gemini"):
+        response = model.generate_content(
+            suggestion_prompt(weather_data, season, pred_temp, pred_weather),
+            request_options={"timeout": upstream.GEMINI_TIMEOUT},
+        )
+    return parse_suggestions(response.text.strip())
+
+
+def get_weather_suggestions(weather_data, season, pred_temp, pred_weather):
+    """
+    Today's suggestions for the city, generated at most once per day.
+
+    Threads in this process queue on a per-(city, date) lock; worker processes
+    coordinate through the pending row (see claim). A caller that cannot get
+    the result within WAIT_SECONDS gets a placeholder instead of a second
+    Gemini call.
+    """
+    today = date.today()
+    city = weather_data['city'].lower().strip()
+
+    record = ready_record(city, today)
+    if record is not None:
+        return as_dict(record)
+
+    if not os.getenv("GEMINI_API_KEY"):
+        return _message(NO_API_KEY_MESSAGE)
+
+    lock = _key_lock(city, today)
+    if not lock.acquire(timeout=WAIT_SECONDS):
+        return _message(PENDING_MESSAGE)
+    try:
+        # the thread we queued behind may have stored it already
+        record = ready_record(city, today)
+        if record is not None:
+            return as_dict(record)
+
+        if not claim(city, today):
+            record = wait_for_record(city, today)
+            return as_dict(record) if record is not None else _message(PENDING_MESSAGE)
+
+        try:
+            result = generate_suggestions(weather_data, season, pred_temp, pred_weather)
+        except Exception as e:
+            release(city, today)
+            logger.warning("Suggestion generation failed", extra={"city": city, "error": str(e)})
+            return _message(FAILED_MESSAGE)
+
+        store(city, today, result)
+        return result
+    finally:
+        lock.release()
+
+
+# -------------------------------------------------------
+# Batch mode: every city in one Gemini call (used by prefetch_weather)
+# -------------------------------------------------------
+def batch_prompt(entries):
+    """`entries` is {city: (weather_data, season, pred_temp, pred_weather)}."""
+    blocks = []
+    for city, (weather_data, season, pred_temp, pred_weather) in entries.items():
+        blocks.append(f"""CITY: {city}
+- Temperature: {weather_data['temp']}°C (Feels like: {weather_data['feels_like']}°C)
+- Humidity: {weather_data['humidity']}
+- Wind: {weather_data['wind_kmh']} km/h
+- Range: {weather_data['min_temp']}°C to {weather_data['max_temp']}°C
+- Season: {season}
+- Predicted Temperature: {pred_temp}°C
+- Predicted Weather: {pred_weather}""")
+
+    return f"""Based on the following weather conditions, provide brief, practical suggestions (max 2 lines each) suitable for Gujarat, India, for each city below:
+
+{chr(10).join(blocks)}
+
+For EVERY city, reply with one block in exactly this format, blocks separated by a blank line:
+CITY: city name as given above
+CLOTHING: text
+ACTIVITIES: text
+HEALTH: text
+TRAVEL: text
+"""
+
+
+def parse_batch(text, cities):
+    """Split a batch reply into {city: suggestions}, keeping only the requested cities."""
+    wanted = {city.lower().strip(): city for city in cities}
+    blocks = {}
+    for name, result in parse_batch_suggestions(text):
+        city = wanted.get(name.lower().strip())
+        if city is not None and any(result.values()):
+            blocks[city] = result
+    return blocks
+
+
+def generate_batch_suggestions(entries):
+    model = upstream.gemini_model("gemini-2.5-flash")
+    with timing.span("gemini"):
+        response = model.generate_content(
+            batch_prompt(entries),
+            request_options={"timeout": upstream.GEMINI_TIMEOUT},
+        )
+    return parse_batch(response.text.strip(), entries)
+
+
+def get_suggestions_batch(entries):
+    """
+    Today's suggestions for several cities with a single Gemini call.
+
+    `entries` is a list of (weather_data, season, pred_temp, pred_weather).
+    Cities that already have a row are skipped, as are cities another worker
+    has claimed. The reply is stored in one transaction; cities missing from
+    it fall back to get_weather_suggestions. If the call itself fails, the
+    claims are released and nothing more is tried until the next pass.
+    Returns {city: suggestions}.
+    """
+    today = date.today()
+    entries = {weather_data['city'].lower().strip(): (weather_data, *rest)
+               for weather_data, *rest in entries}
+
+    results = {}
+    ready = SmartSuggestion.objects.filter(city__in=list(entries), date=today, pending=False)
+    for record in ready:
+        results[record.city] = as_dict(record)
+
+    todo = {city: entry for city, entry in entries.items() if city not in results}
+    if not todo or not os.getenv("GEMINI_API_KEY"):
+        return results
+
+    claimed = {city: entry for city, entry in todo.items() if claim(city, today)}
+    if not claimed:
+        return results
+
+    try:
+        generated = generate_batch_suggestions(claimed)
+    except Exception as e:
+        # most likely quota or a timeout: one call per city would only fail the same way
+        logger.warning("Batch suggestion generation failed", extra={"cities": list(claimed), "error": str(e)})
+        for city in claimed:
+            release(city, today)
+        return results
+
+    with transaction.atomic():
+        for city, result in generated.items():
+            store(city, today, result)
+    results.update(generated)
+
+    for city, entry in claimed.items():
+        if city not in generated:
+            release(city, today)
+            results[city] = get_weather_suggestions(*entry)
+    return results
@@ -1,3 +1,1379 @@
-from django.test import TestCase
+import json
+import logging
+import random
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from io import BytesIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import requests
+import xgboost as xgb
+from PIL import Image
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import (
+    AsyncRequestFactory, LiveServerTestCase, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.utils import timezone
+
+from myapp import (
+    api, async_views, backfill, benchmarks, fake_upstream, gemini_parser, image_cache, import_profile, loadtest,
+    page_cache, predictions, timing, image_processing, suggestions, upload_handlers, upstream, views, weather_data,
+)
+from myapp.fanout import CallTimeout, fan_out
+from myapp.log_format import JsonFormatter
+from myapp.models import DailyPrediction, ImageAnalysis, MonthlyWeather, SmartSuggestion
+from myapp.real_model_testing_3 import predict_live
+from myapp.real_model_testing_3.feature_schema import FeatureSchema, FeatureSchemaError
+from myapp.real_model_testing_3.model_registry import ModelArtifactMissing, ModelRegistry, NativeModel, load_artifact
+from myapp.weather_cache import TTLCache
+
+
+def make_jpeg(width, height):
+    out = BytesIO()
+    Image.new("RGB", (width, height), (90, 140, 220)).save(out, format="JPEG")
+    return out.getvalue()
+
+
+def make_daily(days=1, value=1.0, code=61, start=date(2025, 10, 18)):
+    daily = {name: [value] * days for name in predict_live.DAILY_VARIABLES}
+    daily["weather_code"] = [code] * days
+    daily["time"] = [(start + timedelta(days=i)).isoformat() for i in range(days)]
+    return daily
+
+
+class FakeModel:
+    """Stand-in for an XGBoost estimator that records each predict() call."""
+
+    def __init__(self, output):
+        self.output = output
+        self.calls = []
+
+    def predict(self, X):
+        self.calls.append(X)
+        return np.full(len(X), self.output)
+
+
+CURRENT_WEATHER = {
+    "name": "Surat",
+    "main": {"temp": 31.4, "feels_like": 34.2, "humidity": 62, "temp_min": 29.0, "temp_max": 33.1},
+    "wind": {"speed": 4.1},
+    "weather": [{"main": "Clouds", "description": "scattered clouds", "icon": "03d"}],
+    "sys": {"sunrise": 1760750000, "sunset": 1760792000},
+}
+
+# keep the shared upstream cache in memory so tests never see prefetched files
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "upstream": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "upstream-tests"},
+}
+
+HOURLY_FORECAST = {"list": [{
+    "dt": 1760770800,
+    "main": {"temp": 30.6, "humidity": 58},
+    "weather": [{"main": "Clear"}],
+    "wind": {"speed": 3.0},
+}]}
+
+SUGGESTIONS = {"clothing": "Light cotton", "activities": "", "health": "", "travel": ""}
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class InlineExecutor:
+    """Runs submitted work immediately so background refreshes are deterministic."""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+def fake_registry(temp=30.0, code=6):
+    registry = ModelRegistry(files={"temp": "t", "code": "c"})
+    registry._models = {"temp": FakeModel(temp), "code": FakeModel(code)}
+    return registry
+
+
+class ModelRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        Path(self.tmp.name, "temp.pkl").write_bytes(b"model")
+        self.loads = []
+
+        def loader(path):
+            self.loads.append(path)
+            return object()
+
+        self.registry = ModelRegistry(
+            files={"temp": "temp.pkl", "code": "code.pkl"},
+            base_dir=self.tmp.name,
+            loader=loader,
+        )
+
+    def test_loads_each_artifact_once(self):
+        first = self.registry.get("temp")
+        second = self.registry.get("temp")
+        self.assertIs(first, second)
+        self.assertEqual(len(self.loads), 1)
+
+    def test_missing_artifact_raises_clear_error(self):
+        with self.assertRaisesMessage(ModelArtifactMissing, "code.pkl"):
+            self.registry.get("code")
+
+    def test_warm_reports_missing_and_stats(self):
+        errors = self.registry.warm()
+        self.assertEqual(list(errors), ["code"])
+
+        stats = self.registry.stats()
+        self.assertTrue(stats["temp"]["loaded"])
+        self.assertEqual(stats["temp"]["file_bytes"], 5)
+        self.assertIn("load_seconds", stats["temp"])
+        self.assertFalse(stats["code"]["loaded"])
+
+    def test_native_artifact_and_variant_preferred_over_pickle(self):
+        Path(self.tmp.name, "temp.ubj").write_bytes(b"booster")
+        self.assertEqual(self.registry.path("temp").name, "temp.ubj")
+
+        Path(self.tmp.name, "temp.pruned50.ubj").write_bytes(b"pruned")
+        registry = ModelRegistry(files={"temp": "temp.pkl"}, base_dir=self.tmp.name, variant="pruned50")
+        self.assertEqual(registry.path("temp").name, "temp.pruned50.ubj")
+        registry = ModelRegistry(files={"temp": "temp.pkl"}, base_dir=self.tmp.name, variant="pruned10")
+        self.assertEqual(registry.path("temp").name, "temp.ubj")
+
+
+class NativeModelTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def export(self, estimator, name):
+        path = Path(self.tmp.name, name)
+        estimator.get_booster().save_model(path)
+        return load_artifact(path)
+
+    def test_classifier_predicts_like_the_sklearn_wrapper(self):
+        rng = np.random.default_rng(0)
+        X = rng.random((200, 4), dtype=np.float32)
+        y = (X[:, 0] * 3).astype(int)
+        classifier = xgb.XGBClassifier(n_estimators=10, max_depth=3).fit(X, y)
+
+        model = self.export(classifier, "code.json")
+        self.assertIsInstance(model, NativeModel)
+        np.testing.assert_array_equal(model.predict(X), classifier.predict(X))
+
+    def test_shipped_regressor_matches_its_pickle(self):
+        registry = ModelRegistry(formats=(".pkl",))
+        if not registry.path("temp").exists():
+            self.skipTest("temperature model artifact not present")
+        pickled = registry.get("temp")
+        X = predict_live.build_forecast_features(benchmarks._rows())
+
+        model = self.export(pickled, "temp.ubj")
+        self.assertEqual(tuple(model.feature_names_in_), tuple(predict_live.FEATURES))
+        np.testing.assert_array_equal(model.predict(X), pickled.predict(X))
+
+
+class FeatureSchemaTests(SimpleTestCase):
+
+    def test_matches_the_shipped_temperature_model(self):
+        registry = ModelRegistry()
+        if not registry.path("temp").exists():
+            self.skipTest("temperature model artifact not present")
+        registry.add_check(predict_live.SCHEMA.check_model)
+
+        model = registry.get("temp")
+        X = predict_live.build_features([(21.17, 72.83, make_daily(value=20.0))])
+
+        self.assertEqual(list(model.feature_names_in_), predict_live.FEATURES)
+        self.assertEqual(model.predict(X).shape, (1,))
+
+    def test_rejects_models_with_other_columns_or_order(self):
+        model = mock.Mock(feature_names_in_=list(reversed(predict_live.FEATURES)))
+
+        with self.assertRaisesMessage(FeatureSchemaError, "different order"):
+            predict_live.SCHEMA.check_model("temp", model)
+
+    def test_unknown_column_fails_when_the_schema_is_built(self):
+        with self.assertRaisesMessage(FeatureSchemaError, "pollen_index"):
+            FeatureSchema(predict_live.FEATURES + ["pollen_index"], predict_live.DAILY_COLUMNS,
+                          predict_live.get_season, predict_live.simplify_weather_code)
+
+    def test_duplicate_source_and_missing_values(self):
+        daily = make_daily()
+        daily["wind_direction_10m_dominant"] = [250]
+        daily["uv_index_max"] = [None]
+
+        X = predict_live.build_features([(21.17, 72.83, daily)], today=datetime(2025, 1, 15))
+        column = predict_live.FEATURES.index
+
+        self.assertEqual(X[0, column("wind_direction_10m_dominant (°)")], 250)
+        self.assertEqual(X[0, column("winddirection_10m_dominant (°)")], 250)
+        self.assertTrue(np.isnan(X[0, column("uv_index_max ()")]))
+        self.assertEqual(X[0, column("season_num")], 0)
+        self.assertEqual(X[0, column("week")], 3)
+
+
+class PredictManyTests(SimpleTestCase):
+
+    def setUp(self):
+        self.registry = fake_registry()
+        patcher = mock.patch.object(predict_live, "registry", self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_one_inference_call_per_model_for_all_rows(self):
+        rows = [(23.0, 72.5, make_daily()), (21.1, 72.8, make_daily()), (22.3, 70.8, make_daily())]
+        results = predict_live.predict_from_daily(rows)
+
+        self.assertEqual(results, [(30.0, "Rain")] * 3)
+        temp_model = self.registry.get("temp")
+        self.assertEqual(len(temp_model.calls), 1)
+        X = temp_model.calls[0]
+        column = predict_live.FEATURES.index
+        self.assertEqual(X.shape, (3, len(predict_live.FEATURES)))
+        self.assertEqual(X.dtype, np.float32)
+        np.testing.assert_allclose(X[:, column("latitude")], [23.0, 21.1, 22.3], rtol=1e-6)
+        self.assertEqual(list(X[:, column("weather_code_simplified")]), [6, 6, 6])
+
+    def test_mapping_returns_results_keyed_like_input(self):
+        coords = {"surat": (21.1, 72.8), "rajkot": (22.3, 70.8)}
+        with mock.patch.object(predict_live, "fetch_daily_many", return_value=[make_daily()] * 2):
+            results = predict_live.predict_many(coords)
+        self.assertEqual(results, {"surat": (30.0, "Rain"), "rajkot": (30.0, "Rain")})
+
+    def test_every_forecast_day_in_one_call_with_its_own_date(self):
+        rows = [(23.0, 72.5, make_daily(days=7, start=date(2025, 11, 28))), (21.1, 72.8, make_daily(days=3))]
+        results = predict_live.predict_days_from_daily(rows)
+
+        self.assertEqual([len(days) for days in results], [7, 3])
+        self.assertEqual(results[0][0], (date(2025, 11, 28), 30.0, "Rain"))
+        self.assertEqual(results[0][-1][0], date(2025, 12, 4))
+        self.assertEqual(results[1][2][0], date(2025, 10, 20))
+
+        temp_model = self.registry.get("temp")
+        self.assertEqual(len(temp_model.calls), 1)
+        X = temp_model.calls[0]
+        column = predict_live.FEATURES.index
+        self.assertEqual(X.shape, (10, len(predict_live.FEATURES)))
+        self.assertEqual(list(X[:7, column("day")]), [28, 29, 30, 1, 2, 3, 4])
+        self.assertEqual(list(X[:7, column("season_num")]), [3, 3, 3, 0, 0, 0, 0])
+        np.testing.assert_allclose(X[7:, column("latitude")], [21.1] * 3, rtol=1e-6)
+
+
+class FetchDailyManyTests(SimpleTestCase):
+
+    def fake_get(self, payload):
+        return mock.patch.object(predict_live.upstream, "get_json", return_value=payload)
+
+    def test_single_request_split_per_location(self):
+        payload = [{"daily": make_daily(value=1.0)}, {"daily": make_daily(value=2.0)}]
+        with self.fake_get(payload) as get:
+            dailies = predict_live.fetch_daily_many([(23.0, 72.5), (21.1, 72.8)])
+
+        get.assert_called_once()
+        params = get.call_args.kwargs["params"]
+        self.assertEqual(params["latitude"], "23.0,21.1")
+        self.assertEqual(params["longitude"], "72.5,72.8")
+        self.assertEqual([d["temperature_2m_mean"][0] for d in dailies], [1.0, 2.0])
+
+    def test_single_location_object_response(self):
+        with self.fake_get({"daily": make_daily(value=3.0)}):
+            daily = predict_live.fetch_daily(23.0, 72.5)
+        self.assertEqual(daily["temperature_2m_mean"], [3.0])
+
+    def test_mismatched_response_length_raises(self):
+        with self.fake_get([{"daily": make_daily()}]):
+            with self.assertRaises(ValueError):
+                predict_live.fetch_daily_many([(23.0, 72.5), (21.1, 72.8)])
+
+
+class TTLCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(maxsize=2, default_ttl=10, stale_ttl=20,
+                              clock=self.clock, executor=InlineExecutor())
+        self.calls = 0
+
+    def fetch(self):
+        self.calls += 1
+        return self.calls
+
+    def test_fresh_hit_does_not_refetch(self):
+        self.assertEqual(self.cache.get_or_fetch("k", self.fetch), 1)
+        self.clock.now = 5
+        self.assertEqual(self.cache.get_or_fetch("k", self.fetch), 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_stale_entry_served_then_refreshed(self):
+        self.cache.get_or_fetch("k", self.fetch)
+        self.clock.now = 15
+        self.assertEqual(self.cache.get_or_fetch("k", self.fetch), 1)
+        self.assertEqual(self.cache.get_or_fetch("k", self.fetch), 2)
+        self.assertEqual(self.cache.stats()["stale_hits"], 1)
+
+    def test_expired_entry_fetched_synchronously(self):
+        self.cache.get_or_fetch("k", self.fetch)
+        self.clock.now = 31
+        self.assertEqual(self.cache.get_or_fetch("k", self.fetch), 2)
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+    def test_least_recently_used_entry_evicted(self):
+        self.cache.get_or_fetch("a", self.fetch)
+        self.cache.get_or_fetch("b", self.fetch)
+        self.cache.get_or_fetch("a", self.fetch)
+        self.cache.get_or_fetch("c", self.fetch)
+
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        self.assertEqual(self.cache.get_or_fetch("a", self.fetch), 1)
+        self.assertEqual(self.cache.get_or_fetch("b", self.fetch), 4)
+
+    def test_failed_fetch_is_not_cached(self):
+        def failing():
+            raise RuntimeError("upstream down")
+
+        with self.assertRaises(RuntimeError):
+            self.cache.get_or_fetch("k", failing)
+        self.assertEqual(self.cache.get_or_fetch("k", self.fetch), 1)
+
+
+class FanOutTests(SimpleTestCase):
+
+    def test_calls_run_concurrently(self):
+        # each call waits for the other: the barrier breaks unless both are in flight at once
+        both = threading.Barrier(2, timeout=2)
+
+        def call(name):
+            both.wait()
+            return name
+
+        results = fan_out({"a": lambda: call("a"), "b": lambda: call("b")}, timeout=5)
+        self.assertEqual(results["a"].value, "a")
+        self.assertEqual(results["b"].value, "b")
+
+    def test_slow_call_times_out_and_errors_are_captured(self):
+        def boom():
+            raise ValueError("bad payload")
+
+        stuck = threading.Event()
+        self.addCleanup(stuck.set)
+        results = fan_out({
+            "slow": lambda: stuck.wait(5),
+            "fast": lambda: 1,
+            "broken": boom,
+        }, timeout=2, deadline=0.1)
+        self.assertIsInstance(results["slow"].error, CallTimeout)
+        self.assertTrue(results["fast"].ok)
+        self.assertIsInstance(results["broken"].error, ValueError)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TodayViewTests(TestCase):
+
+    def setUp(self):
+        caches["upstream"].clear()
+        views.openweather_cache.clear()
+
+    def test_renders_with_whatever_finished(self):
+        with mock.patch.object(views, "fetch_openweather", return_value=CURRENT_WEATHER), \
+                mock.patch.object(predictions, "predict_days", side_effect=ModelArtifactMissing("gone")), \
+                mock.patch.object(views, "get_weather_suggestions", return_value=SUGGESTIONS):
+            response = self.client.get("/", {"city": "surat"}, follow=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.redirect_chain, [("/today/surat/", 302)])
+        self.assertEqual(response.context["today_data"]["city"], "Surat")
+        self.assertIsNone(response.context["pred_temp"])
+        self.assertEqual(response.context["suggestions"], SUGGESTIONS)
+
+
+class HistoryBackfillTests(TestCase):
+
+    def setUp(self):
+        backfill._failures.clear()
+        self.addCleanup(backfill._failures.clear)
+
+    def test_contiguous_dates_grouped_into_week_ranges(self):
+        first = date(2026, 10, 1)
+        dates = [first + timedelta(days=i) for i in range(10)] + [date(2026, 10, 15)]
+        self.assertEqual(backfill.group_ranges(dates), [
+            (date(2026, 10, 1), date(2026, 10, 7)),
+            (date(2026, 10, 8), date(2026, 10, 10)),
+            (date(2026, 10, 15), date(2026, 10, 15)),
+        ])
+
+    def test_rows_bulk_created_and_failures_reported(self):
+        good = [date(2026, 10, 1), date(2026, 10, 2)]
+        bad = date(2026, 10, 5)
+
+        def fake_fetch(lat, lon, first, last, api_key):
+            if first == bad:
+                raise RuntimeError("429 Too Many Requests")
+            return {date(2026, 10, 1): [20.0, 22.0]}
+
+        with mock.patch.object(backfill, "fetch_history_range", side_effect=fake_fetch) as fetch:
+            result = backfill.backfill_history(23.0, 72.5, good + [bad], api_key="key")
+
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(result.created, [date(2026, 10, 1)])
+        self.assertEqual(set(result.failed), {date(2026, 10, 2), bad})
+        self.assertEqual(MonthlyWeather.objects.get(date=date(2026, 10, 1)).avg_temp, 21.0)
+
+        # failed dates wait for RETRY_AFTER_SECONDS before the next attempt
+        self.assertEqual(backfill.due_dates(23.0, 72.5, good + [bad]), [date(2026, 10, 1)])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PrefetchWeatherCommandTests(TestCase):
+
+    def setUp(self):
+        caches["upstream"].clear()
+
+    def test_warms_every_city_with_one_batched_prediction(self):
+        predicted = {city: [(date.today(), 30.0, "Rain")] for city in views.CITY_COORDS}
+        with mock.patch.object(views, "fetch_openweather", return_value=CURRENT_WEATHER) as fetch, \
+                mock.patch("myapp.management.commands.prefetch_weather.predict_days_many",
+                           return_value=predicted) as batch, \
+                mock.patch.object(views, "ensure_month_history") as history, \
+                mock.patch.object(views, "get_suggestions_batch") as suggest:
+            call_command("prefetch_weather", jitter=0, stdout=mock.Mock(), stderr=mock.Mock())
+
+        cities = len(views.CITY_COORDS)
+        self.assertEqual(fetch.call_count, 3 * cities)
+        self.assertTrue(all(call.kwargs["refresh"] for call in fetch.call_args_list))
+        batch.assert_called_once()
+        self.assertEqual(history.call_count, cities)
+        suggest.assert_called_once()
+        self.assertEqual(len(suggest.call_args.args[0]), cities)
+        self.assertEqual(suggest.call_args.args[0][0][2:], (30.0, "Rain"))
+        self.assertEqual(views.get_prediction(*views.CITY_COORDS["surat"]), (30.0, "Rain"))
+
+
+    def test_loop_survives_a_failed_pass_and_jitters_first(self):
+        events = []
+        passes = iter([RuntimeError("database is locked"), None, KeyboardInterrupt()])
+
+        def run_once(cities, concurrency):
+            events.append("pass")
+            outcome = next(passes)
+            if outcome is not None:
+                raise outcome
+
+        command = "myapp.management.commands.prefetch_weather"
+        with mock.patch(f"{command}.Command.run_once", side_effect=run_once), \
+                mock.patch(f"{command}.time.sleep", side_effect=lambda seconds: events.append(seconds)), \
+                mock.patch(f"{command}.random.uniform", return_value=7.0), \
+                self.assertLogs(f"{command}", "ERROR"), \
+                self.assertRaises(KeyboardInterrupt):
+            call_command("prefetch_weather", loop=True, interval=60, stdout=mock.Mock(), stderr=mock.Mock())
+
+        self.assertEqual(events, [7.0, "pass", 60, 7.0, "pass", 60, 7.0, "pass"])
+
+
+class DailyPredictionTests(TestCase):
+
+    def setUp(self):
+        self.today = date.today()
+        self.days = [(self.today + timedelta(days=i), 30.0 + i, "Rain") for i in range(7)]
+        patcher = mock.patch.object(predictions.registry, "version", return_value="v1")
+        self.version = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_read_through_predicts_once_per_day(self):
+        with mock.patch.object(predictions, "predict_days", return_value=self.days) as predict:
+            first = predictions.get_forecast_prediction(23.0, 72.5)
+            with self.assertNumQueries(1):
+                second = predictions.get_forecast_prediction(23.0, 72.5)
+
+        predict.assert_called_once_with(23.0, 72.5)
+        self.assertEqual(first, self.days)
+        self.assertEqual(second, self.days)
+        self.assertEqual(DailyPrediction.objects.count(), 7)
+
+    def test_new_model_version_or_day_predicts_again(self):
+        predictions.store_many({(23.0, 72.5): self.days}, today=self.today - timedelta(days=1))
+        self.assertEqual(predictions.stored(23.0, 72.5), [])
+
+        predictions.store_many({(23.0, 72.5): self.days})
+        self.version.return_value = "v2"
+        self.assertEqual(predictions.stored(23.0, 72.5), [])
+
+    def test_batch_upsert_replaces_earlier_runs(self):
+        predictions.store_many({(23.0, 72.5): self.days, (21.1, 72.8): self.days})
+        later = [(day, temp - 5, "Clear") for day, temp, _ in self.days]
+        with self.assertNumQueries(1):
+            predictions.store_many({(23.0, 72.5): later, (21.1, 72.8): later})
+
+        self.assertEqual(DailyPrediction.objects.count(), 14)
+        self.assertEqual(predictions.stored(21.1, 72.8)[0], (self.today, 25.0, "Clear"))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TenDayViewTests(TestCase):
+
+    def setUp(self):
+        caches["upstream"].clear()
+        views.openweather_cache.clear()
+
+    def test_model_forecast_matched_to_openweather_days(self):
+        forecast = benchmarks.load_json("openweather/forecast_daily.json")
+        first = views.build_forecast_data(forecast)[0]["day"]
+        predicted = [(first + timedelta(days=i), 25.0 + i, "Rain") for i in range(7)]
+        with mock.patch.object(views, "fetch_openweather", return_value=forecast), \
+                mock.patch.object(predictions, "predict_days", return_value=predicted) as predict:
+            response = self.client.get("/10day/surat/")
+
+        self.assertEqual(response.status_code, 200)
+        predict.assert_called_once_with(*views.CITY_COORDS["surat"])
+        rows = response.context["forecast_data"]
+        self.assertEqual([row["model_temp"] for row in rows[:7]], [25.0 + i for i in range(7)])
+        self.assertIsNone(rows[7]["model_temp"])
+        self.assertContains(response, "31° · Rain")
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PageCacheTests(TestCase):
+
+    def setUp(self):
+        caches["upstream"].clear()
+        views.openweather_cache.clear()
+        self.forecast = dict(HOURLY_FORECAST)
+
+    def get(self, path, **headers):
+        with mock.patch.object(views, "fetch_openweather", side_effect=lambda *a, **kw: self.forecast):
+            return self.client.get(path, **headers)
+
+    def test_canonical_page_is_cacheable_and_revalidates(self):
+        first = self.get("/hourly/surat/")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("public", first["Cache-Control"])
+        self.assertIn(f"max-age={views.PAGE_MAX_AGE['hourly']}", first["Cache-Control"])
+        self.assertNotIn("Cookie", first.get("Vary", ""))
+        self.assertNotIn("sessionid", first.cookies)
+
+        with mock.patch.object(page_cache, "get_template", wraps=page_cache.get_template) as template:
+            again = self.get("/hourly/surat/")
+            not_modified = self.get("/hourly/surat/", HTTP_IF_NONE_MATCH=first["ETag"])
+        template.assert_not_called()
+        self.assertEqual(again.content, first.content)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b"")
+        self.assertEqual(self.get("/hourly/surat/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]).status_code, 304)
+
+        # refreshed data → new version, new ETag, full response
+        self.forecast = {"list": HOURLY_FORECAST["list"][1:]}
+        refreshed = self.get("/hourly/surat/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertNotEqual(refreshed["ETag"], first["ETag"])
+
+    def test_session_redirect_for_old_links(self):
+        response = self.client.get("/monthly/", {"city": "rajkot"})
+        self.assertRedirects(response, "/monthly/rajkot/", fetch_redirect_response=False)
+        self.assertRedirects(self.client.get("/hourly/"), "/hourly/rajkot/", fetch_redirect_response=False)
+        self.assertRedirects(self.client.get("/", {"city": "nowhere"}), "/today/ahmedabad/",
+                             fetch_redirect_response=False)
+
+    def test_unknown_city_and_degraded_pages(self):
+        self.assertEqual(self.client.get("/hourly/nowhere/").status_code, 404)
+
+        self.forecast = {"list": []}
+        self.assertEqual(self.get("/hourly/surat/")["Cache-Control"], "no-cache")
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ApiTests(TestCase):
+
+    def setUp(self):
+        caches["upstream"].clear()
+        views.openweather_cache.clear()
+
+    def get(self, path, params=None, suggested=SUGGESTIONS, **headers):
+        replies = {"weather": CURRENT_WEATHER, "forecast/hourly": HOURLY_FORECAST}
+        with mock.patch.object(views, "fetch_openweather", side_effect=lambda endpoint, *a, **kw: replies[endpoint]), \
+                mock.patch.object(views, "get_prediction", return_value=(30.5, "Clear")), \
+                mock.patch.object(views, "get_weather_suggestions", return_value=suggested):
+            return self.client.get(path, params or {}, **headers)
+
+    def test_today_is_typed_and_matches_the_page(self):
+        response = self.get("/api/today/", {"cities": "surat"})
+
+        self.assertEqual(response["Content-Type"], "application/json")
+        city = response.json()["cities"]["surat"]
+        self.assertEqual(city["current"]["humidity"], 62)
+        self.assertEqual(city["current"]["wind_kmh"], 14.8)
+        self.assertEqual(city["current"]["temp"], 31.4)
+        self.assertTrue(city["current"]["sunrise"].endswith("+05:30"))
+        self.assertEqual(city["prediction"], {"temp": 30.5, "weather": "Clear"})
+        self.assertEqual(city["suggestions"], SUGGESTIONS)
+
+        page = self.get("/today/surat/").context["today_data"]
+        self.assertEqual((page["humidity"], page["wind_kmh"], page["temp"]), ("62%", "15 km/h", 31))
+
+    def test_field_selection_across_cities(self):
+        response = self.get("/api/hourly/", {"cities": "surat, Rajkot,surat", "fields": "hours.temp,hours.wind_ms"})
+
+        self.assertEqual(response.json(), {"page": "hourly", "cities": {
+            "surat": {"hours": [{"temp": 30.6, "wind_ms": 3.0}]},
+            "rajkot": {"hours": [{"temp": 30.6, "wind_ms": 3.0}]},
+        }})
+        self.assertEqual(list(self.get("/api/hourly/").json()["cities"]), list(views.CITY_COORDS))
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get("/api/today/", {"cities": "surat,nowhere"}).status_code, 400)
+        response = self.client.get("/api/10day/", {"fields": "days.humidity"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("days.humidity", response.json()["error"])
+
+    def test_cache_headers_and_revalidation(self):
+        first = self.get("/api/hourly/", {"cities": "surat"})
+
+        self.assertIn(f"max-age={views.PAGE_MAX_AGE['hourly']}", first["Cache-Control"])
+        self.assertNotIn("sessionid", first.cookies)
+        not_modified = self.get("/api/hourly/", {"cities": "surat"}, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertNotEqual(self.get("/api/hourly/", {"cities": "rajkot"})["ETag"], first["ETag"])
+
+    def test_placeholder_suggestions_are_not_cached(self):
+        self.assertIn("max-age", self.get("/today/surat/")["Cache-Control"])
+        for suggested in (None, suggestions._message(suggestions.PENDING_MESSAGE)):
+            self.assertEqual(self.get("/today/surat/", suggested=suggested)["Cache-Control"], "no-cache")
+            self.assertEqual(self.get("/api/today/", {"cities": "surat"}, suggested=suggested)["Cache-Control"],
+                             "no-cache")
+
+    @override_settings(PAGE_DEADLINE=0.5)
+    def test_cities_run_concurrently_and_a_stuck_one_is_left_out(self):
+        cities = ["surat", "rajkot", "vadodara"]
+        together = threading.Barrier(len(cities), timeout=5)
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def hourly(city_key):
+            together.wait()  # raises unless every city is in flight at once
+            if city_key == "rajkot":
+                release.wait(5)
+            return {"hours": []}, True
+
+        with mock.patch.dict(views.PAGE_DATA, {"hourly": hourly}):
+            response = self.client.get("/api/hourly/", {"cities": ",".join(cities)})
+
+        self.assertEqual(response.json()["cities"], {"surat": {"hours": []}, "rajkot": None, "vadodara": {"hours": []}})
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+    def test_encoders_agree(self):
+        payload = {"day": date(2025, 10, 18), "at": datetime(2025, 10, 18, 6, 12, tzinfo=weather_data.IST), "t": 1.5}
+        with mock.patch.object(api, "orjson", None):
+            fallback = api.dumps(payload)
+        self.assertEqual(json.loads(fallback), json.loads(api.dumps(payload)))
+        self.assertEqual(json.loads(fallback)["at"], "2025-10-18T06:12:00+05:30")
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers 503 to the first request and JSON afterwards."""
+
+    calls = 0
+
+    def do_GET(self):
+        type(self).calls += 1
+        status = 503 if type(self).calls == 1 else 200
+        body = json.dumps({"ok": True}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class UpstreamClientTests(SimpleTestCase):
+
+    def setUp(self):
+        FlakyHandler.calls = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/data"
+
+    def test_retries_retryable_status_and_records_metrics(self):
+        client = upstream.UpstreamClient(retries=2, backoff=0)
+        self.assertEqual(client.get_json(self.url), {"ok": True})
+
+        metrics = client.stats()["127.0.0.1"]
+        self.assertEqual(FlakyHandler.calls, 2)
+        self.assertEqual(metrics["requests"], 1)
+        self.assertEqual(metrics["retries"], 1)
+        self.assertEqual(metrics["outcomes"], {"200": 1})
+
+    async def test_async_client_retries_and_shares_metrics(self):
+        metrics = upstream.HostMetrics()
+        client = upstream.AsyncUpstreamClient(retries=2, backoff=0, metrics=metrics)
+        self.assertEqual(await client.get_json(self.url), {"ok": True})
+        self.assertEqual(metrics.stats()["127.0.0.1"]["retries"], 1)
+
+    def test_per_host_timeouts(self):
+        client = upstream.UpstreamClient(timeouts={"127.0.0.1": (1, 2)})
+        self.assertEqual(client.timeout_for(self.url), (1, 2))
+        self.assertEqual(client.timeout_for("https://example.com/"), upstream.DEFAULT_TIMEOUT)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        caches["upstream"].clear()
+        views.openweather_cache.clear()
+        backfill._failures.clear()
+
+    def request(self, path, **params):
+        request = AsyncRequestFactory().get(path, params)
+        request.session = SessionStore()
+        return request
+
+    async def test_hourly_view_uses_async_fetch_and_session_redirect(self):
+        request = self.request("/hourly/", city="rajkot")
+        redirect = await async_views.city_redirect(request, "hourly")
+        self.assertEqual(redirect.url, "/hourly/rajkot/")
+        self.assertEqual(await request.session.aget("selected_city"), "rajkot")
+
+        with mock.patch.object(async_views.upstream, "aget_json", return_value=HOURLY_FORECAST) as fetch:
+            response = await async_views.hourly_view(self.request(redirect.url), "rajkot")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(fetch.call_args.kwargs["params"]["lat"], views.CITY_COORDS["rajkot"][0])
+        self.assertIn("31°C", response.content.decode())
+
+    async def test_monthly_view_backfills_with_async_orm(self):
+        start_date, window = views.month_window()
+        await MonthlyWeather.objects.acreate(lat=23.0225, lon=72.5714, date=window[0], avg_temp=25.0)
+
+        async def fake_backfill(lat, lon, dates, api_key):
+            self.assertNotIn(window[0], dates)
+            return backfill.BackfillResult()
+
+        with mock.patch.object(async_views, "abackfill_history", side_effect=fake_backfill) as history:
+            response = await async_views.monthly_view(self.request("/monthly/ahmedabad/"), "ahmedabad")
+
+        self.assertEqual(response.status_code, 200)
+        history.assert_called_once()
+        self.assertIn("25.0°C", response.content.decode())
+
+    async def test_page_rendered_off_the_event_loop(self):
+        loop_thread, render_threads = threading.get_ident(), []
+        city_page = views.city_page
+
+        def render(*args):
+            render_threads.append(threading.get_ident())
+            return city_page(*args)
+
+        with mock.patch.object(async_views.upstream, "aget_json", return_value=HOURLY_FORECAST), \
+                mock.patch.object(views, "city_page", side_effect=render):
+            response = await async_views.hourly_view(self.request("/hourly/surat/"), "surat")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(render_threads), 1)
+        self.assertNotEqual(render_threads[0], loop_thread)
+
+    async def test_prediction_thread_closes_its_connections(self):
+        forecast = benchmarks.load_json("openweather/forecast_daily.json")
+        threads, closed = [], []
+
+        def predict(lat, lon):
+            threads.append(threading.get_ident())
+            return predictions.as_days(DailyPrediction.objects.filter(lat=lat, lon=lon))
+
+        with mock.patch.object(async_views.upstream, "aget_json", return_value=forecast), \
+                mock.patch.object(views, "get_forecast_prediction", side_effect=predict), \
+                mock.patch("myapp.fanout.connections.close_all", side_effect=lambda: closed.append(threading.get_ident())):
+            response = await async_views.tenday_view(self.request("/10day/surat/"), "surat")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(threads), 1)
+        self.assertIn(threads[0], closed)
+
+
+class ImageAnalysisCacheTests(TestCase):
+
+    def setUp(self):
+        image_cache.memory.clear()
+        self.analyze = mock.Mock(return_value={"is_sky": True, "weather_condition": "Cloudy"})
+
+    def test_duplicate_upload_served_without_api_call(self):
+        digest = image_cache.image_digest(b"same bytes")
+        first = image_cache.analyze_cached(digest, self.analyze)
+        second = image_cache.analyze_cached(digest, self.analyze)
+
+        self.assertEqual(first, second)
+        self.analyze.assert_called_once()
+        self.assertEqual(ImageAnalysis.objects.get().sha256, digest)
+
+    def test_persistent_tier_survives_memory_eviction(self):
+        digest = image_cache.image_digest(b"img")
+        image_cache.analyze_cached(digest, self.analyze)
+        image_cache.memory.clear()
+        image_cache.analyze_cached(digest, self.analyze)
+
+        self.analyze.assert_called_once()
+        self.assertEqual(ImageAnalysis.objects.get().hits, 1)
+
+    def test_errors_not_cached(self):
+        self.analyze.return_value = {"is_sky": False, "error": "quota"}
+        image_cache.analyze_cached("d" * 64, self.analyze)
+        image_cache.analyze_cached("d" * 64, self.analyze)
+        self.assertEqual(self.analyze.call_count, 2)
+
+    def test_prune_applies_age_and_size_limits(self):
+        for i in range(3):
+            ImageAnalysis.objects.create(sha256=f"{i:064d}", result={})
+        ImageAnalysis.objects.filter(sha256=f"{0:064d}").update(
+            created_at=timezone.now() - image_cache.MAX_AGE - timedelta(days=1))
+
+        with mock.patch.object(image_cache, "MAX_ROWS", 1):
+            image_cache.prune()
+        self.assertEqual(ImageAnalysis.objects.count(), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ImageUploadTests(TestCase):
+
+    def setUp(self):
+        caches["upstream"].clear()
+        image_cache.memory.clear()
+
+    def test_prepare_image_bounds_resolution(self):
+        prepared = image_processing.prepare_image(make_jpeg(4000, 3000))
+        with Image.open(BytesIO(prepared.analysis_bytes)) as analysis:
+            self.assertEqual(max(analysis.size), image_processing.ANALYSIS_MAX_EDGE)
+        with Image.open(BytesIO(prepared.thumbnail_bytes)) as thumbnail:
+            self.assertEqual(max(thumbnail.size), image_processing.THUMBNAIL_MAX_EDGE)
+
+    def test_prepare_image_rejects_non_images(self):
+        with self.assertRaises(image_processing.ImageDecodeError):
+            image_processing.prepare_image(b"not an image")
+
+    def test_upload_sends_downscaled_copy_and_links_thumbnail(self):
+        analysis = {"is_sky": True, "weather_condition": "Clear Sky"}
+        upload = SimpleUploadedFile("sky.jpg", make_jpeg(3000, 2000), content_type="image/jpeg")
+        with mock.patch.object(views, "analyze_weather_from_image", return_value=analysis) as analyze:
+            response = self.client.post("/image/", {"image": upload})
+
+        sent_bytes, content_type = analyze.call_args.args
+        self.assertEqual(content_type, "image/jpeg")
+        with Image.open(BytesIO(sent_bytes)) as sent:
+            self.assertEqual(max(sent.size), image_processing.ANALYSIS_MAX_EDGE)
+        self.assertNotIn(b"data:image", response.content)
+
+        thumbnail = self.client.get(response.context["thumbnail_url"])
+        self.assertEqual(thumbnail.status_code, 200)
+        self.assertEqual(thumbnail["Content-Type"], "image/jpeg")
+        self.assertEqual(thumbnail["Cache-Control"], f"private, max-age={image_processing.THUMBNAIL_TTL}, immutable")
+
+    def test_no_sky_without_reason_still_explains(self):
+        upload = SimpleUploadedFile("desk.jpg", make_jpeg(64, 64), content_type="image/jpeg")
+        with mock.patch.object(views, "analyze_weather_from_image", return_value={"is_sky": False, "reason": None}):
+            response = self.client.post("/image/", {"image": upload})
+
+        self.assertIn("No sky detected", response.context["error_message"])
+
+    def test_unknown_thumbnail_is_404(self):
+        self.assertEqual(self.client.get(f"/image/thumb/{'0' * 64}.jpg").status_code, 404)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class StreamingUploadTests(TestCase):
+
+    def setUp(self):
+        caches["upstream"].clear()
+        image_cache.memory.clear()
+        self.analyze = mock.patch.object(views, "analyze_weather_from_image",
+                                         return_value={"is_sky": True, "weather_condition": "Clear Sky"})
+        self.analyze_mock = self.analyze.start()
+        self.addCleanup(self.analyze.stop)
+
+    def test_handler_hashes_and_sniffs_while_streaming(self):
+        data = make_jpeg(64, 64)
+        handler = upload_handlers.ImageUploadHandler()
+        handler.new_file("image", "sky.jpg", "application/octet-stream", len(data))
+        for start in range(0, len(data), 100):
+            handler.receive_data_chunk(data[start:start + 100], start)
+        uploaded = handler.file_complete(len(data))
+
+        self.assertEqual(uploaded.sha256, image_cache.image_digest(data))
+        self.assertEqual(uploaded.content_type, "image/jpeg")
+        self.assertEqual(uploaded.read(), data)
+
+    def test_handler_stops_once_limit_exceeded(self):
+        handler = upload_handlers.ImageUploadHandler(max_bytes=10)
+        handler.new_file("image", "sky.png", "image/png", None)
+        with self.assertRaises(upload_handlers.StopUpload):
+            handler.receive_data_chunk(b"\x89PNG\r\n\x1a\n" + b"0" * 10, 0)
+        self.assertIn("exceeds", handler.error)
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_upload_spilled_to_disk_is_analysed(self):
+        upload = SimpleUploadedFile("sky.jpg", make_jpeg(800, 600), content_type="image/jpeg")
+        response = self.client.post("/image/", {"image": upload})
+
+        self.analyze_mock.assert_called_once()
+        self.assertEqual(response.context["caption"], "Weather Analysis Complete")
+
+    def test_renamed_non_image_rejected_by_magic_bytes(self):
+        upload = SimpleUploadedFile("sky.jpg", b"MZ" + b"\x00" * 2048, content_type="image/jpeg")
+        response = self.client.post("/image/", {"image": upload})
+
+        self.analyze_mock.assert_not_called()
+        self.assertEqual(response.context["error_message"], "The uploaded file is not a supported image")
+
+    def test_wrong_extension_rejected(self):
+        upload = SimpleUploadedFile("notes.txt", b"hello", content_type="text/plain")
+        response = self.client.post("/image/", {"image": upload})
+        self.assertIn("Invalid file type", response.context["error_message"])
+
+    def test_oversized_content_length_refused_before_parsing(self):
+        response = self.client.generic(
+            "POST", "/image/", b"", content_type="multipart/form-data; boundary=x",
+            CONTENT_LENGTH=str(upload_handlers.MAX_FILE_SIZE_BYTES * 2),
+        )
+        self.assertEqual(response.status_code, 413)
+        self.analyze_mock.assert_not_called()
+
+
+@mock.patch.dict("os.environ", {"GEMINI_API_KEY": "test-key"})
+class SuggestionSingleFlightTests(TransactionTestCase):
+    weather = {"city": "Surat", "temp": 30, "feels_like": 33, "humidity": 60,
+               "wind_kmh": 10, "min_temp": 27, "max_temp": 34}
+
+    def suggest(self):
+        return suggestions.get_weather_suggestions(self.weather, "Summer", 31.0, "Sunny")
+
+    def test_concurrent_callers_share_one_generation(self):
+        calls = []
+
+        def generate(*args):
+            calls.append(args)
+            return SUGGESTIONS
+
+        # Every caller does its first, unlocked ready_record() before anyone claims.
+        # The in-memory test database fails a read that meets another thread's
+        # write ("table is locked"); a database file waits for the lock instead.
+        all_checked = threading.Barrier(6, timeout=5)
+        first_check = threading.local()
+        ready_record = suggestions.ready_record
+
+        def check_then_wait(city, day):
+            record = ready_record(city, day)
+            if not getattr(first_check, "done", False):
+                first_check.done = True
+                all_checked.wait()
+            return record
+
+        results = []
+
+        def worker():
+            try:
+                results.append(self.suggest())
+            finally:
+                connection.close()
+
+        with mock.patch.object(suggestions, "generate_suggestions", side_effect=generate), \
+                mock.patch.object(suggestions, "ready_record", side_effect=check_then_wait):
+            threads = [threading.Thread(target=worker) for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [SUGGESTIONS] * 6)
+        record = SmartSuggestion.objects.get(city="surat", date=date.today())
+        self.assertFalse(record.pending)
+        self.assertEqual(record.clothing, "Light cotton")
+
+    def test_claim_held_by_another_worker_returns_placeholder(self):
+        self.assertTrue(suggestions.claim("surat", date.today()))
+
+        with mock.patch.object(suggestions, "generate_suggestions") as generate, \
+                mock.patch.object(suggestions, "WAIT_SECONDS", 0.1):
+            result = self.suggest()
+
+        generate.assert_not_called()
+        self.assertEqual(result["clothing"], suggestions.PENDING_MESSAGE)
+
+    def test_expired_claim_is_taken_over(self):
+        today = date.today()
+        claimed_at = timezone.now() - timedelta(minutes=5)
+        self.assertTrue(suggestions.claim("surat", today, now=claimed_at))
+        # still inside the lease
+        self.assertFalse(suggestions.claim("surat", today, now=claimed_at + timedelta(seconds=30)))
+
+        with mock.patch.object(suggestions, "generate_suggestions", return_value=SUGGESTIONS) as generate:
+            self.assertEqual(self.suggest(), SUGGESTIONS)
+        generate.assert_called_once()
+
+    def test_failed_generation_releases_the_claim(self):
+        with mock.patch.object(suggestions, "generate_suggestions", side_effect=RuntimeError("quota")):
+            result = self.suggest()
+
+        self.assertEqual(result["clothing"], suggestions.FAILED_MESSAGE)
+        self.assertFalse(SmartSuggestion.objects.exists())
+
+
+BATCH_REPLY = """CITY: surat
+CLOTHING: Light cotton
+ACTIVITIES: Morning walks
+HEALTH: Stay hydrated
+TRAVEL: Roads are clear
+
+CITY: Rajkot
+CLOTHING: Loose shirts
+ACTIVITIES: Indoor games
+  after sunset
+HEALTH: Use sunscreen
+TRAVEL: Carry water
+"""
+
+
+@mock.patch.dict("os.environ", {"GEMINI_API_KEY": "test-key"})
+class SuggestionBatchTests(TestCase):
+
+    def entry(self, city):
+        weather = {"city": city, "temp": 30, "feels_like": 33, "humidity": 60,
+                   "wind_kmh": 10, "min_temp": 27, "max_temp": 34}
+        return weather, "Summer", 31.0, "Sunny"
+
+    def test_parse_batch_keeps_requested_cities(self):
+        parsed = suggestions.parse_batch(BATCH_REPLY + "\nCITY: Delhi\nCLOTHING: x\n", ["surat", "rajkot"])
+
+        self.assertEqual(set(parsed), {"surat", "rajkot"})
+        self.assertEqual(parsed["rajkot"]["activities"], "Indoor games after sunset")
+
+    def test_one_call_for_all_cities_and_fallback_for_missing(self):
+        reply = mock.Mock(text=BATCH_REPLY)
+        model = mock.Mock(**{"generate_content.return_value": reply})
+        with mock.patch.object(upstream, "gemini_model", return_value=model), \
+                mock.patch.object(suggestions, "generate_suggestions", return_value=SUGGESTIONS) as single:
+            results = suggestions.get_suggestions_batch(
+                [self.entry("Surat"), self.entry("Rajkot"), self.entry("Vadodara")]
+            )
+
+        model.generate_content.assert_called_once()
+        single.assert_called_once()
+        self.assertEqual(results["vadodara"], SUGGESTIONS)
+        self.assertEqual(results["surat"]["travel"], "Roads are clear")
+        self.assertEqual(
+            set(SmartSuggestion.objects.filter(pending=False).values_list("city", flat=True)),
+            {"surat", "rajkot", "vadodara"},
+        )
+
+    def test_skips_cities_already_stored(self):
+        suggestions.store("surat", date.today(), SUGGESTIONS)
+
+        with mock.patch.object(suggestions, "generate_batch_suggestions", return_value={}) as batch, \
+                mock.patch.object(suggestions, "generate_suggestions", return_value=SUGGESTIONS):
+            results = suggestions.get_suggestions_batch([self.entry("Surat"), self.entry("Rajkot")])
+
+        self.assertEqual(list(batch.call_args.args[0]), ["rajkot"])
+        self.assertEqual(results["surat"], SUGGESTIONS)
+
+
+    def test_failed_batch_call_makes_no_per_city_calls(self):
+        with mock.patch.object(suggestions, "generate_batch_suggestions", side_effect=RuntimeError("429 quota")), \
+                mock.patch.object(suggestions, "generate_suggestions") as single, \
+                self.assertLogs("myapp.suggestions", "WARNING"):
+            results = suggestions.get_suggestions_batch([self.entry("Surat"), self.entry("Rajkot")])
+
+        single.assert_not_called()
+        self.assertEqual(results, {})
+        self.assertFalse(SmartSuggestion.objects.exists())
+
+
+GEMINI_FIXTURES = Path(__file__).resolve().parent / "test_data" / "gemini"
+
+
+def gemini_fixture(name):
+    return (GEMINI_FIXTURES / name).read_text()
+
+
+class GeminiParserTests(SimpleTestCase):
+
+    def test_recorded_sky_analysis(self):
+        result = gemini_parser.parse_image_analysis(gemini_fixture("image_sky.txt"))
+
+        self.assertTrue(result["is_sky"])
+        self.assertEqual(result["weather_condition"], "Partly Cloudy")
+        self.assertEqual(result["cloud_coverage"], "40%")
+        self.assertEqual(result["cloud_coverage_pct"], 40)
+        self.assertEqual(result["rain_probability_pct"], 15)
+        self.assertEqual(result["wind_indication"], "Light Breeze - based on cloud movement")
+        self.assertIsNone(result["reason"])
+
+    def test_markdown_keys_and_multi_line_values(self):
+        result = gemini_parser.parse_image_analysis(gemini_fixture("image_markdown.txt"))
+
+        self.assertEqual(result["cloud_darkness"], "Very Dark")
+        self.assertEqual(result["cloud_coverage_pct"], 90)
+        self.assertTrue(result["details"].endswith("virga is visible near the horizon on the left."))
+
+    def test_no_sky_keeps_only_the_reason(self):
+        result = gemini_parser.parse_image_analysis(gemini_fixture("image_no_sky.txt"))
+
+        self.assertFalse(result["is_sky"])
+        self.assertIn("indoor scene", result["reason"])
+        self.assertIsNone(result["weather_condition"])
+
+    def test_numbered_and_bracketed_replies(self):
+        numbered = gemini_parser.parse_image_analysis(gemini_fixture("image_numbered.txt"))
+        self.assertTrue(numbered["is_sky"])
+        self.assertEqual(numbered["weather_condition"], "Cloudy")
+        self.assertEqual(numbered["rain_probability_pct"], 35)
+        self.assertTrue(numbered["details"].startswith("A uniform grey stratus"))
+
+        bracketed = gemini_parser.parse_image_analysis(gemini_fixture("image_bracketed.txt"))
+        self.assertTrue(bracketed["is_sky"])
+        self.assertEqual(bracketed["cloud_coverage_pct"], 95)
+        self.assertIsNone(bracketed["reason"])
+
+        no_sky = gemini_parser.parse_image_analysis(gemini_fixture("image_bracketed_no_sky.txt"))
+        self.assertFalse(no_sky["is_sky"])
+        self.assertIn("printed document", no_sky["reason"])
+
+    def test_invalid_numbers_are_rejected(self):
+        result = gemini_parser.parse_image_analysis(gemini_fixture("image_invalid_numbers.txt"))
+
+        self.assertEqual(result["weather_condition"], "Rainy")
+        self.assertEqual(result["cloud_coverage"], "about 140%")
+        self.assertIsNone(result["cloud_coverage_pct"])
+        self.assertIsNone(result["rain_probability_pct"])
+
+    def test_suggestions(self):
+        single = gemini_parser.parse_suggestions(gemini_fixture("suggestions.txt"))
+        batch = dict(gemini_parser.parse_batch_suggestions(gemini_fixture("suggestions_batch.txt")))
+
+        self.assertEqual(single["activities"], "Outdoor activities are best before 10 AM or after sunset.")
+        self.assertEqual(list(batch), ["ahmedabad", "Surat", "Rajkot"])
+        self.assertEqual(batch["Rajkot"]["travel"], "Clear roads.")
+
+    def test_fuzzed_replies_never_raise(self):
+        rng = random.Random(1234)
+        fixtures = [path.read_text() for path in sorted(GEMINI_FIXTURES.glob("*.txt"))]
+        noise = ["", "   ", "**", "- ", "Note: nothing to add", ":::", "CLOUD_COVERAGE:", "\t", "ÿ€"]
+
+        for _ in range(300):
+            lines = rng.choice(fixtures).split("\n")
+            for _ in range(rng.randint(1, 6)):
+                i = rng.randrange(len(lines) + 1)
+                action = rng.choice(["insert", "case", "prefix", "cut"])
+                if action == "insert" or i == len(lines):
+                    lines.insert(i, rng.choice(noise))
+                elif action == "case":
+                    lines[i] = lines[i].lower() if rng.random() < 0.5 else lines[i].upper()
+                elif action == "prefix":
+                    lines[i] = rng.choice(["* ", "> ", "## ", "  "]) + lines[i]
+                else:
+                    lines[i] = lines[i][:rng.randrange(len(lines[i]) + 1)]
+            text = rng.choice(["\n", "\r\n"]).join(lines)
+
+            result = gemini_parser.parse_image_analysis(text)
+            for name in gemini_parser.PERCENT_FIELDS.values():
+                self.assertTrue(result[name] is None or 0 <= result[name] <= 100)
+            self.assertEqual(set(gemini_parser.parse_suggestions(text)), set(gemini_parser.SUGGESTION_KEYS.values()))
+            list(gemini_parser.parse_batch_suggestions(text))
+
+
+class BenchmarkTests(SimpleTestCase):
+
+    def test_stages_run_offline_on_fixtures(self):
+        results = benchmarks.run(["features:*", "parse:*", "shape:*", "render:*"], repeat=1, number=1)
+
+        stages = results["stages"]
+        self.assertIn("render:today", stages)
+        self.assertIn("parse:image_sky", stages)
+        self.assertTrue(all(stage["min_ms"] > 0 for stage in stages.values()))
+        json.dumps(results)
+
+    def test_compare_flags_slower_stages(self):
+        baseline = {"stages": {"parse:a": {"min_ms": 1.0}, "parse:b": {"min_ms": 1.0}, "gone": {"min_ms": 1.0}}}
+        current = {"stages": {"parse:a": {"min_ms": 1.1}, "parse:b": {"min_ms": 1.5}, "new": {"min_ms": 1.0},
+                              "model_load:code": {"skipped": "missing"}}}
+
+        rows = benchmarks.compare(current, baseline, threshold=0.25)
+
+        self.assertEqual([(row[0], row[4]) for row in rows], [("parse:a", False), ("parse:b", True)])
+
+
+class FakeUpstreamTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = fake_upstream.make_server("127.0.0.1", 0, seed=1)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def test_openweather_and_open_meteo_replies_fit_the_app(self):
+        lat, lon = views.CITY_COORDS["rajkot"]
+        current = upstream.get_json(f"{self.server.url}/data/2.5/weather", params={"lat": lat, "lon": lon})
+        daily = upstream.get_json(f"{self.server.url}/data/2.5/forecast/daily",
+                                  params={"lat": lat, "lon": lon, "cnt": 10})
+        with mock.patch.object(predict_live, "API_URL", f"{self.server.url}/v1/forecast"):
+            dailies = predict_live.fetch_daily_many(list(views.CITY_COORDS.values()))
+
+        self.assertEqual(views.build_today_data(current)["city"], "Rajkot")
+        self.assertEqual(len(views.build_forecast_data(daily)), 10)
+        self.assertEqual(len(dailies), len(views.CITY_COORDS))
+        self.assertEqual(len(predict_live.build_features([(lat, lon, dailies[0])])), 1)
+
+    def test_gemini_rest_endpoint(self):
+        weather = {"city": "Surat", "temp": 30, "feels_like": 33, "humidity": 60,
+                   "wind_kmh": 10, "min_temp": 27, "max_temp": 34}
+        with override_settings(GEMINI_API_ENDPOINT=self.server.url), \
+                mock.patch.dict("os.environ", {"GEMINI_API_KEY": "fake"}):
+            result = suggestions.generate_suggestions(weather, "Summer", 31.0, "Sunny")
+
+        self.assertEqual(result["clothing"], "Wear light cotton clothes and carry a cap.")
+
+    def test_error_rate(self):
+        self.server.error_rate = 1.0
+        response = requests.get(f"{self.server.url}/data/2.5/weather?lat=1&lon=2", timeout=5)
+
+        self.assertEqual(response.status_code, 503)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class LoadDriverTests(LiveServerTestCase):
+
+    def test_replays_the_mix_and_reports_per_route(self):
+        def fetch(endpoint, lat, lon, **params):
+            return HOURLY_FORECAST if endpoint == "forecast/hourly" else {"list": []}
+
+        with mock.patch.object(views, "fetch_openweather", side_effect=fetch):
+            report = loadtest.LoadDriver(
+                self.live_server_url, page_mix={"hourly": 1, "10day": 1}, concurrency=2,
+                duration=30, max_requests=10, seed=3,
+            ).run()
+
+        routes = report["routes"]
+        self.assertEqual(routes["all"]["requests"], 10)
+        self.assertEqual(routes["all"]["errors"], 0)
+        self.assertEqual(routes["hourly"]["requests"] + routes["10day"]["requests"], 10)
+        self.assertLessEqual(routes["all"]["p50_ms"], routes["all"]["p99_ms"])
+
+    def test_parse_mix_and_percentiles(self):
+        self.assertEqual(loadtest.parse_mix("today=3, hourly"), {"today": 3.0, "hourly": 1.0})
+        with self.assertRaises(ValueError):
+            loadtest.parse_mix("weekly=1", known=loadtest.DEFAULT_PAGE_MIX)
+        self.assertEqual(loadtest.percentile(list(range(1, 101)), 99), 99)
+        self.assertEqual(loadtest.percentile([5.0], 50), 5.0)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TimingTests(TestCase):
+
+    def setUp(self):
+        caches["upstream"].clear()
+        views.openweather_cache.clear()
+        timing.REQUEST_SECONDS.clear()
+        timing.SPAN_SECONDS.clear()
+
+    def fetch(self, endpoint, lat, lon, **params):
+        # runs in a fan_out thread; the span must still reach the request
+        timing.record("openweather", 0.02)
+        return CURRENT_WEATHER
+
+    def test_server_timing_header_and_metrics(self):
+        with mock.patch.object(views, "fetch_openweather", side_effect=self.fetch), \
+                mock.patch.object(views, "get_prediction", return_value=(30.0, "Rain")), \
+                mock.patch.object(views, "get_weather_suggestions", return_value=SUGGESTIONS):
+            redirect = self.client.get("/", {"city": "surat"})
+            response = self.client.get(redirect.url)
+
+        # the redirect saves the session
+        self.assertIn("db;dur=", redirect["Server-Timing"])
+        header = response["Server-Timing"]
+        self.assertIn("openweather;dur=20.0", header)
+        self.assertIn("render;dur=", header)
+        self.assertIn("total;dur=", header)
+
+        metrics = self.client.get("/metrics").content.decode()
+        self.assertIn('smartweather_request_seconds_count{route="today",method="GET",status="302"} 1', metrics)
+        self.assertIn('smartweather_request_seconds_count{route="today_city",method="GET",status="200"} 1', metrics)
+        self.assertIn('smartweather_span_seconds_bucket{span="openweather",le="0.025"} 1', metrics)
+        self.assertIn("smartweather_cache_events_total", metrics)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret").status_code, 200)
+
+    def test_disabled_is_a_no_op(self):
+        with mock.patch.object(timing, "ENABLED", False), \
+                mock.patch.object(views, "fetch_openweather", return_value=HOURLY_FORECAST):
+            response = self.client.get("/hourly/")
+            self.assertIs(timing.span("x"), timing.span("y"))
+
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(timing.REQUEST_SECONDS.render()[2:], [])
+
+    def test_json_log_lines(self):
+        record = logging.LogRecord("myapp.views", logging.WARNING, __file__, 1, "Prediction unavailable", (), None)
+        record.city = "surat"
+
+        entry = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual(entry["message"], "Prediction unavailable")
+        self.assertEqual(entry["city"], "surat")
+        self.assertEqual(entry["level"], "WARNING")
+
+
+class ImportProfileTests(SimpleTestCase):
+
+    def test_parse_importtime_lines(self):
+        text = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     numpy._core\n"
+            "import time:       300 |        420 |   numpy\n"
+            "import time:        50 |        470 | myapp.views\n"
+        )
+        modules = import_profile.parse_importtime(text)
+        self.assertEqual(modules[1], ("numpy", 300, 420, 1))
+
+        profile = import_profile.ImportProfile("myapp.views", modules, [])
+        self.assertEqual(profile.by_package(), [("numpy", 420, 2), ("myapp", 50, 1)])
+        self.assertEqual(profile.cumulative_us("myapp.views"), 470)
+
+    def test_urlconf_imports_without_heavy_modules(self):
+        # what is loaded, not how long it took: timings belong to `manage.py import_profile --budget`
+        profile = import_profile.profile(heavy=("google.generativeai", "xgboost", "numpy", "myapp.views"))
+
+        self.assertEqual(profile.heavy, ["myapp.views"])
+        self.assertGreater(profile.cumulative_us(profile.target), 0)
+
+    def test_gemini_configured_on_first_use_only(self):
+        with mock.patch("google.generativeai.configure") as configure, \
+                mock.patch("google.generativeai.GenerativeModel") as model, \
+                mock.patch.object(upstream, "_gemini_configured", None):
+            upstream.gemini_model("gemini-2.5-flash", api_key="a")
+            upstream.gemini_model("gemini-2.5-flash", api_key="a")
+            upstream.gemini_model("gemini-2.5-flash", api_key="b")
+
+        self.assertEqual([c.kwargs["api_key"] for c in configure.call_args_list], ["a", "b"])
+        self.assertEqual(model.call_count, 3)
@@ -0,0 +1,262 @@
+import bisect
+import contextlib
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.shortcuts import render as django_render
+
+
+# -------------------------------------------------------
+# Per-request spans -> Server-Timing header and /metrics histograms
+# -------------------------------------------------------
+# Code marks a stage with `with timing.span("gemini"):` (or timing.record()
+# when it already measured itself). Spans add up per request in a context
+# variable, which follows the request into fan_out threads and async tasks.
+# With REQUEST_TIMING off, span() hands back a shared no-op context manager.
+
+ENABLED = getattr(settings, "REQUEST_TIMING", True)
+
+# seconds; Prometheus histogram upper bounds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current = ContextVar("request_timer", default=None)
+
+
+class RequestTimer:
+    """Span totals for one request: {name: [seconds, calls]}."""
+
+    __slots__ = ("method", "path", "spans", "_lock")
+
+    def __init__(self, method="", path=""):
+        self.method = method
+        self.path = path
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            total = self.spans.setdefault(name, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+
+    def header(self, total_seconds=None):
+        with self._lock:
+            spans = dict(self.spans)
+        parts = []
+        for name, (seconds, calls) in spans.items():
+            part = f"{name};dur={seconds * 1000:.1f}"
+            if calls > 1:
+                part += f';desc="{calls} calls"'
+            parts.append(part)
+        if total_seconds is not None:
+            parts.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def current():
+    return _current.get()
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, rendered in Prometheus text format."""
+
+    def __init__(self, name, help_text, labels, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, values, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += seconds
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {values: (list(counts), total) for values, (counts, total) in self._series.items()}
+        for values, (counts, total) in sorted(series.items()):
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+SPAN_SECONDS = Histogram("smartweather_span_seconds", "Time spent per stage (upstream, model, db, render).", ("span",))
+REQUEST_SECONDS = Histogram("smartweather_request_seconds", "Request latency per route.", ("route", "method", "status"))
+
+
+def record(name, seconds):
+    """Add an already measured stage to the histograms and the current request."""
+    if not ENABLED:
+        return
+    SPAN_SECONDS.observe((name,), seconds)
+    timer = _current.get()
+    if timer is not None:
+        timer.add(name, seconds)
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def span(name):
+    return _Span(name) if ENABLED else _NULL_SPAN
+
+
+def render(request, template_name, context=None, *args, **kwargs):
+    """django.shortcuts.render, timed as the "render" span."""
+    with span("render"):
+        return django_render(request, template_name, context, *args, **kwargs)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    with span("db"):
+        return execute(sql, params, many, context)
+
+
+def install_db_timing(sender, connection, **kwargs):
+    """connection_created receiver: time every query on every connection."""
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_execute_wrapper)
+
+
+# -------------------------------------------------------
+# Middleware
+# -------------------------------------------------------
+class TimingMiddleware:
+    """Collects a request's spans, sets Server-Timing and feeds REQUEST_SECONDS."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not ENABLED:
+            return self.get_response(request)
+        token, started = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            timer = _current.get()
+            _current.reset(token)
+        return self.finish(request, response, timer, started)
+
+    async def __acall__(self, request):
+        if not ENABLED:
+            return await self.get_response(request)
+        token, started = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            timer = _current.get()
+            _current.reset(token)
+        return self.finish(request, response, timer, started)
+
+    def start(self, request):
+        return _current.set(RequestTimer(request.method, request.path)), time.perf_counter()
+
+    def finish(self, request, response, timer, started):
+        elapsed = time.perf_counter() - started
+        match = getattr(request, "resolver_match", None)
+        route = (match.url_name or match.view_name) if match else "unmatched"
+        REQUEST_SECONDS.observe((route, request.method, str(response.status_code)), elapsed)
+        response["Server-Timing"] = timer.header(elapsed)
+        return response
+
+
+# -------------------------------------------------------
+# /metrics
+# -------------------------------------------------------
+def _upstream_lines():
+    from myapp import upstream
+
+    lines = [
+        "# HELP smartweather_upstream_requests_total Upstream HTTP calls per host and outcome.",
+        "# TYPE smartweather_upstream_requests_total counter",
+    ]
+    stats = upstream.metrics.stats()
+    for host, m in sorted(stats.items()):
+        for outcome, count in sorted(m["outcomes"].items()):
+            lines.append(f'smartweather_upstream_requests_total{{host="{_escape(host)}",outcome="{outcome}"}} {count}')
+    lines += [
+        "# HELP smartweather_upstream_retries_total Upstream retries per host.",
+        "# TYPE smartweather_upstream_retries_total counter",
+    ]
+    for host, m in sorted(stats.items()):
+        lines.append(f'smartweather_upstream_retries_total{{host="{_escape(host)}"}} {m["retries"]}')
+    return lines
+
+
+def _cache_lines():
+    from myapp import image_cache
+    from myapp.weather_cache import openweather_cache
+
+    lines = [
+        "# HELP smartweather_cache_events_total In-process cache lookups by result.",
+        "# TYPE smartweather_cache_events_total counter",
+    ]
+    for cache_name, stats in (("openweather", openweather_cache.stats()), ("image", image_cache.memory.stats())):
+        for event in ("hits", "stale_hits", "misses", "evictions", "refresh_errors"):
+            lines.append(f'smartweather_cache_events_total{{cache="{cache_name}",event="{event}"}} {stats[event]}')
+    return lines
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition for this worker process.
+
+    Each gunicorn worker keeps its own numbers; scrape them per worker or
+    aggregate at the scraper. With METRICS_TOKEN set, a matching bearer token
+    is required.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponseForbidden("metrics token required")
+
+    lines = REQUEST_SECONDS.render() + SPAN_SECONDS.render() + _upstream_lines() + _cache_lines()
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,133 @@
+import hashlib
+import os
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+
+# -------------------------------------------------------
+# Image upload limits (shared with validate_image_file)
+# -------------------------------------------------------
+ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif'}
+MAX_FILE_SIZE_MB = 10
+MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024  # 10 MB in bytes
+
+# room for the multipart boundaries, headers and the CSRF token around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# leading bytes -> real content type
+MAGIC_NUMBERS = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+]
+SNIFF_BYTES = 12
+
+
+def sniff_image_type(head):
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for magic, content_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return content_type
+    return None
+
+
+class HashedUploadedFile(UploadedFile):
+    """Upload streamed by ImageUploadHandler, with its SHA-256 already computed."""
+
+    def __init__(self, file, name, content_type, size, charset, sha256):
+        super().__init__(file, name, content_type, size, charset)
+        self.sha256 = sha256
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Streams a single image upload with bounded memory.
+
+    Rejects as soon as the file extension is seen (and, through
+    content_length_error, before an oversized body is read), then enforces the
+    size limit per chunk, checks the magic bytes of the first chunk and hashes
+    the data as it arrives. Small files stay in memory, larger ones spill to a
+    temporary file. The reason for a rejection is left on `request.upload_error`.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, request=None, max_bytes=MAX_FILE_SIZE_BYTES):
+        super().__init__(request)
+        self.max_bytes = max_bytes
+        self.error = None
+
+    def reject(self, message, connection_reset=True):
+        self.error = message
+        if self.request is not None:
+            self.request.upload_error = message
+        raise StopUpload(connection_reset=connection_reset)
+
+    def too_large(self, size):
+        return (f"File size ({size / (1024 * 1024):.2f} MB) exceeds the maximum "
+                f"limit of {MAX_FILE_SIZE_MB} MB")
+
+    def content_length_error(self, META):
+        """
+        Error for a request body that cannot fit under the limit, or None.
+
+        Meant to be checked before request.POST is touched, so an oversized
+        upload is refused without reading its body.
+        """
+        try:
+            content_length = int(META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            return None
+        if content_length > self.max_bytes + MULTIPART_OVERHEAD_BYTES:
+            return self.too_large(content_length)
+        return None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None,
+                 content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+
+        if os.path.splitext(file_name.lower())[1] not in ALLOWED_EXTENSIONS:
+            self.reject(f"Invalid file type. Only image files are allowed ({', '.join(sorted(ALLOWED_EXTENSIONS))})")
+
+        self.file = SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.head = b""
+        self.sniffed_type = None
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.max_bytes:
+            self.file.close()
+            self.reject(self.too_large(self.size))
+
+        if self.sniffed_type is None:
+            self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+            if len(self.head) >= SNIFF_BYTES:
+                self.sniffed_type = sniff_image_type(self.head)
+                if self.sniffed_type is None:
+                    self.file.close()
+                    self.reject("The uploaded file is not a supported image", connection_reset=False)
+
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        content_type = self.sniffed_type or sniff_image_type(self.head)
+        if content_type is None:
+            self.file.close()
+            self.reject("The uploaded file is not a supported image", connection_reset=False)
+
+        self.file.seek(0)
+        return HashedUploadedFile(
+            self.file, self.file_name, content_type, file_size, self.charset, self.hasher.hexdigest()
+        )
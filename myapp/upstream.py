@@ -0,0 +1,248 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from myapp import timing
+
+
+# -------------------------------------------------------
+# Shared HTTP client for every upstream API call
+# -------------------------------------------------------
+
+# (connect, read) timeouts in seconds per host
+DEFAULT_TIMEOUT = (3.05, 10)
+HOST_TIMEOUTS = {
+    "api.openweathermap.org": (3.05, 8),
+    "history.openweathermap.org": (3.05, 15),
+    "api.open-meteo.com": (3.05, 10),
+}
+
+# Gemini goes through its own SDK; only its timeout and endpoint are shared here
+GEMINI_TIMEOUT = 30
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def span_name(url):
+    """Server-Timing / metrics span for an upstream URL, e.g. "openweather"."""
+    if url.startswith(settings.OPEN_METEO_URL):
+        return "open_meteo"
+    if url.startswith(f"{settings.OPENWEATHER_HISTORY_URL}/history"):
+        return "openweather_history"
+    if url.startswith(settings.OPENWEATHER_BASE_URL):
+        return "openweather"
+    return "upstream"
+
+
+class HostMetrics:
+    """Request count, retries, outcomes and latency per upstream host."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def record(self, host, outcome, seconds, retries=0):
+        with self._lock:
+            m = self._metrics.setdefault(host, {
+                "requests": 0, "retries": 0, "outcomes": {},
+                "total_seconds": 0.0, "max_seconds": 0.0,
+            })
+            m["requests"] += 1
+            m["retries"] += retries
+            m["outcomes"][outcome] = m["outcomes"].get(outcome, 0) + 1
+            m["total_seconds"] += seconds
+            m["max_seconds"] = max(m["max_seconds"], seconds)
+
+    def stats(self):
+        with self._lock:
+            return {
+                host: dict(m, outcomes=dict(m["outcomes"]),
+                           avg_seconds=m["total_seconds"] / m["requests"])
+                for host, m in self._metrics.items()
+            }
+
+
+class UpstreamClient:
+    """
+    One pooled keep-alive session for all upstream GETs.
+
+    Idempotent GETs are retried with exponential backoff on connection errors
+    and retryable statuses; every call is timed and counted per host.
+    """
+
+    def __init__(self, retries=2, backoff=0.3, pool_maxsize=16,
+                 timeouts=None, default_timeout=DEFAULT_TIMEOUT, metrics=None):
+        self.timeouts = dict(HOST_TIMEOUTS if timeouts is None else timeouts)
+        self.default_timeout = default_timeout
+        self.metrics = metrics or HostMetrics()
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def timeout_for(self, url):
+        return self.timeouts.get(urlsplit(url).hostname, self.default_timeout)
+
+    def get(self, url, params=None, timeout=None):
+        started = time.perf_counter()
+        response = None
+        outcome = "error"
+        try:
+            response = self.session.get(url, params=params, timeout=timeout or self.timeout_for(url))
+            outcome = str(response.status_code)
+            return response
+        except requests.Timeout:
+            outcome = "timeout"
+            raise
+        finally:
+            retries = 0
+            if response is not None and getattr(response.raw, "retries", None) is not None:
+                retries = len(response.raw.retries.history)
+            seconds = time.perf_counter() - started
+            self.metrics.record(urlsplit(url).hostname, outcome, seconds, retries)
+            timing.record(span_name(url), seconds)
+
+    def get_json(self, url, params=None, timeout=None):
+        response = self.get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def stats(self):
+        return self.metrics.stats()
+
+
+class AsyncUpstreamClient:
+    """
+    httpx based counterpart of UpstreamClient for the async views.
+
+    httpx clients are bound to an event loop, so one pooled client is kept per
+    running loop. Retries, timeouts and metrics behave like the sync client.
+    """
+
+    def __init__(self, retries=2, backoff=0.3, max_connections=32,
+                 timeouts=None, default_timeout=DEFAULT_TIMEOUT, metrics=None):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_connections = max_connections
+        self.timeouts = dict(HOST_TIMEOUTS if timeouts is None else timeouts)
+        self.default_timeout = default_timeout
+        self.metrics = metrics or HostMetrics()
+        self._clients = weakref.WeakKeyDictionary()
+
+    timeout_for = UpstreamClient.timeout_for
+
+    def _client(self):
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ))
+            self._clients[loop] = client
+        return client
+
+    async def get(self, url, params=None, timeout=None):
+        import httpx
+
+        client = self._client()
+        connect, read = timeout or self.timeout_for(url)
+        started = time.perf_counter()
+        outcome = "error"
+        attempt = 0
+        try:
+            while True:
+                try:
+                    response = await client.get(url, params=params,
+                                                timeout=httpx.Timeout(read, connect=connect))
+                except httpx.TransportError as e:
+                    outcome = "timeout" if isinstance(e, httpx.TimeoutException) else "error"
+                    if attempt >= self.retries:
+                        raise
+                else:
+                    outcome = str(response.status_code)
+                    if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                        return response
+                await asyncio.sleep(self.backoff * (2 ** attempt))
+                attempt += 1
+        finally:
+            seconds = time.perf_counter() - started
+            self.metrics.record(urlsplit(url).hostname, outcome, seconds, attempt)
+            timing.record(span_name(url), seconds)
+
+    async def get_json(self, url, params=None, timeout=None):
+        response = await self.get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def stats(self):
+        return self.metrics.stats()
+
+
+# both clients report into the same per-host metrics
+metrics = HostMetrics()
+client = UpstreamClient(metrics=metrics)
+async_client = AsyncUpstreamClient(metrics=metrics)
+
+
+def get_json(url, params=None, timeout=None):
+    return client.get_json(url, params=params, timeout=timeout)
+
+
+async def aget_json(url, params=None, timeout=None):
+    return await async_client.get_json(url, params=params, timeout=timeout)
+
+
+def gemini_options(api_key=None):
+    """
+    Keyword arguments for genai.configure().
+
+    With settings.GEMINI_API_ENDPOINT set, the SDK talks REST to that host
+    (e.g. the fake_upstream stand-in) instead of the Google endpoint.
+    """
+    options = {"api_key": api_key or os.getenv("GEMINI_API_KEY")}
+    if settings.GEMINI_API_ENDPOINT:
+        options["transport"] = "rest"
+        options["client_options"] = {"api_endpoint": settings.GEMINI_API_ENDPOINT}
+    return options
+
+
+_gemini_lock = threading.Lock()
+_gemini_configured = None
+
+
+def gemini_model(model_name, api_key=None):
+    """
+    genai.GenerativeModel(model_name).
+
+    google.generativeai takes most of a second to import, so it is imported
+    here on the first Gemini call instead of with the views, and configured
+    again only when gemini_options() changes.
+    """
+    global _gemini_configured
+    import google.generativeai as genai
+
+    options = gemini_options(api_key)
+    with _gemini_lock:
+        if options != _gemini_configured:
+            genai.configure(**options)
+            _gemini_configured = options
+    return genai.GenerativeModel(model_name)
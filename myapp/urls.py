@@ -1,10 +1,25 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import timing, views
+
+# ASYNC_VIEWS switches the weather pages to their async versions (ASGI deployments)
+if settings.ASYNC_VIEWS:
+    from . import async_views as weather_views
+else:
+    weather_views = views
 
 urlpatterns = [
-    path('', views.today_view, name='today'),
-    path('hourly/', views.hourly_view, name='hourly'),
-    path('10day/', views.tenday_view, name='10day'),
-    path('monthly/', views.monthly_view, name='monthly'),
+    # city-scoped canonical pages (cacheable, no session)
+    path('today/<slug:city>/', weather_views.today_view, name='today_city'),
+    path('hourly/<slug:city>/', weather_views.hourly_view, name='hourly_city'),
+    path('10day/<slug:city>/', weather_views.tenday_view, name='10day_city'),
+    path('monthly/<slug:city>/', weather_views.monthly_view, name='monthly_city'),
+    # old links and the city selector (?city=...): session city → redirect to the page above
+    path('', weather_views.city_redirect, {'page': 'today'}, name='today'),
+    path('hourly/', weather_views.city_redirect, {'page': 'hourly'}, name='hourly'),
+    path('10day/', weather_views.city_redirect, {'page': '10day'}, name='10day'),
+    path('monthly/', weather_views.city_redirect, {'page': 'monthly'}, name='monthly'),
     path('image/', views.image_view, name='image'),
+    path('image/thumb/<slug:digest>.jpg', views.image_thumbnail, name='image_thumbnail'),
+    path('metrics', timing.metrics_view, name='metrics'),
 ]
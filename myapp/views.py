@@ -1,12 +1,29 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import redirect
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.conf import settings
 from datetime import datetime, timedelta,date
-from .models import MonthlyWeather,SmartSuggestion
-import requests 
-from myapp.real_model_testing_3.predict_live import predict
-from django.core.files.uploadedfile import InMemoryUploadedFile
-import google.generativeai as genai
-import base64
+from .models import MonthlyWeather
+from myapp import page_cache, predictions, suggestions, timing, upstream, weather_data
+from myapp.timing import render
+from myapp.weather_cache import openweather_cache, shared_fetch, OPENWEATHER_TTLS
+from myapp.fanout import fan_out
+from myapp.backfill import backfill_history, due_dates
+from myapp.image_cache import analyze_cached, file_digest
+from myapp.gemini_parser import parse_image_analysis
+from myapp.suggestions import get_suggestions_batch, get_weather_suggestions
+from myapp.upload_handlers import (
+    ALLOWED_EXTENSIONS, MAX_FILE_SIZE_BYTES, MAX_FILE_SIZE_MB, ImageUploadHandler,
+)
+from myapp.image_processing import (
+    JPEG, THUMBNAIL_TTL, ImageDecodeError, get_thumbnail, prepare_image, save_thumbnail,
+)
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+import logging
 import os
+import time
+
+logger = logging.getLogger(__name__)
 
 
 # OpenWeather API setup
@@ -18,239 +35,330 @@ CITY_COORDS = {
     "rajkot":     (22.3039, 70.8022),
     "gandhinagar":(23.2237, 72.6500),
 }
+OPENWEATHER_BASE_URL = settings.OPENWEATHER_BASE_URL
 
 
-def today_view(request):
-    # 1) If user selected a new city → update session
-    if "city" in request.GET:
-        request.session["selected_city"] = request.GET["city"]
-    # 2) Read city from session (fallback = ahmedabad)
-    city_key = request.session.get("selected_city", "ahmedabad")
-    lat, lon = CITY_COORDS.get(city_key, CITY_COORDS["ahmedabad"])
-    
-    url = f'https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric'
-    try:
-        response = requests.get(url)
-        data = response.json()
-        sunrise = datetime.utcfromtimestamp(data['sys']['sunrise']) + timedelta(hours=5, minutes=30)
-        sunset = datetime.utcfromtimestamp(data['sys']['sunset']) + timedelta(hours=5, minutes=30)
-
-        today_data = {
-            'city': data['name'],
-            'temp': round(data['main']['temp']),
-            'feels_like': round(data['main']['feels_like']),
-            # 'condition': data['weather'][0]['main'],
-            # 'description': data['weather'][0]['description'].title(),
-            'humidity': f"{data['main']['humidity']}%",
-            'wind_kmh': f"{round(data['wind']['speed'] * 3.6)} km/h",
-            'min_temp': round(data['main']['temp_min']),
-            'max_temp': round(data['main']['temp_max']),
-            'icon': data['weather'][0]['icon'],
-            'sunrise': sunrise.strftime('%I:%M %p'),
-            'sunset': sunset.strftime('%I:%M %p'),
-        }
+def fetch_openweather(endpoint, lat, lon, refresh=False, **params):
+    """
+    GET an OpenWeather endpoint as JSON.
+
+    Served from the in-process TTL cache, then the shared cache filled by
+    prefetch_weather, then the API. `refresh` always goes to the API.
+    """
+    query = "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+    url = f"{OPENWEATHER_BASE_URL}/{endpoint}"
+
+    def fetch_upstream():
+        return upstream.get_json(url, params={
+            "lat": lat, "lon": lon, "appid": OPENWEATHER_API_KEY, "units": "metric", **params,
+        })
+
+    key = (endpoint, lat, lon, query)
+    ttl = OPENWEATHER_TTLS.get(endpoint, openweather_cache.default_ttl)
+
+    def fetch():
+        return shared_fetch(("openweather",) + key, fetch_upstream, ttl, refresh=refresh)
+
+    if refresh:
+        value = fetch()
+        openweather_cache.set(key, value, ttl)
+        return value
+    return openweather_cache.get_or_fetch(key, fetch, ttl=ttl)
+
+
+# ML predictions: read through the DailyPrediction table (myapp/predictions.py)
+def get_forecast_prediction(lat, lon):
+    """[(date, temp, label), ...] for every day of the Open-Meteo forecast."""
+    return predictions.get_forecast_prediction(lat, lon)
 
+
+def get_prediction(lat, lon):
+    """Today's (temp, label): the first day of the multi-day prediction."""
+    _, temp, label = get_forecast_prediction(lat, lon)[0]
+    return temp, label
+
+
+def store_predictions(predicted):
+    """Store {(lat, lon): [(date, temp, label), ...]} computed in a batch by predict_days_many()."""
+    predictions.store_many(predicted)
+
+
+# -------------------------------------------------------
+# Page data, shared by the HTML pages and /api/ (myapp/api.py)
+# -------------------------------------------------------
+# Each *_data(city_key) gathers one page's typed records (weather_data.py)
+# and returns (data, complete). `complete` is False when part of the data
+# could not be fetched, so nobody should cache the result for long. The
+# pages format the records with format_*() below; /api/ sends them as JSON.
+
+def today_data(city_key):
+    lat, lon = city_coords(city_key)
+
+    # Current weather and ML prediction don't depend on each other → fetch both at once
+    started = time.monotonic()
+    results = fan_out({
+        "current": lambda: fetch_openweather("weather", lat, lon),
+        "prediction": lambda: get_prediction(lat, lon),
+    }, timeout=settings.UPSTREAM_CALL_TIMEOUT, deadline=settings.PAGE_DEADLINE)
+
+    try:
+        if not results["current"].ok:
+            raise results["current"].error
+        current = weather_data.current_record(results["current"].value)
     except Exception as e:
-        print(f"Error fetching today's weather: {e}")
-        today_data = None
+        logger.warning("Current weather unavailable", extra={"city": city_key, "error": str(e)})
+        current = None
 
-    temp, weather_type = predict(lat, lon)
-    month = datetime.now()
-    
-    def get_season(month):
-        if month in [12, 1, 2]:
-            return 'winter'
-        elif month in [3, 4, 5]:
-            return 'summer'
-        elif month in [6, 7, 8, 9]:
-            return 'monsoon'
-        else:
-            return 'post-monsoon/winter'
-        
-    season = get_season(month.month)
-    
-    # Generate smart suggestions using Gemini API
+    if results["prediction"].ok:
+        temp, weather_type = results["prediction"].value
+    else:
+        logger.warning("Prediction unavailable", extra={"city": city_key, "error": str(results["prediction"].error)})
+        temp, weather_type = None, None
+
+    season = get_season(datetime.now().month)
+
+    # Generate smart suggestions using Gemini API (needs both results above),
+    # bounded by whatever is left of the page deadline
     smart_suggestions = None
-    if today_data:
-        smart_suggestions = get_weather_suggestions(today_data, season, temp, weather_type)
+    remaining = settings.PAGE_DEADLINE - (time.monotonic() - started)
+    if current and remaining > 0:
+        suggestion = fan_out({
+            "suggestions": lambda: get_weather_suggestions(format_today(current), season, temp, weather_type),
+        }, timeout=remaining)["suggestions"]
+        if suggestion.ok:
+            smart_suggestions = suggestion.value
+        else:
+            logger.warning("Suggestions unavailable", extra={"city": city_key, "error": str(suggestion.error)})
 
-    return render(request, 'myapp/today.html', {
-        'today_data': today_data,
-        "city_key": city_key,
-        "pred_temp": temp,
-        "pred_weather_type": weather_type,
+    return {
+        "current": current,
+        "prediction": weather_data.prediction_record(temp, weather_type),
         "season": season,
-        "suggestions": smart_suggestions
-    })
+        "suggestions": smart_suggestions,
+    }, current is not None and temp is not None and suggestions.is_final(smart_suggestions)
 
 
-def get_weather_suggestions(weather_data, season, pred_temp, pred_weather):
+def hourly_data(city_key):
+    lat, lon = city_coords(city_key)
+    try:
+        hours = weather_data.hour_records(fetch_openweather("forecast/hourly", lat, lon))
+    except Exception as e:
+        logger.warning("Hourly forecast unavailable", extra={"city": city_key, "error": str(e)})
+        hours = []
+    return {"hours": hours}, bool(hours)
 
-    today = date.today()
-    city = weather_data['city'].lower().strip()
 
-    # Step 1 → Check if today’s suggestion exists for this city
-    try:
-        record = SmartSuggestion.objects.get(city=city, date=today)
-        return {
-            'clothing': record.clothing,
-            'activities': record.activities,
-            'health': record.health,
-            'travel': record.travel
-        }
-    except SmartSuggestion.DoesNotExist:
-        pass
+def tenday_data(city_key):
+    lat, lon = city_coords(city_key)
 
-    # Step 2 → Call Gemini API because no stored record
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+    # OpenWeather's 10 days and the model's run over the Open-Meteo days → fetch both at once
+    results = fan_out({
+        "forecast": lambda: fetch_openweather("forecast/daily", lat, lon, cnt=10),
+        "prediction": lambda: get_forecast_prediction(lat, lon),
+    }, timeout=settings.UPSTREAM_CALL_TIMEOUT, deadline=settings.PAGE_DEADLINE)
+    return tenday_records(city_key, results)
 
-    if not GEMINI_API_KEY:
-        return {
-            'clothing': 'Configure Gemini API key to get suggestions',
-            'activities': '',
-            'health': '',
-            'travel': ''
-        }
 
+def tenday_records(city_key, results):
+    """Shape the "forecast" and "prediction" results of the 10-day fan-out (sync and async views)."""
     try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel("gemini-2.5-flash")
-
-        prompt = f"""Based on the following weather conditions, provide brief, practical suggestions (max 2 lines each) suitable for Gujarat, India:
-
-Current Weather:
-- City: {weather_data['city']}
-- Temperature: {weather_data['temp']}°C (Feels like: {weather_data['feels_like']}°C)
-- Humidity: {weather_data['humidity']}
-- Wind: {weather_data['wind_kmh']} km/h
-- Range: {weather_data['min_temp']}°C to {weather_data['max_temp']}°C
-- Season: {season}
-- Predicted Temperature: {pred_temp}°C
-- Predicted Weather: {pred_weather}
-
-Provide EXACTLY 4 suggestions in this format:
-CLOTHING: text
-ACTIVITIES: text
-HEALTH: text
-TRAVEL: text
-"""
-
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-
-        result = {'clothing': '', 'activities': '', 'health': '', 'travel': ''}
-        category = None
-
-        for line in text.split("\n"):
-            line = line.strip()
-
-            if line.startswith("CLOTHING:"):
-                category = "clothing"
-                result[category] = line.replace("CLOTHING:", "").strip()
-            elif line.startswith("ACTIVITIES:"):
-                category = "activities"
-                result[category] = line.replace("ACTIVITIES:", "").strip()
-            elif line.startswith("HEALTH:"):
-                category = "health"
-                result[category] = line.replace("HEALTH:", "").strip()
-            elif line.startswith("TRAVEL:"):
-                category = "travel"
-                result[category] = line.replace("TRAVEL:", "").strip()
-            elif category:
-                result[category] += " " + line
-
-        # Step 3 → Save new suggestions (minimal DB store)
-        SmartSuggestion.objects.create(
-            city=city,
-            date=today,
-            clothing=result['clothing'],
-            activities=result['activities'],
-            health=result['health'],
-            travel=result['travel']
-        )
-
-        return result
-
+        if not results["forecast"].ok:
+            raise results["forecast"].error
+        days = weather_data.day_records(results["forecast"].value)
     except Exception as e:
-        print("Gemini Suggestion Error:", e)
-        return {
-            'clothing': 'Unable to generate suggestions',
-            'activities': '',
-            'health': '',
-            'travel': ''
-        }
+        logger.warning("10-day forecast unavailable", extra={"city": city_key, "error": str(e)})
+        days = []
 
+    if results["prediction"].ok:
+        weather_data.add_model_forecast(days, results["prediction"].value)
+    else:
+        logger.warning("Prediction unavailable", extra={"city": city_key, "error": str(results["prediction"].error)})
+    return {"days": days}, bool(days) and results["prediction"].ok
 
 
+def monthly_data(city_key):
+    lat, lon = city_coords(city_key)
 
+    start_date = ensure_month_history(lat, lon)
 
-def hourly_view(request):
-    if "city" in request.GET:
-        request.session["selected_city"] = request.GET["city"]
-    city_key = request.session.get("selected_city", "ahmedabad")
-    lat, lon = CITY_COORDS.get(city_key, CITY_COORDS["ahmedabad"])
-    url = f'https://api.openweathermap.org/data/2.5/forecast/hourly?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric'
-    try:
-        response = requests.get(url)
-        data = response.json()
-
-        hourly_data = []
-        for item in data.get('list', [])[:24]:
-            dt_utc = datetime.utcfromtimestamp(item['dt'])
-            ist_time = dt_utc + timedelta(hours=5)
-            hourly_data.append({
-                'time': ist_time.strftime('%I:%M %p'),
-                'temp_c': round(item['main']['temp']),
-                'condition': item['weather'][0]['main'],
-                'humidity': f"{item['main']['humidity']}%",
-                'wind_kmh': f"{round(item['wind']['speed'] * 3.6)} km/h"
-            })
+    # GET FINAL 30-DAY DATA
+    entries = MonthlyWeather.objects.filter(
+        lat=lat, lon=lon,
+        date__gte=start_date
+    ).order_by("date")
+    return {"days": weather_data.month_records(entries)}, True
+
+
+PAGE_DATA = {"today": today_data, "hourly": hourly_data, "10day": tenday_data, "monthly": monthly_data}
+
+
+# -------------------------------------------------------
+# Display formatting for the templates (and the suggestion prompts)
+# -------------------------------------------------------
+def format_today(current):
+    return {
+        'city': current['city'],
+        'temp': round(current['temp']),
+        'feels_like': round(current['feels_like']),
+        'humidity': f"{current['humidity']}%",
+        'wind_kmh': f"{round(current['wind_ms'] * 3.6)} km/h",
+        'min_temp': round(current['min_temp']),
+        'max_temp': round(current['max_temp']),
+        'icon': current['icon'],
+        'sunrise': current['sunrise'].strftime('%I:%M %p'),
+        'sunset': current['sunset'].strftime('%I:%M %p'),
+    }
+
+
+def format_hours(hours):
+    return [{
+        'time': hour['time'].strftime('%I:%M %p'),
+        'temp_c': round(hour['temp']),
+        'condition': hour['condition'],
+        'humidity': f"{hour['humidity']}%",
+        'wind_kmh': f"{round(hour['wind_ms'] * 3.6)} km/h",
+    } for hour in hours]
+
+
+def format_days(days):
+    return [{
+        'day': day['date'],
+        'date': day['date'].strftime('%B %d'),
+        'high_low': f"{round(day['temp_max'])}° / {round(day['temp_min'])}°",
+        'condition': day['condition'],
+        'precip': f"{day['precip_pct']}%",
+        'wind': f"{round(day['wind_ms'] * 3.6)} km/h",
+        'model_temp': day['model_temp'],
+        'model_condition': day['model_condition'],
+    } for day in days]
+
+
+def format_month(days):
+    return [{
+        "label": day["date"].strftime("%d %b").lstrip("0"),
+        "temp": f"{day['avg_temp']}°C",
+    } for day in days]
+
+
+# the OpenWeather reply straight to the page's rows (prefetch_weather, benchmarks)
+def build_today_data(data):
+    return format_today(weather_data.current_record(data))
 
-    except Exception as e:
-        print(f"Error fetching hourly forecast: {e}")
-        hourly_data = []
 
-    return render(request, 'myapp/hourly.html', {'hourly_data': hourly_data,"city_key": city_key,})
+def build_hourly_data(data):
+    return format_hours(weather_data.hour_records(data))
 
 
-def tenday_view(request):
+def build_forecast_data(data):
+    return format_days(weather_data.day_records(data))
+
+
+def build_month_result(entries):
+    return format_month(weather_data.month_records(entries))
+
+
+def get_season(month):
+    if month in [12, 1, 2]:
+        return 'winter'
+    elif month in [3, 4, 5]:
+        return 'summer'
+    elif month in [6, 7, 8, 9]:
+        return 'monsoon'
+    else:
+        return 'post-monsoon/winter'
+
+
+# -------------------------------------------------------
+# City pages: /<page>/<city>/ is canonical and cacheable (see page_cache.py)
+# -------------------------------------------------------
+CITY_PAGES = ("today", "hourly", "10day", "monthly")
+# Cache-Control max-age, roughly how long each page's data stays fresh
+PAGE_MAX_AGE = {"today": 5 * 60, "hourly": 15 * 60, "10day": 60 * 60, "monthly": 60 * 60}
+
+
+def city_url(page, city_key):
+    return reverse(f"{page}_city", args=[city_key])
+
+
+def city_coords(city_key):
+    if city_key not in CITY_COORDS:
+        raise Http404(f"Unknown city '{city_key}'")
+    return CITY_COORDS[city_key]
+
+
+def session_city(request):
+    # 1) If user selected a new city → update session
     if "city" in request.GET:
         request.session["selected_city"] = request.GET["city"]
+    # 2) Read city from session (fallback = ahmedabad)
     city_key = request.session.get("selected_city", "ahmedabad")
-    lat, lon = CITY_COORDS.get(city_key, CITY_COORDS["ahmedabad"])
-    url = f'https://api.openweathermap.org/data/2.5/forecast/daily?lat={lat}&lon={lon}&cnt=10&appid={OPENWEATHER_API_KEY}&units=metric'
-    try:
-        response = requests.get(url)
-        data = response.json()
-
-        forecast_data = []
-        for day in data.get('list', []):
-            dt = datetime.utcfromtimestamp(day['dt']) + timedelta(hours=5, minutes=30)
-            forecast_data.append({
-                'date': dt.strftime('%B %d'),
-                'high_low': f"{round(day['temp']['max'])}° / {round(day['temp']['min'])}°",
-                'condition': day['weather'][0]['main'],
-                'precip': f"{int(day.get('pop', 0) * 100)}%" if 'pop' in day else "0%",
-                'wind': f"{round(day['speed'] * 3.6)} km/h"
-            })
+    return city_key if city_key in CITY_COORDS else "ahmedabad"
 
-    except Exception as e:
-        print(f"Error fetching 10-day forecast: {e}")
-        forecast_data = []
 
-    return render(request, 'myapp/10day.html', {'forecast_data': forecast_data,"city_key": city_key,})
+def city_redirect(request, page):
+    """/<page>/?city=... and plain /<page>/ links: remember the city, go to the canonical URL."""
+    return redirect(city_url(page, session_city(request)))
 
 
-def monthly_view(request):
-    # keep selected city across pages
-    if "city" in request.GET:
-        request.session["selected_city"] = request.GET["city"]
+def render_city_page(request, page, city_key, context, complete=True):
+    return page_cache.render_page(request, page, city_key, f"myapp/{page}.html", context,
+                                  max_age=PAGE_MAX_AGE[page] if complete else 0)
 
-    city_key = request.session.get("selected_city", "ahmedabad")
-    lat, lon = CITY_COORDS.get(city_key, CITY_COORDS["ahmedabad"])
 
+# page data → template context
+def today_context(city_key, data):
+    prediction = data["prediction"] or {}
+    return {
+        'today_data': format_today(data["current"]) if data["current"] else None,
+        "city_key": city_key,
+        "pred_temp": prediction.get("temp"),
+        "pred_weather_type": prediction.get("weather"),
+        "season": data["season"],
+        "suggestions": data["suggestions"],
+    }
+
+
+def hourly_context(city_key, data):
+    return {'hourly_data': format_hours(data["hours"]), "city_key": city_key}
+
+
+def tenday_context(city_key, data):
+    return {'forecast_data': format_days(data["days"]), "city_key": city_key}
+
+
+def monthly_context(city_key, data):
+    return {"result": format_month(data["days"]), "city_key": city_key}  # city_key for dropdown display only
+
+
+PAGE_CONTEXT = {"today": today_context, "hourly": hourly_context, "10day": tenday_context, "monthly": monthly_context}
+
+
+def city_page(request, page, city_key, data, complete):
+    return render_city_page(request, page, city_key, PAGE_CONTEXT[page](city_key, data), complete)
+
+
+def today_view(request, city):
+    return city_page(request, "today", city, *today_data(city))
+
+
+def hourly_view(request, city):
+    return city_page(request, "hourly", city, *hourly_data(city))
+
+
+def tenday_view(request, city):
+    return city_page(request, "10day", city, *tenday_data(city))
+
+
+def month_window():
+    """First day of the 30-day history window and every date in it."""
     today = datetime.utcnow().date()
     start_date = today - timedelta(days=30)
+    return start_date, [start_date + timedelta(days=i) for i in range(30)]
+
+
+def ensure_month_history(lat, lon):
+    """Backfill any of the last 30 days missing for lat/lon; returns the first day."""
+    start_date, window = month_window()
 
     # EXISTING DATES ONLY FOR THIS lat/lon
     existing_dates = set(
@@ -260,73 +368,32 @@ def monthly_view(request):
         ).values_list("date", flat=True)
     )
 
-    # FIND MISSING DATES
-    missing_dates = [
-        start_date + timedelta(days=i)
-        for i in range(30)
-        if (start_date + timedelta(days=i)) not in existing_dates
-    ]
-
-    # FETCH MISSING DATES FROM API
-    for date in missing_dates:
-        start_unix = int(datetime.combine(date, datetime.min.time()).timestamp())
-        end_unix = int(datetime.combine(date, datetime.max.time()).timestamp())
-
-        url = (
-            f"https://history.openweathermap.org/data/2.5/history/city"
-            f"?lat={lat}&lon={lon}&type=hour"
-            f"&start={start_unix}&end={end_unix}"
-            f"&units=metric&appid={OPENWEATHER_API_KEY}"
-        )
-
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-
-            temps = [entry["main"]["temp"] for entry in data.get("list", [])]
-
-            if temps:
-                MonthlyWeather.objects.create(
-                    lat=lat,
-                    lon=lon,
-                    date=date,
-                    avg_temp=round(sum(temps) / len(temps), 1)
-                )
-        except:
-            pass
+    # FIND MISSING DATES (skipping recent failures)
+    missing_dates = due_dates(lat, lon, [d for d in window if d not in existing_dates])
 
-    # GET FINAL 30-DAY DATA
-    entries = MonthlyWeather.objects.filter(
-        lat=lat, lon=lon,
-        date__gte=start_date
-    ).order_by("date")
+    # FETCH MISSING DATES FROM API (grouped into range requests)
+    if missing_dates:
+        report_backfill(lat, lon, backfill_history(lat, lon, missing_dates, OPENWEATHER_API_KEY))
 
-    result = []
-    for entry in entries:
-        result.append({
-            "label": entry.date.strftime("%d %b").lstrip("0"),
-            "temp": f"{entry.avg_temp}°C"
-        })
+    return start_date
 
-    return render(request, "myapp/monthly.html", {
-        "result": result,
-        "city_key": city_key,  # for dropdown display only
-    })
 
+def report_backfill(lat, lon, backfill):
+    if backfill.failed:
+        logger.warning("History backfill failed", extra={
+            "lat": lat, "lon": lon, "dates": [str(d) for d in sorted(backfill.failed)],
+        })
 
 
+def monthly_view(request, city):
+    return city_page(request, "monthly", city, *monthly_data(city))
 
-# Configure Gemini API
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
 
-# Allowed image extensions and max file size
-ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif'}
-MAX_FILE_SIZE_MB = 10
-MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024  # 10 MB in bytes
 
 
+# Gemini is imported and configured on first use (upstream.gemini_model)
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
 def validate_image_file(file):
     # Check file extension
     file_name = file.name.lower()
@@ -348,7 +415,7 @@ def analyze_weather_from_image(image_data, content_type):
 
     try:
         # Initialize Gemini model with vision capabilities
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        model = upstream.gemini_model('gemini-2.5-flash', GEMINI_API_KEY)
         
         # Create image part for Gemini API
         image_part = {
@@ -388,67 +455,13 @@ REASON: [Brief explanation]
 Be specific and analytical in your observations."""
 
         # Generate content with both image and text prompt
-        response = model.generate_content([prompt, image_part])
+        with timing.span("gemini"):
+            response = model.generate_content([prompt, image_part], request_options={"timeout": upstream.GEMINI_TIMEOUT})
         
         # Parse the response
         response_text = response.text.strip()
         
-        # Extract information from structured response
-        result = {
-            'is_sky': False,
-            'weather_condition': None,
-            'cloud_coverage': None,
-            'cloud_type': None,
-            'cloud_darkness': None,
-            'cloud_intensity': None,
-            'rain_probability': None,
-            'approximate_temp': None,
-            'visibility': None,
-            'atmospheric_conditions': None,
-            'wind_indication': None,
-            'time_of_day': None,
-            'weather_forecast': None,
-            'details': None,
-            'reason': None,
-            'raw_response': response_text
-        }
-        
-        # Parse structured response
-        lines = response_text.split('\n')
-        for line in lines:
-            line_upper = line.upper()
-            if 'SKY_DETECTED:' in line_upper:
-                result['is_sky'] = 'YES' in line_upper
-            elif 'WEATHER_CONDITION:' in line_upper and result['is_sky']:
-                result['weather_condition'] = line.split(':', 1)[1].strip()
-            elif 'CLOUD_COVERAGE:' in line_upper and result['is_sky']:
-                result['cloud_coverage'] = line.split(':', 1)[1].strip()
-            elif 'CLOUD_TYPE:' in line_upper and result['is_sky']:
-                result['cloud_type'] = line.split(':', 1)[1].strip()
-            elif 'CLOUD_DARKNESS:' in line_upper and result['is_sky']:
-                result['cloud_darkness'] = line.split(':', 1)[1].strip()
-            elif 'CLOUD_INTENSITY:' in line_upper and result['is_sky']:
-                result['cloud_intensity'] = line.split(':', 1)[1].strip()
-            elif 'RAIN_PROBABILITY:' in line_upper and result['is_sky']:
-                result['rain_probability'] = line.split(':', 1)[1].strip()
-            elif 'APPROXIMATE_TEMP:' in line_upper and result['is_sky']:
-                result['approximate_temp'] = line.split(':', 1)[1].strip()
-            elif 'VISIBILITY:' in line_upper and result['is_sky']:
-                result['visibility'] = line.split(':', 1)[1].strip()
-            elif 'ATMOSPHERIC_CONDITIONS:' in line_upper and result['is_sky']:
-                result['atmospheric_conditions'] = line.split(':', 1)[1].strip()
-            elif 'WIND_INDICATION:' in line_upper and result['is_sky']:
-                result['wind_indication'] = line.split(':', 1)[1].strip()
-            elif 'TIME_OF_DAY:' in line_upper and result['is_sky']:
-                result['time_of_day'] = line.split(':', 1)[1].strip()
-            elif 'WEATHER_FORECAST:' in line_upper and result['is_sky']:
-                result['weather_forecast'] = line.split(':', 1)[1].strip()
-            elif 'DETAILS:' in line_upper and result['is_sky']:
-                result['details'] = line.split(':', 1)[1].strip()
-            elif 'REASON:' in line_upper and not result['is_sky']:
-                result['reason'] = line.split(':', 1)[1].strip()
-        
-        return result
+        return parse_image_analysis(response_text)
         
     except Exception as e:
         return {
@@ -458,62 +471,95 @@ Be specific and analytical in your observations."""
         }
 
 
+@csrf_exempt
 def image_view(request):
+    # Upload handlers must be swapped before anything reads request.POST, which
+    # includes the CSRF check, so that runs in _image_view instead.
+    handler = ImageUploadHandler(request)
+    request.upload_handlers = [handler]
+
+    if request.method == 'POST':
+        too_large = handler.content_length_error(request.META)
+        if too_large:
+            # refuse without reading the body
+            return render(request, 'myapp/image.html', {'error_message': too_large}, status=413)
+
+    return _image_view(request)
+
+
+@csrf_protect
+def _image_view(request):
    
-    TEMP_IMAGES = {}
     caption = None
-    image_base64 = None
+    thumbnail_url = None
     weather_info = None
     error_message = None
-    user_key = str(request.session.session_key or request.META.get('REMOTE_ADDR'))
 
-    # Clear memory if page is refreshed (GET request)
-    if request.method == 'GET':
-        TEMP_IMAGES.pop(user_key, None)
+    # reading FILES runs the upload handler, which may leave an upload_error
+    image_file = request.FILES.get('image') if request.method == 'POST' else None
+
+    if getattr(request, 'upload_error', None):
+        error_message = request.upload_error
 
-    if request.method == 'POST' and request.FILES.get('image'):
-        image_file = request.FILES['image']
+    elif image_file:
 
         # Validate the uploaded file
         is_valid, validation_error = validate_image_file(image_file)
         
         if not is_valid:
             error_message = validation_error
-        elif isinstance(image_file, InMemoryUploadedFile):
-            # Read image data
-            image_data = image_file.read()
-            
-            # Convert to Base64 for HTML rendering
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
-            image_base64 = f"data:{image_file.content_type};base64,{image_base64}"
-
-            # Save in dictionary with user-specific key
-            TEMP_IMAGES[user_key] = {
-                'filename': image_file.name,
-                'content_type': image_file.content_type,
-                'data': image_base64
-            }
-
-            # Analyze image using Gemini API
-            weather_info = analyze_weather_from_image(image_data, image_file.content_type)
-            
+        else:
+            # streamed uploads arrive hashed; anything else is hashed chunk by chunk
+            digest = getattr(image_file, 'sha256', None) or file_digest(image_file)
+
+            try:
+                # Decode once: small JPEG for Gemini + thumbnail for the page.
+                # Skipped entirely when this exact image was seen before.
+                prepared = None
+                if get_thumbnail(digest) is None:
+                    prepared = prepare_image(image_file)
+                    save_thumbnail(digest, prepared.thumbnail_bytes)
+
+                def analyze():
+                    image = prepared or prepare_image(image_file)
+                    return analyze_weather_from_image(image.analysis_bytes, image.content_type)
+
+                # Analyze image using Gemini API (repeat uploads of the same bytes are served from cache)
+                weather_info = analyze_cached(digest, analyze)
+                thumbnail_url = reverse('image_thumbnail', args=[digest])
+            except ImageDecodeError as e:
+                error_message = str(e)
+                weather_info = None
+
             # Generate caption based on analysis
-            if weather_info.get('is_sky'):
+            if weather_info is None:
+                pass
+            elif weather_info.get('is_sky'):
                 # Sky detected - show full weather forecast
                 caption = "Weather Analysis Complete"
             else:
                 # No sky detected - show only alert
                 caption = None
-                error_message = weather_info.get('reason', 'No sky detected in the image. Please upload an image with a clear view of the sky.')
+                # `reason` may be present but empty when Gemini gave none
+                error_message = weather_info.get('reason') or 'No sky detected in the image. Please upload an image with a clear view of the sky.'
                 weather_info = None  # Don't show weather info
 
-    # Retrieve if already uploaded
-    if user_key in TEMP_IMAGES:
-        image_base64 = TEMP_IMAGES[user_key]['data']
-
     return render(request, 'myapp/image.html', {
         'caption': caption,
-        'image_base64': image_base64,
+        'thumbnail_url': thumbnail_url,
         'weather_info': weather_info,
         'error_message': error_message
     })
+
+
+def image_thumbnail(request, digest):
+    # URL is content-addressed (SHA-256 of the upload), so it never changes.
+    # It is a user's photo though: browser cache only, no longer than we keep it.
+    data = get_thumbnail(digest)
+    if data is None:
+        raise Http404("Thumbnail expired")
+
+    response = HttpResponse(data, content_type=JPEG)
+    response['Cache-Control'] = f'private, max-age={THUMBNAIL_TTL}, immutable'
+    response['ETag'] = f'"{digest}"'
+    return response
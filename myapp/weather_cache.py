@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------------------------------------
+# Upstream response cache (LRU + TTL, stale-while-revalidate)
+# -------------------------------------------------------
+
+class _Entry:
+    __slots__ = ("value", "fresh_until", "stale_until")
+
+    def __init__(self, value, fresh_until, stale_until):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class TTLCache:
+    """
+    Bounded in-process cache for upstream API responses.
+
+    Fresh entries are returned directly. Entries past their TTL but inside the
+    stale window are still returned while one background refresh replaces them.
+    Anything older is fetched synchronously. Failed fetches are never cached.
+    """
+
+    def __init__(self, maxsize=256, default_ttl=300, stale_ttl=600,
+                 clock=time.monotonic, executor=None):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self._executor = executor
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._tasks = set()  # keeps async refresh tasks alive until they finish
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refresh_errors = 0
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+        return self._executor
+
+    def _lookup(self, key):
+        """Return (entry or None, whether the caller should start a refresh)."""
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now >= entry.stale_until:
+                self.misses += 1
+                return None, False
+
+            self._entries.move_to_end(key)
+            if now < entry.fresh_until:
+                self.hits += 1
+                return entry, False
+
+            self.stale_hits += 1
+            if key in self._refreshing:
+                return entry, False
+            self._refreshing.add(key)
+            return entry, True
+
+    def get_or_fetch(self, key, fetch, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        entry, refresh = self._lookup(key)
+
+        if entry is not None:
+            # submit outside the lock; the refresh itself needs it to store
+            if refresh:
+                self.executor.submit(self._refresh, key, fetch, ttl)
+            return entry.value
+
+        value = fetch()
+        self.set(key, value, ttl)
+        return value
+
+    async def aget_or_fetch(self, key, afetch, ttl=None):
+        """Same as get_or_fetch for a coroutine function; refreshes run as tasks."""
+        ttl = self.default_ttl if ttl is None else ttl
+        entry, refresh = self._lookup(key)
+
+        if entry is not None:
+            if refresh:
+                task = asyncio.get_running_loop().create_task(self._arefresh(key, afetch, ttl))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            return entry.value
+
+        value = await afetch()
+        self.set(key, value, ttl)
+        return value
+
+    def _refresh(self, key, fetch, ttl):
+        try:
+            self.set(key, fetch(), ttl)
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.warning("Background refresh failed", extra={"key": str(key), "error": str(e)})
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def _arefresh(self, key, afetch, ttl):
+        try:
+            self.set(key, await afetch(), ttl)
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.warning("Background refresh failed", extra={"key": str(key), "error": str(e)})
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get(self, key, default=None):
+        """Return a fresh cached value without fetching or refreshing."""
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now >= entry.fresh_until:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        now = self.clock()
+        with self._lock:
+            self._entries[key] = _Entry(value, now + ttl, now + ttl + self.stale_ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "refresh_errors": self.refresh_errors,
+        }
+
+
+# -------------------------------------------------------
+# OpenWeather: how long each endpoint's data stays fresh
+# -------------------------------------------------------
+OPENWEATHER_TTLS = {
+    "weather": 5 * 60,
+    "forecast/hourly": 15 * 60,
+    "forecast/daily": 60 * 60,
+}
+
+openweather_cache = TTLCache(maxsize=256, default_ttl=5 * 60, stale_ttl=10 * 60)
+
+
+# -------------------------------------------------------
+# Shared tier: visible to every worker and to prefetch_weather
+# -------------------------------------------------------
+SHARED_CACHE_ALIAS = "upstream"
+
+
+def shared_fetch(key, fetch, ttl, refresh=False):
+    """Read-through on the cross-process cache; `refresh` skips the read."""
+    cache = caches[SHARED_CACHE_ALIAS]
+    cache_key = ":".join(str(part) for part in key)
+    if not refresh:
+        value = cache.get(cache_key)
+        if value is not None:
+            return value
+
+    value = fetch()
+    cache.set(cache_key, value, ttl)
+    return value
+
+
+async def ashared_fetch(key, afetch, ttl, refresh=False):
+    cache = caches[SHARED_CACHE_ALIAS]
+    cache_key = ":".join(str(part) for part in key)
+    if not refresh:
+        value = await cache.aget(cache_key)
+        if value is not None:
+            return value
+
+    value = await afetch()
+    await cache.aset(cache_key, value, ttl)
+    return value
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+
+
+# -------------------------------------------------------
+# Typed weather records, shared by the HTML pages and /api/
+# -------------------------------------------------------
+# Upstream replies are shaped into plain numbers, dates and strings here.
+# /api/ serialises the records as they are. The pages format them for
+# display (views.format_*). Each *_FIELDS tuple lists a record's keys,
+# which is what ?fields= accepts.
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+CURRENT_FIELDS = (
+    "city", "temp", "feels_like", "humidity", "wind_ms", "wind_kmh", "min_temp", "max_temp",
+    "condition", "description", "icon", "sunrise", "sunset",
+)
+HOUR_FIELDS = ("time", "temp", "condition", "humidity", "wind_ms", "wind_kmh")
+DAY_FIELDS = (
+    "date", "temp_max", "temp_min", "condition", "precip_pct", "wind_ms", "wind_kmh",
+    "model_temp", "model_condition",
+)
+MONTH_DAY_FIELDS = ("date", "avg_temp")
+PREDICTION_FIELDS = ("temp", "weather")
+
+
+def kmh(speed_ms):
+    return round(speed_ms * 3.6, 1)
+
+
+def local_time(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=IST)
+
+
+def current_record(data):
+    """OpenWeather /weather reply → CURRENT_FIELDS."""
+    return {
+        "city": data["name"],
+        "temp": data["main"]["temp"],
+        "feels_like": data["main"]["feels_like"],
+        "humidity": data["main"]["humidity"],
+        "wind_ms": data["wind"]["speed"],
+        "wind_kmh": kmh(data["wind"]["speed"]),
+        "min_temp": data["main"]["temp_min"],
+        "max_temp": data["main"]["temp_max"],
+        "condition": data["weather"][0]["main"],
+        "description": data["weather"][0].get("description", ""),
+        "icon": data["weather"][0]["icon"],
+        "sunrise": local_time(data["sys"]["sunrise"]),
+        "sunset": local_time(data["sys"]["sunset"]),
+    }
+
+
+def hour_records(data, hours=24):
+    """OpenWeather hourly forecast → HOUR_FIELDS for the next `hours` hours."""
+    return [{
+        "time": local_time(item["dt"]),
+        "temp": item["main"]["temp"],
+        "condition": item["weather"][0]["main"],
+        "humidity": item["main"]["humidity"],
+        "wind_ms": item["wind"]["speed"],
+        "wind_kmh": kmh(item["wind"]["speed"]),
+    } for item in data.get("list", [])[:hours]]
+
+
+def day_records(data):
+    """OpenWeather daily forecast → DAY_FIELDS, without the model columns until add_model_forecast()."""
+    return [{
+        "date": local_time(day["dt"]).date(),
+        "temp_max": day["temp"]["max"],
+        "temp_min": day["temp"]["min"],
+        "condition": day["weather"][0]["main"],
+        "precip_pct": int(day["pop"] * 100) if "pop" in day else 0,
+        "wind_ms": day["speed"],
+        "wind_kmh": kmh(day["speed"]),
+        "model_temp": None,
+        "model_condition": None,
+    } for day in data.get("list", [])]
+
+
+def add_model_forecast(days, predicted_days):
+    """Put the model's temperature and condition next to OpenWeather's, matched by date."""
+    by_date = {day: (temp, label) for day, temp, label in predicted_days}
+    for record in days:
+        record["model_temp"], record["model_condition"] = by_date.get(record["date"], (None, None))
+    return days
+
+
+def month_records(entries):
+    """MonthlyWeather rows → MONTH_DAY_FIELDS."""
+    return [{"date": entry.date, "avg_temp": entry.avg_temp} for entry in entries]
+
+
+def prediction_record(temp, weather):
+    return None if temp is None else {"temp": float(temp), "weather": weather}
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 from dotenv import load_dotenv
 import os
+import tempfile
 
 
 load_dotenv()
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'myapp.timing.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -86,6 +88,21 @@ DATABASES = {
 }
 
 
+# Caches
+# "upstream" holds API responses and predictions shared by all workers and the
+# prefetch_weather command, so it must live outside the process.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'upstream': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('UPSTREAM_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'smart_weather_upstream')),
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -138,3 +155,78 @@ import os
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+
+# -----------------------------------------------------------------------------------------------------
+#   ML model registry
+# -----------------------------------------------------------------------------------------------------
+
+# load the XGBoost models in MyappConfig.ready() instead of on first request
+WARM_MODELS_ON_STARTUP = os.getenv("WARM_MODELS_ON_STARTUP", "0") == "1"
+
+# load e.g. temp_model_xgb_regressor.pruned200.ubj instead of the full model when it exists
+# (variants are written by `manage.py export_models --prune 200`)
+MODEL_VARIANT = os.getenv("MODEL_VARIANT", "")
+
+
+# -----------------------------------------------------------------------------------------------------
+#   Upstream calls made while rendering a page (seconds)
+# -----------------------------------------------------------------------------------------------------
+
+UPSTREAM_CALL_TIMEOUT = float(os.getenv("UPSTREAM_CALL_TIMEOUT", "8"))
+PAGE_DEADLINE = float(os.getenv("PAGE_DEADLINE", "12"))
+
+# serve the weather pages with the async views (needs an ASGI server such as uvicorn)
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "0") == "1"
+
+
+# -----------------------------------------------------------------------------------------------------
+#   Upstream base URLs
+# -----------------------------------------------------------------------------------------------------
+
+# FAKE_UPSTREAM_URL points every upstream at one stand-in server (`manage.py fake_upstream`)
+# for load tests; the individual settings still win when set.
+FAKE_UPSTREAM_URL = os.getenv("FAKE_UPSTREAM_URL", "").rstrip("/")
+
+OPENWEATHER_BASE_URL = os.getenv(
+    "OPENWEATHER_BASE_URL",
+    f"{FAKE_UPSTREAM_URL}/data/2.5" if FAKE_UPSTREAM_URL else "https://api.openweathermap.org/data/2.5",
+)
+OPENWEATHER_HISTORY_URL = os.getenv(
+    "OPENWEATHER_HISTORY_URL",
+    f"{FAKE_UPSTREAM_URL}/data/2.5" if FAKE_UPSTREAM_URL else "https://history.openweathermap.org/data/2.5",
+)
+OPEN_METEO_URL = os.getenv(
+    "OPEN_METEO_URL",
+    f"{FAKE_UPSTREAM_URL}/v1" if FAKE_UPSTREAM_URL else "https://api.open-meteo.com/v1",
+)
+# empty: the Gemini SDK's default endpoint (gRPC); set: REST calls to this host
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", FAKE_UPSTREAM_URL)
+
+
+
+# -----------------------------------------------------------------------------------------------------
+#   Timing, metrics and logging
+# -----------------------------------------------------------------------------------------------------
+
+# per-request spans: Server-Timing response header and histograms on /metrics
+REQUEST_TIMING = os.getenv("REQUEST_TIMING", "1") == "1"
+# when set, /metrics needs "Authorization: Bearer <token>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# LOG_FORMAT=json for one JSON object per line (log shippers), "text" for humans
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "json": {"()": "myapp.log_format.JsonFormatter"},
+        "text": {"format": "%(asctime)s %(levelname)s %(name)s: %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": LOG_FORMAT},
+    },
+    "loggers": {
+        "myapp": {"handlers": ["console"], "level": os.getenv("LOG_LEVEL", "INFO"), "propagate": False},
+    },
+}
@@ -41,6 +41,7 @@ from django.conf.urls.static import static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/', include('myapp.api_urls')),
     path('', include('myapp.urls')),
 ]
 